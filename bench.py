@@ -0,0 +1,330 @@
+"""Benchmarks for db.py and MainApp, run against generated databases.
+
+    python bench.py                               # 1k, 100k and 1M rows
+    python bench.py --sizes 1000,100000 --output run.json
+    python bench.py --baseline run.json           # compare against an earlier run
+
+MainApp benchmarks need a display; run under a virtual one with
+`xvfb-run python bench.py` on a headless machine (they are skipped otherwise).
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+import db
+
+# Database sizes used when --sizes is not given
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+# Each benchmark runs up to this many times, but stops early after MAX_SECONDS
+REPEAT = 7
+MAX_SECONDS = 10.0
+# Median slowdown that --baseline reports as a regression
+REGRESSION_THRESHOLD = 1.25
+
+# Category mix of a typical design team, most ideas in a few categories
+CATEGORY_WEIGHTS = {
+    "gameplay": 30, "level": 18, "character": 14, "uncategorized": 10, "skin": 8,
+    "operation": 6, "boss": 5, "weapon": 4, "puzzle": 3, "narrative": 2,
+}
+TAG_COUNT = 300
+SCRATCH_CATEGORY = "bench-scratch"
+
+
+class Generator:
+    """Deterministic synthetic ideas: pseudo-words, Zipf-distributed tags and
+    log-normal description lengths (most short, a few very long)."""
+
+    def __init__(self, seed: int = 42):
+        self.random = random.Random(seed)
+        syllables = ["ka", "lo", "mi", "ra", "ten", "vo", "shi", "gar", "el", "dun", "pra", "zo", "qui", "bel"]
+        self.words = sorted({
+            "".join(self.random.choice(syllables) for _ in range(self.random.randint(1, 3)))
+            for _ in range(4000)
+        })
+        self.tags = self.words[:TAG_COUNT]
+        self.tag_weights = [1 / (rank + 1) for rank in range(TAG_COUNT)]
+        self.categories = list(CATEGORY_WEIGHTS)
+        self.category_weights = list(CATEGORY_WEIGHTS.values())
+        self.now = int(time.time() * 1000)
+
+    def text(self, count: int) -> str:
+        return " ".join(self.random.choices(self.words, k=count))
+
+    def idea(self):
+        """One (title, category, description, tags, created_at, updated_at) tuple."""
+        rng = self.random
+        description_words = min(5000, max(1, int(rng.lognormvariate(math.log(60), 1.0))))
+        tags = set(rng.choices(self.tags, self.tag_weights, k=rng.randint(0, 5)))
+        created_at = self.now - rng.randint(0, 2 * 365 * 24 * 3600 * 1000)
+        updated_at = created_at + (rng.randint(0, 30 * 24 * 3600 * 1000) if rng.random() < 0.4 else 0)
+        return (
+            self.text(rng.randint(2, 8)).capitalize(),
+            rng.choices(self.categories, self.category_weights)[0],
+            self.text(description_words),
+            ", ".join(sorted(tags)),
+            created_at,
+            min(updated_at, self.now),
+        )
+
+
+def remove_database(path: str):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def generate_database(path: str, rows: int, seed: int = 42, batch_size: int = 20000):
+    """Create a database at `path` holding `rows` synthetic ideas."""
+    remove_database(path)
+    db.DB_Path = path
+    db.init_db()
+
+    generator = Generator(seed)
+    for start in range(0, rows, batch_size):
+        db.insert_ideas(generator.idea() for _ in range(min(batch_size, rows - start)))
+
+    # Fold the WAL into the file so the database can be copied as one file
+    with db.pooled_connection() as connection:
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+    db.close_pool()
+
+
+def prepare_database(data_dir: str, rows: int, seed: int) -> str:
+    """Return a fresh working copy of the generated database for `rows`."""
+    os.makedirs(data_dir, exist_ok=True)
+    source = os.path.join(data_dir, f"ideas-{rows}-{seed}.db")
+    if not os.path.exists(source):
+        print(f"Generating {rows} ideas into {source}...", flush=True)
+        started = time.perf_counter()
+        generate_database(source, rows, seed)
+        print(f"  done in {time.perf_counter() - started:.1f}s", flush=True)
+
+    # Write benchmarks change the data, so they run on a copy
+    work = os.path.join(data_dir, f"work-{rows}.db")
+    remove_database(work)
+    shutil.copyfile(source, work)
+    return work
+
+
+def clear_caches():
+    db.result_cache.clear()
+    db.detail_cache.clear()
+    db.fuzzy_distance.cache_clear()
+    db.prefix_distance.cache_clear()
+
+
+def measure(func, setup=None, repeat: int = REPEAT, max_seconds: float = MAX_SECONDS):
+    """Time func() and return summary statistics in milliseconds."""
+    times = []
+    budget_start = time.perf_counter()
+    while len(times) < repeat:
+        argument = setup() if setup is not None else None
+        started = time.perf_counter()
+        func() if argument is None else func(argument)
+        times.append((time.perf_counter() - started) * 1000)
+        if time.perf_counter() - budget_start > max_seconds:
+            break
+
+    times.sort()
+    return {
+        "runs": len(times),
+        "min_ms": round(times[0], 3),
+        "median_ms": round(statistics.median(times), 3),
+        "mean_ms": round(statistics.fmean(times), 3),
+        "p95_ms": round(times[min(len(times) - 1, math.ceil(0.95 * len(times)) - 1)], 3),
+    }
+
+
+def db_benchmarks(generator: Generator):
+    """(name, func, setup) for every db.py entry point. Reads start with cold caches
+    unless the name ends in _warm."""
+    rng = random.Random(7)
+    word = rng.choice(generator.words[TAG_COUNT:])
+    two_words = f"{rng.choice(generator.words)} {rng.choice(generator.words)[:3]}"
+    # The word with its last two letters swapped
+    misspelled = word[:-2] + word[-1] + word[-2]
+    tag = generator.tags[0]
+    max_id = db.count_ideas()
+
+    def scratch_category():
+        # 200 ideas to delete, inserted outside the timed part
+        db.insert_ideas(
+            (f"scratch {i}", SCRATCH_CATEGORY, "", "", 0, 0) for i in range(200)
+        )
+        clear_caches()
+
+    def random_idea():
+        idea = None
+        while idea is None:
+            idea = db.get_idea_detail(rng.randint(1, max_id))
+        clear_caches()
+        return idea
+
+    return [
+        ("get_all_ideas", db.get_all_ideas, clear_caches),
+        ("get_ideas_by_filter.all", lambda: db.get_ideas_by_filter(), clear_caches),
+        ("get_ideas_by_filter.category", lambda: db.get_ideas_by_filter("level"), clear_caches),
+        ("get_ideas_by_filter.category_warm", lambda: db.get_ideas_by_filter("level"), None),
+        ("get_ideas_by_filter.search_word", lambda: db.get_ideas_by_filter(search_text=word), clear_caches),
+        ("get_ideas_by_filter.search_prefix", lambda: db.get_ideas_by_filter(search_text=two_words), clear_caches),
+        ("get_ideas_by_filter.category_search",
+         lambda: db.get_ideas_by_filter("gameplay", word), clear_caches),
+        ("get_ideas_by_filter.tag", lambda: db.get_ideas_by_filter(tags=[tag]), clear_caches),
+        ("get_ideas_by_filter.title_sort", lambda: db.get_ideas_by_filter(sort="title"), clear_caches),
+        ("count_ideas.category", lambda: db.count_ideas("level"), clear_caches),
+        ("count_ideas.search", lambda: db.count_ideas(search_text=word), clear_caches),
+        ("get_ideas_page.fuzzy", lambda: db.get_ideas_page(search_text=misspelled, fuzzy=True), clear_caches),
+        ("get_ideas_page.first", lambda: db.get_ideas_page(limit=100), clear_caches),
+        ("get_ideas_range.middle", lambda: db.get_ideas_range(None, None, max_id // 2, 100), clear_caches),
+        ("locate_idea", lambda idea: db.locate_idea(idea.id), random_idea),
+        ("get_idea_detail", lambda idea: db.get_idea_detail(idea.id), random_idea),
+        ("create_new_idea", lambda: db.create_new_idea(*generator.idea()[:4]), None),
+        ("update_idea",
+         lambda idea: db.update_idea(idea.id, idea.title, idea.category, idea.description, idea.tags),
+         random_idea),
+        ("delete_ideas_by_category", lambda: db.delete_ideas_by_category(SCRATCH_CATEGORY), scratch_category),
+        ("insert_ideas.batch_1000", lambda: db.insert_ideas(generator.idea() for _ in range(1000)), None),
+    ]
+
+
+def app_benchmarks(word: str):
+    """Return (benchmarks, app) timing MainApp.load_ideas from the call until
+    the rows are drawn, or None if there is no display."""
+    import tkinter as tk
+    from main import MainApp
+
+    class BenchApp(MainApp):
+        """MainApp without the welcome popup, recording when a listing is shown."""
+
+        loaded = False
+
+        def welcome_message(self):
+            pass
+
+        def ideas_loaded(self, *args):
+            super().ideas_loaded(*args)
+            self.loaded = True
+
+    try:
+        app = BenchApp()
+    except tk.TclError:
+        return None
+
+    def load(filters):
+        def run():
+            app.loaded = False
+            app.load_ideas(dict(app.active_filters, **filters), None)
+            while not app.loaded:
+                app.update()
+            app.update_idletasks()
+        return run
+
+    # Let the initial listing finish first
+    load({})()
+    benchmarks = [
+        ("MainApp.load_ideas.all", load({"category": "all", "search_text": ""}), clear_caches),
+        ("MainApp.load_ideas.category", load({"category": "level", "search_text": ""}), clear_caches),
+        ("MainApp.load_ideas.search", load({"category": "all", "search_text": word}), clear_caches),
+    ]
+    return benchmarks, app
+
+
+def run_size(rows: int, data_dir: str, seed: int, include_app: bool):
+    path = prepare_database(data_dir, rows, seed)
+    db.DB_Path = path
+    db.init_db()
+    # Same vocabulary as the generated data, so searches and tags have matches
+    generator = Generator(seed)
+
+    results = {}
+    for name, func, setup in db_benchmarks(generator):
+        results[name] = measure(func, setup)
+        print(f"  {name:40} median {results[name]['median_ms']:10.3f} ms", flush=True)
+
+    if include_app:
+        benchmarks = app_benchmarks(generator.words[TAG_COUNT])
+        if benchmarks is None:
+            print("  MainApp benchmarks skipped: no display (try xvfb-run)", flush=True)
+        else:
+            benchmarks, app = benchmarks
+            for name, func, setup in benchmarks:
+                results[name] = measure(func, setup)
+                print(f"  {name:40} median {results[name]['median_ms']:10.3f} ms", flush=True)
+            app.executor.shutdown()
+            app.destroy()
+
+    db.close_pool()
+    remove_database(path)
+    return results
+
+
+def compare(results, baseline, threshold: float = REGRESSION_THRESHOLD):
+    """Print median changes against a baseline run; return the regressions."""
+    regressions = []
+    for size, benchmarks in results.items():
+        for name, stats in benchmarks.items():
+            before = baseline.get("results", {}).get(size, {}).get(name)
+            if before is None or not before["median_ms"]:
+                continue
+            ratio = stats["median_ms"] / before["median_ms"]
+            flag = "  REGRESSION" if ratio > threshold else ""
+            print(f"{size:>9} {name:40} {before['median_ms']:10.3f} -> {stats['median_ms']:10.3f} ms"
+                  f"  x{ratio:.2f}{flag}")
+            if flag:
+                regressions.append((size, name, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark db.py and MainApp on generated databases.")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="comma-separated row counts (default: %(default)s)")
+    parser.add_argument("--data-dir", default="bench_data", help="where generated databases are kept")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="median slowdown counted as a regression (default: %(default)s)")
+    parser.add_argument("--no-app", action="store_true", help="skip the MainApp benchmarks")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "seed": args.seed,
+        },
+        "results": {},
+    }
+
+    for rows in (int(size) for size in args.sizes.split(",")):
+        print(f"{rows} ideas", flush=True)
+        report["results"][str(rows)] = run_size(rows, args.data_dir, args.seed, not args.no_app)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare(report["results"], baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) slower than x{args.threshold} the baseline")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+import http.client
+import json
+import socket
+import threading
+from collections import OrderedDict
+from urllib.parse import quote, urlencode, urlsplit
+
+from db import Idea, EditConflict, DEFAULT_PAGE_SIZE
+from related import DEFAULT_RELATED, IndexNotReady
+
+# Seconds to wait for the service before a call fails
+REQUEST_TIMEOUT = 30
+# GET responses kept for conditional requests
+RESPONSE_CACHE_SIZE = 256
+
+
+class ServiceError(Exception):
+    """The service answered with an error status."""
+
+    def __init__(self, status: int, message: str, details=None):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        # The decoded JSON error body, if there was one
+        self.details = details or {}
+
+
+def filter_params(category=None, search_text=None, tags=None, match_all_tags=True, sort=None, fuzzy=False):
+    """Listing filters as service.py query parameters."""
+    params = {}
+    if category is not None:
+        params["category"] = category
+    if search_text:
+        params["search"] = search_text
+    if tags:
+        params["tag"] = list(tags)
+    if not match_all_tags:
+        params["any_tag"] = "1"
+    if sort is not None:
+        params["sort"] = sort
+    if fuzzy:
+        params["fuzzy"] = "1"
+    return params
+
+
+def idea_from_json(data):
+    return Idea(**data) if data is not None else None
+
+
+def matches_from_json(ideas):
+    """(idea, similarity) pairs from ideas with a "similarity" field."""
+    # The dicts may be cached responses, so they are not modified
+    return [
+        (Idea(**{name: value for name, value in data.items() if name != "similarity"}), data["similarity"])
+        for data in ideas
+    ]
+
+
+class RemoteQuery:
+    """InterruptibleQuery for client mode: cancel() aborts the request in flight.
+
+    Calls made inside `with query:` on one thread share that thread's HTTP
+    connection; cancel() shuts its socket down, so the waiting call fails
+    straight away instead of waiting for a result nobody wants.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.lock = threading.Lock()
+        self.connection = None
+        self.cancelled = False
+
+    def __enter__(self):
+        with self.lock:
+            if self.cancelled:
+                raise ConnectionAbortedError("interrupted")
+            self.connection = self.client.connection()
+        self.client.local.query = self
+        return self.connection
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.client.local.query = None
+        with self.lock:
+            self.connection = None
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            sock = self.connection.sock if self.connection is not None else None
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+
+class IdeaClient:
+    """The db.py functions MainApp uses, served by a running service.py.
+
+    Methods have the same names and return the same values as in db.py, so
+    MainApp can use this object or the db module interchangeably. Each
+    thread keeps one keep-alive connection. GET responses are remembered
+    with their ETag and revalidated with If-None-Match, so an unchanged
+    page or count costs a 304 instead of a new body.
+    """
+
+    def __init__(self, url: str):
+        parts = urlsplit(url if "//" in url else "//" + url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.local = threading.local()
+        self.responses = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = self.local.connection = http.client.HTTPConnection(
+                self.host, self.port, timeout=REQUEST_TIMEOUT
+            )
+        return connection
+
+    def request(self, method: str, path: str, params=None, body=None, missing_ok: bool = False):
+        """Send one request and return the decoded JSON response (None for 204/404)."""
+        url = path + ("?" + urlencode(params, doseq=True) if params else "")
+        headers = {}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+
+        cached = None
+        if method == "GET":
+            with self.lock:
+                cached = self.responses.get(url)
+            if cached is not None:
+                headers["If-None-Match"] = cached[0]
+
+        connection = self.connection()
+        # An idle keep-alive connection may have been closed by the service
+        # since its last use; the request never reached it, so send it again
+        reused = connection.sock is not None
+        try:
+            connection.request(method, url, data, headers)
+            response = connection.getresponse()
+            payload = response.read()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            connection.close()
+            query = getattr(self.local, "query", None)
+            if query is not None and query.cancelled:
+                raise ConnectionAbortedError("interrupted") from None
+            if not reused:
+                raise
+            connection.request(method, url, data, headers)
+            response = connection.getresponse()
+            payload = response.read()
+        except OSError:
+            connection.close()
+            raise
+
+        if response.status == http.client.NOT_MODIFIED and cached is not None:
+            with self.lock:
+                self.hits += 1
+                self.responses.move_to_end(url)
+            return cached[1]
+        if response.status == http.client.NO_CONTENT or (response.status == http.client.NOT_FOUND and missing_ok):
+            return None
+        if response.status >= 400:
+            try:
+                details = json.loads(payload)
+                message = details["error"]
+            except (ValueError, KeyError, TypeError):
+                details, message = None, response.reason
+            raise ServiceError(response.status, message, details)
+
+        result = json.loads(payload)
+        etag = response.getheader("ETag")
+        if method == "GET" and etag:
+            with self.lock:
+                self.misses += 1
+                self.responses[url] = (etag, result)
+                self.responses.move_to_end(url)
+                if len(self.responses) > RESPONSE_CACHE_SIZE:
+                    self.responses.popitem(last=False)
+        return result
+
+    def InterruptibleQuery(self):
+        return RemoteQuery(self)
+
+    def get_cache_stats(self):
+        """Conditional GET counters: hits are 304 responses."""
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.responses)}
+
+    # ----- users -----
+
+    def create_user(self, username: str, password: str) -> bool:
+        return self.request("POST", "/users", body={"username": username, "password": password})["created"]
+
+    def verify_user(self, username: str, password: str):
+        return self.request("POST", "/login", body={"username": username, "password": password})["valid"]
+
+    # ----- ideas -----
+
+    def create_new_idea(self, title: str, category: str, description: str, tags: str):
+        body = {"title": title, "category": category, "description": description, "tags": tags}
+        return self.request("POST", "/ideas", body=body)["id"]
+
+    def update_idea(self, idea_id: int, title: str, category: str, description: str, tags: str,
+                    version: int | None = None) -> int:
+        body = {"title": title, "category": category, "description": description, "tags": tags, "version": version}
+        try:
+            return self.request("PUT", f"/ideas/{idea_id}", body=body)["version"]
+        except ServiceError as error:
+            if error.status != http.client.CONFLICT:
+                raise
+            raise EditConflict(idea_id, idea_from_json(error.details.get("current"))) from None
+
+    def find_similar_ideas(self, title: str, description: str, exclude_id: int | None = None):
+        body = {"title": title, "description": description, "exclude_id": exclude_id}
+        return matches_from_json(self.request("POST", "/ideas/similar", body=body)["ideas"])
+
+    def get_related_ideas(self, idea_id: int, limit: int = DEFAULT_RELATED):
+        try:
+            ideas = self.request("GET", f"/ideas/{idea_id}/related", {"limit": limit})["ideas"]
+        except ServiceError as error:
+            if error.status == http.client.SERVICE_UNAVAILABLE:
+                raise IndexNotReady(error.details.get("error", str(error))) from None
+            raise
+        return matches_from_json(ideas) if ideas is not None else None
+
+    def delete_idea(self, idea_id: int):
+        self.request("DELETE", f"/ideas/{idea_id}")
+
+    def delete_ideas(self, idea_ids):
+        self.request("POST", "/ideas/delete", body={"ids": list(idea_ids)})
+
+    def edit_ideas(self, idea_ids, category: str | None = None, add_tags=(), remove_tags=()):
+        body = {"ids": list(idea_ids), "category": category,
+                "add_tags": list(add_tags), "remove_tags": list(remove_tags)}
+        self.request("POST", "/ideas/edit", body=body)
+
+    def count_ideas(self, category: str | None = None, search_text: str | None = None,
+                    tags=None, match_all_tags: bool = True, fuzzy: bool = False) -> int:
+        params = filter_params(category, search_text, tags, match_all_tags, fuzzy=fuzzy)
+        return self.request("GET", "/ideas/count", params)["count"]
+
+    def get_ideas_range(self, category: str | None, search_text: str | None, offset: int, limit: int,
+                        sort: str | None = None, tags=None, match_all_tags: bool = True, fuzzy: bool = False):
+        params = filter_params(category, search_text, tags, match_all_tags, sort, fuzzy)
+        params.update(offset=offset, limit=limit)
+        return [Idea(**data) for data in self.request("GET", "/ideas", params)["ideas"]]
+
+    def get_ideas_page(self, category: str | None = None, search_text: str | None = None, sort: str | None = None,
+                       after=None, limit: int = DEFAULT_PAGE_SIZE, tags=None, match_all_tags: bool = True,
+                       fuzzy: bool = False, offset: int = 0, before=None):
+        params = filter_params(category, search_text, tags, match_all_tags, sort, fuzzy)
+        params["limit"] = limit
+        if after is not None:
+            params["after"] = json.dumps(list(after))
+        if before is not None:
+            params["before"] = json.dumps(list(before))
+        if offset:
+            params["offset"] = offset
+        result = self.request("GET", "/ideas", params)
+        cursor = tuple(result["next"]) if result["next"] is not None else None
+        return [Idea(**data) for data in result["ideas"]], cursor
+
+    def get_ideas_by_filter(self, category: str | None = None, search_text: str | None = None,
+                            sort: str | None = None, tags=None, match_all_tags: bool = True, fuzzy: bool = False):
+        ideas, cursor = self.get_ideas_page(category, search_text, sort, None, DEFAULT_PAGE_SIZE,
+                                            tags, match_all_tags, fuzzy)
+        while cursor is not None:
+            page, cursor = self.get_ideas_page(category, search_text, sort, cursor, DEFAULT_PAGE_SIZE,
+                                               tags, match_all_tags, fuzzy)
+            ideas.extend(page)
+        return ideas
+
+    def locate_idea(self, idea_id: int, category: str | None = None, search_text: str | None = None,
+                    sort: str | None = None, tags=None, match_all_tags: bool = True, fuzzy: bool = False):
+        params = filter_params(category, search_text, tags, match_all_tags, sort, fuzzy)
+        result = self.request("GET", f"/ideas/{idea_id}/position", params)
+        return result["index"], idea_from_json(result["idea"])
+
+    def get_idea_detail(self, idea_id: int):
+        return idea_from_json(self.request("GET", f"/ideas/{idea_id}", missing_ok=True))
+
+    def cached_idea_detail(self, idea_id: int):
+        # Every detail is revalidated with the service, which is a 304 when unchanged
+        return None
+
+    def get_idea_details(self, idea_ids):
+        idea_ids = list(idea_ids)
+        if not idea_ids:
+            return {}
+        ideas = self.request("GET", "/ideas/details", {"id": idea_ids})["ideas"]
+        return {data["id"]: Idea(**data) for data in ideas}
+
+    def get_change_seq(self) -> int:
+        return self.request("GET", "/changes")["seq"]
+
+    def get_changes(self, since: int, limit: int | None = None):
+        params = {"since": since}
+        if limit is not None:
+            params["limit"] = limit
+        result = self.request("GET", "/changes", params)
+        changes = result["changes"]
+        return result["seq"], [tuple(change) for change in changes] if changes is not None else None
+
+    def get_all_tags(self):
+        return [tuple(tag) for tag in self.request("GET", "/tags")["tags"]]
+
+    # ----- categories -----
+
+    def get_categories(self):
+        return [tuple(category) for category in self.request("GET", "/categories")["categories"]]
+
+    def get_category_count(self, category: str) -> int:
+        return self.request("GET", f"/categories/{quote(category, safe='')}/count")["count"]
+
+    def create_category(self, name: str) -> bool:
+        return self.request("POST", "/categories", body={"name": name})["created"]
+
+    def delete_category(self, name: str, with_ideas: bool = False, fallback: str = "uncategorized"):
+        params = {"delete_ideas": "1" if with_ideas else "0", "fallback": fallback}
+        self.request("DELETE", f"/categories/{quote(name, safe='')}", params)
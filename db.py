@@ -1,187 +1,2194 @@
+import functools
+import json
+import logging
+import queue
+import random
+import re
 import sqlite3
-from datetime import datetime
+import sys
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+
+import minhash
+from metrics import metrics, log_slow_call
 
 DB_Path = "ideas.db"
 
+# Connection pool tuning
+POOL_SIZE = 4
+BUSY_TIMEOUT_MS = 5000
+STATEMENT_CACHE_SIZE = 256
+
+# Bumped whenever init_db() gains a migration
+SCHEMA_VERSION = 4
+
+# Categories every new database starts with
+DEFAULT_CATEGORIES = ["uncategorized", "gameplay", "character", "level", "skin", "operation"]
+
+# Markers wrapped around matched terms in search snippets
+SNIPPET_START = "\x02"
+SNIPPET_END = "\x03"
+
+# bm25 column weights for (title, description, tags)
+SEARCH_WEIGHTS = (10.0, 1.0, 5.0)
+
+# Calls slower than this go to the slow-query log, with their query plans
+SLOW_QUERY_MS = 100
+# Statements kept per call for the slow-query log
+MAX_TRACED_STATEMENTS = 50
+# String, blob and number literals; traced statements come with their
+# parameters expanded, so these are masked before being logged
+LITERAL_PATTERN = re.compile(r"(?<!\w)[xX]?'(?:[^']|'')*'|(?<![\w.])\d+(?:\.\d+)?(?:[eE][-+]?\d+)?(?![\w.])")
+
+# Retries of a write that found the database locked, with exponential backoff
+WRITE_RETRIES = 4
+RETRY_BASE_DELAY = 0.05
+RETRY_MAX_DELAY = 1.0
+
+# Entries kept in the change log; clients further behind reload instead
+CHANGE_LOG_SIZE = 10000
+# Changes returned per get_changes() call; more than that means reload
+CHANGE_BATCH_SIZE = 500
+
+# Near-duplicate detection: estimated share of word pairs two ideas must
+# have in common to count as similar
+SIMILARITY_THRESHOLD = 0.5
+# Candidates from the LSH buckets compared per lookup, most shared bands first
+SIMILAR_CANDIDATES = 200
+# Ideas signed per transaction by index_signatures()
+SIGNATURE_BATCH_SIZE = 1000
+
+# Fuzzy search re-ranks this many ideas sharing the most trigrams with the
+# search text; more finds worse typos in common words but costs more
+FUZZY_CANDIDATES = 500
+# Trigrams found in more ideas than this are too costly to rank candidates by
+FUZZY_COMMON_TRIGRAM = 10000
+# Recent local transactions whose change log seqs the pool remembers, to
+# tell this process's commits from other processes'
+LOCAL_CHANGE_RANGES = 1024
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection that can carry per-connection bookkeeping."""
+
+    # PRAGMA data_version, the change log seq and the commits of the other
+    # pooled connections when the result cache last checked this connection
+    seen_data_version = None
+    seen_change_seq = None
+    seen_other_commits = None
+    # Transactions committed on this connection
+    commits = 0
+    # (data_version, total_changes, sequence) when get_changes() last found nothing new
+    seen_changes = None
+
+
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections, checked out per thread."""
+
+    def __init__(self, path: str, size: int = POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._closed = False
+        # Transactions committed through this pool, i.e. by this process
+        self.local_commits = 0
+        # (first, last] change log seqs written by each recent local transaction
+        self.local_changes = deque(maxlen=LOCAL_CHANGE_RANGES)
+
+    def _open(self):
+        connection = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            check_same_thread=False,
+            isolation_level=None,
+            factory=PooledConnection,
+        )
+        connection.row_factory = sqlite3.Row
+        connection.set_trace_callback(trace_statement)
+        connection.create_function("fuzzy_distance", 3, fuzzy_distance, deterministic=True)
+        connection.execute("PRAGMA journal_mode = WAL;")
+        connection.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS};")
+        connection.execute("PRAGMA synchronous = NORMAL;")
+        return connection
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if can_open:
+            try:
+                return self._open()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+
+        # Pool is full, wait for another thread to hand a connection back
+        try:
+            return self._idle.get(timeout=BUSY_TIMEOUT_MS / 1000)
+        except queue.Empty:
+            raise sqlite3.OperationalError("connection pool exhausted") from None
+
+    def _release(self, connection):
+        if connection.in_transaction:
+            connection.rollback()
+        if self._closed:
+            connection.close()
+        else:
+            self._idle.put(connection)
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection; nested calls on one thread share it."""
+        held = getattr(self._local, "connection", None)
+        if held is not None:
+            yield held
+            return
+
+        connection = self._acquire()
+        self._local.connection = connection
+        try:
+            yield connection
+        finally:
+            self._local.connection = None
+            self._release(connection)
+
+    def in_transaction(self) -> bool:
+        """True while this thread is inside a transaction() block."""
+        held = getattr(self._local, "connection", None)
+        return held is not None and held.in_transaction
+
+    @contextmanager
+    def transaction(self):
+        """Run a write transaction, committed when the outermost block exits."""
+        with self.connection() as connection:
+            if connection.in_transaction:
+                yield connection
+                return
+
+            connection.execute("BEGIN IMMEDIATE;")
+            # Nobody else can write until the commit, so the seqs in between are ours
+            first = change_log_seq(connection)
+            try:
+                yield connection
+                last = change_log_seq(connection)
+            except BaseException:
+                connection.rollback()
+                raise
+            connection.commit()
+            connection.commits += 1
+            with self._lock:
+                self.local_commits += 1
+                if first is not None and last is not None and last > first:
+                    self.local_changes.append((first, last))
+
+    def local_changes_between(self, first: int, last: int) -> int:
+        """How many of the change log seqs in (first, last] this process wrote."""
+        with self._lock:
+            ranges = list(self.local_changes)
+        return sum(max(0, min(end, last) - max(start, first)) for start, end in ranges)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return the shared pool, reopening it if DB_Path or POOL_SIZE has changed."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.path != DB_Path or _pool.size != POOL_SIZE:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(DB_Path, POOL_SIZE)
+        return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def pooled_connection():
+    return get_pool().connection()
+
+
+def change_log_seq(connection):
+    """The last seq handed out by the change log, or None before it exists."""
+    try:
+        row = connection.execute("SELECT seq FROM sqlite_sequence WHERE name = 'idea_changes';").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row is not None else 0
+
+
+def transaction():
+    return get_pool().transaction()
+
+
+class InterruptibleQuery:
+    """Pins a pooled connection for a block so another thread can abort it.
+
+    Every db.py call made inside `with query:` on the same thread runs on
+    that connection. cancel() interrupts whatever statement is running
+    (sqlite3 raises OperationalError "interrupted") and makes a block that
+    has not started yet fail immediately.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connection = None
+        self.cancelled = False
+        self.checkout = None
+
+    def __enter__(self):
+        self.checkout = pooled_connection()
+        connection = self.checkout.__enter__()
+        with self.lock:
+            self.connection = connection
+            cancelled = self.cancelled
+        if cancelled:
+            self.__exit__(None, None, None)
+            raise sqlite3.OperationalError("interrupted")
+        return connection
+
+    def __exit__(self, exc_type, exc, traceback):
+        # Release under the lock so cancel() never hits a reused connection
+        with self.lock:
+            self.connection = None
+        return self.checkout.__exit__(exc_type, exc, traceback)
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            if self.connection is not None:
+                self.connection.interrupt()
+
+
+# Every executed statement at DEBUG level, when enabled
+statement_log = logging.getLogger("gib.sql")
+# Statements run by the db.py call in progress on each thread
+_call_state = threading.local()
+
+
+def trace_statement(sql: str):
+    """sqlite3 trace callback, set on every pooled connection."""
+    statements = getattr(_call_state, "statements", None)
+    # Statements starting with "--" are SQLite's own, e.g. from inside FTS5
+    if statements is not None and len(statements) < MAX_TRACED_STATEMENTS and not sql.startswith("--"):
+        statements.append(sql)
+    if statement_log.isEnabledFor(logging.DEBUG):
+        statement_log.debug(mask_literals(sql))
+
+
+def mask_literals(sql: str) -> str:
+    """Replace the literal values of a traced statement with ? placeholders."""
+    return LITERAL_PATTERN.sub("?", sql)
+
+
+@contextmanager
+def untraced(connection):
+    """Suspend the statement trace for bulk work, where tracing every row
+    (and FTS5's own statements) would cost more than the inserts themselves."""
+    connection.set_trace_callback(None)
+    try:
+        yield
+    finally:
+        connection.set_trace_callback(trace_statement)
 
-def new_connection():
-    connection = sqlite3.connect(DB_Path)
-    connection.row_factory = sqlite3.Row
-    return connection
 
+def timed(func):
+    """Record a db.py call in the latency histograms; slow calls are logged
+    with the statements they ran and the plans of their queries."""
+    name = func.__name__
 
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # Nested calls are timed too, but only the outermost one is logged
+        outermost = getattr(_call_state, "statements", None) is None
+        if outermost:
+            _call_state.statements = []
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            metrics.record(name, elapsed)
+            if outermost:
+                statements = _call_state.statements
+                _call_state.statements = None
+                if elapsed >= SLOW_QUERY_MS:
+                    log_slow_call(describe_slow_call(name, elapsed, args, kwargs, statements))
+
+    return wrapper
+
+
+def is_lock_error(error: sqlite3.OperationalError) -> bool:
+    message = str(error)
+    return "locked" in message or "busy" in message
+
+
+def retry_locked(func):
+    """Re-run a write that failed because another writer held the lock.
+
+    Waits about 50 ms, 100 ms, 200 ms... between attempts, with jitter so
+    writers that collided once do not collide again. A call nested in a
+    transaction is not retried on its own; its outermost call is.
+    Retries are counted in the metrics as "<name>.lock_retry".
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        for attempt in range(WRITE_RETRIES + 1):
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as error:
+                if attempt == WRITE_RETRIES or not is_lock_error(error) or get_pool().in_transaction():
+                    raise
+            delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt) * random.uniform(0.5, 1.0)
+            metrics.record(f"{func.__name__}.lock_retry", delay * 1000)
+            time.sleep(delay)
+
+    return wrapper
+
+
+def describe_argument(value) -> str:
+    """A call argument as its type, and length if it has one: never its value,
+    which may be a password or the text of an idea."""
+    kind = type(value).__name__
+    try:
+        return f"{kind}[{len(value)}]"
+    except TypeError:
+        return kind
+
+
+def describe_slow_call(name: str, elapsed: float, args, kwargs, statements):
+    arguments = ", ".join(
+        [describe_argument(arg) for arg in args]
+        + [f"{key}={describe_argument(value)}" for key, value in kwargs.items()]
+    )
+    lines = [f"{name}({arguments}) took {elapsed:.1f} ms, {len(statements)} statement(s)"]
+
+    for sql in dict.fromkeys(mask_literals(sql) for sql in statements):
+        lines.append("  " + " ".join(sql.split())[:500])
+        if sql.lstrip().upper().startswith(("SELECT", "WITH")):
+            lines.extend("    plan: " + detail for detail in explain_query_plan(sql))
+    return "\n".join(lines)
+
+
+def explain_query_plan(sql: str):
+    """Return the EXPLAIN QUERY PLAN lines for a traced query, literals masked
+    or not; placeholders left unbound plan like any other value."""
+    try:
+        with pooled_connection() as connection:
+            rows = connection.execute("EXPLAIN QUERY PLAN " + sql, [None] * sql.count("?")).fetchall()
+    except sqlite3.Error as error:
+        return [f"unavailable ({error})"]
+    return [row["detail"] for row in rows]
+
+
+IDEAS_TABLE = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        category TEXT NOT NULL,
+        description TEXT NOT NULL,
+        tags TEXT,
+        created_at INTEGER NOT NULL,
+        updated_at INTEGER NOT NULL,
+        version INTEGER NOT NULL DEFAULT 1
+    );
+"""
+
+
+@timed
 def init_db():
-    connection = new_connection()
-    cursor = connection.cursor()
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS ideas (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            category TEXT NOT NULL,
-            description TEXT NOT NULL,
-            tags TEXT,
-            created_at TEXT NOT NULL,
-            updated_at TEXT NOT NULL
+    with transaction() as connection:
+        cursor = connection.cursor()
+
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ideas';")
+        fresh = cursor.fetchone() is None
+        cursor.execute("PRAGMA user_version;")
+        version = cursor.fetchone()[0]
+
+        cursor.execute(IDEAS_TABLE.format(name="ideas"))
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT UNIQUE NOT NULL,
+                password TEXT NOT NULL
+            );
+        """)
+
+        create_tag_tables(cursor)
+        create_category_table(cursor)
+        create_import_table(cursor)
+        create_change_log(cursor)
+
+        # Bring older databases up to the current schema
+        if not fresh:
+            for migration in MIGRATIONS[version:]:
+                migration(cursor)
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
+
+        create_search_index(cursor)
+        create_trigram_index(cursor)
+        create_list_indexes(cursor)
+        create_tag_triggers(cursor)
+        create_category_triggers(cursor)
+        create_change_triggers(cursor)
+        create_similarity_index(cursor)
+
+        cursor.execute("SELECT COUNT(*) FROM users;")
+        count = cursor.fetchone()[0]
+
+        if count == 0:
+            cursor.execute("""
+                INSERT INTO users (username, password)
+                VALUES (?, ?);
+            """, ("zyz", "123456"))
+
+
+def migrate_epoch_timestamps(cursor):
+    """Version 1: store created_at/updated_at as integer epoch milliseconds.
+
+    Older rows hold local times as "%Y-%m-%d %H:%M" or ISO 8601 text. The
+    columns had TEXT affinity, so the table is rebuilt with INTEGER columns.
+    """
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'ideas';")
+    sequence = cursor.fetchone()
+
+    cursor.execute(IDEAS_TABLE.format(name="ideas_migrated"))
+    cursor.execute("""
+        INSERT INTO ideas_migrated (id, title, category, description, tags, created_at, updated_at)
+        SELECT id, title, category, description, tags,
+               COALESCE(CAST(strftime('%s', created_at, 'utc') AS INTEGER), 0) * 1000,
+               COALESCE(CAST(strftime('%s', updated_at, 'utc') AS INTEGER), 0) * 1000
+        FROM ideas;
+    """)
+    # Dropping the table also drops the search triggers; they are recreated
+    cursor.execute("DROP TABLE ideas;")
+    cursor.execute("ALTER TABLE ideas_migrated RENAME TO ideas;")
+
+    if sequence is not None:
+        cursor.execute(
+            "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'ideas';",
+            (sequence[0],),
+        )
+
+
+def migrate_normalized_tags(cursor):
+    """Version 2: fill tags/idea_tags from the comma-separated ideas.tags column."""
+    cursor.execute("SELECT id, tags FROM ideas WHERE tags IS NOT NULL AND tags != '';")
+    for idea_id, tags in cursor.fetchall():
+        set_idea_tags(cursor, idea_id, tags)
+
+
+def migrate_category_counts(cursor):
+    """Version 3: persist categories, including ones only found on ideas, with counts."""
+    cursor.execute("""
+        INSERT OR IGNORE INTO categories (name)
+        SELECT DISTINCT category FROM ideas ORDER BY category;
+    """)
+    cursor.execute("""
+        UPDATE categories
+        SET idea_count = (SELECT COUNT(*) FROM ideas WHERE ideas.category = categories.name);
+    """)
+
+
+# MIGRATIONS[n] upgrades a database from user_version n to n + 1
+def migrate_idea_versions(cursor):
+    """Version 4: a version counter per idea for optimistic concurrency."""
+    cursor.execute("SELECT 1 FROM pragma_table_info('ideas') WHERE name = 'version';")
+    # Tables rebuilt by migrate_epoch_timestamps already have it
+    if cursor.fetchone() is None:
+        cursor.execute("ALTER TABLE ideas ADD COLUMN version INTEGER NOT NULL DEFAULT 1;")
+
+
+MIGRATIONS = [
+    migrate_epoch_timestamps,
+    migrate_normalized_tags,
+    migrate_category_counts,
+    migrate_idea_versions,
+]
+
+
+def create_tag_tables(cursor):
+    """Tags as rows: one per distinct name, plus an (tag, idea) inverted index."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL COLLATE NOCASE
+        );
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS idea_tags (
+            tag_id INTEGER NOT NULL REFERENCES tags (id),
+            idea_id INTEGER NOT NULL REFERENCES ideas (id),
+            PRIMARY KEY (tag_id, idea_id)
+        ) WITHOUT ROWID;
+    """)
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idea_tags_idea_id ON idea_tags (idea_id);")
+
+
+def create_tag_triggers(cursor):
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS ideas_tags_delete AFTER DELETE ON ideas BEGIN
+            DELETE FROM idea_tags WHERE idea_id = old.id;
+        END;
+    """)
+
+
+def create_category_table(cursor):
+    """Categories in display order, each with a materialized idea count."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'categories';")
+    exists = cursor.fetchone() is not None
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL,
+            idea_count INTEGER NOT NULL DEFAULT 0
         );
     """)
 
+    if not exists:
+        cursor.executemany(
+            "INSERT OR IGNORE INTO categories (name) VALUES (?);",
+            [(name,) for name in DEFAULT_CATEGORIES],
+        )
+
+
+def create_category_triggers(cursor):
+    """Keep categories.idea_count equal to the number of ideas in each category."""
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS ideas_category_insert AFTER INSERT ON ideas BEGIN
+            INSERT OR IGNORE INTO categories (name) VALUES (new.category);
+            UPDATE categories SET idea_count = idea_count + 1 WHERE name = new.category;
+        END;
+    """)
+
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL
+        CREATE TRIGGER IF NOT EXISTS ideas_category_delete AFTER DELETE ON ideas BEGIN
+            UPDATE categories SET idea_count = idea_count - 1 WHERE name = old.category;
+        END;
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS ideas_category_update
+        AFTER UPDATE OF category ON ideas
+        WHEN old.category IS NOT new.category BEGIN
+            INSERT OR IGNORE INTO categories (name) VALUES (new.category);
+            UPDATE categories SET idea_count = idea_count - 1 WHERE name = old.category;
+            UPDATE categories SET idea_count = idea_count + 1 WHERE name = new.category;
+        END;
+    """)
+
+
+def create_change_log(cursor):
+    """Append-only log of idea and category changes, read by get_changes().
+
+    action is "insert", "update" or "delete" for one idea, "category" when
+    a category was added or removed, and "reset" when so much changed at
+    once (a bulk import) that clients should reload.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS idea_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            idea_id INTEGER,
+            action TEXT NOT NULL
         );
     """)
 
-    cursor.execute("SELECT COUNT(*) FROM users;")
-    count = cursor.fetchone()[0]
+    # Every 1000th entry trims the log to its last CHANGE_LOG_SIZE entries
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS idea_changes_trim AFTER INSERT ON idea_changes
+        WHEN new.seq % 1000 = 0 BEGIN
+            DELETE FROM idea_changes WHERE seq <= new.seq - {CHANGE_LOG_SIZE};
+        END;
+    """)
+
+
+def create_change_triggers(cursor):
+    """Log every write to ideas and categories in idea_changes."""
+    for action, event, row in (("insert", "INSERT", "new"), ("update", "UPDATE", "new"), ("delete", "DELETE", "old")):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS ideas_log_{action} AFTER {event} ON ideas BEGIN
+                INSERT INTO idea_changes (idea_id, action) VALUES ({row}.id, '{action}');
+            END;
+        """)
+
+    for event in ("INSERT", "DELETE"):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS categories_log_{event.lower()} AFTER {event} ON categories BEGIN
+                INSERT INTO idea_changes (action) VALUES ('category');
+            END;
+        """)
+
 
-    if count == 0:
+def parse_tags(tags: str | None):
+    """Split a comma-separated tag string into unique, trimmed names."""
+    names = []
+    seen = set()
+    for name in (tags or "").split(","):
+        name = name.strip()
+        if name and name.lower() not in seen:
+            seen.add(name.lower())
+            names.append(name)
+    return names
+
+
+def set_idea_tags(cursor, idea_id: int, tags: str | None):
+    """Replace an idea's rows in idea_tags with the tags in a tag string."""
+    cursor.execute("DELETE FROM idea_tags WHERE idea_id = ?;", (idea_id,))
+    names = [(name,) for name in parse_tags(tags)]
+    cursor.executemany("INSERT OR IGNORE INTO tags (name) VALUES (?);", names)
+    cursor.executemany("""
+        INSERT OR IGNORE INTO idea_tags (tag_id, idea_id)
+        SELECT id, ? FROM tags WHERE name = ?;
+    """, [(idea_id, name) for (name,) in names])
+
+
+@timed
+def get_all_tags():
+    """Return every tag name with the number of ideas using it, most used first."""
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
         cursor.execute("""
-            INSERT INTO users (username, password)
-            VALUES (?, ?);
-        """, ("zyz", "123456"))
+            SELECT tags.name, COUNT(idea_tags.idea_id) AS idea_count
+            FROM tags
+            JOIN idea_tags ON idea_tags.tag_id = tags.id
+            GROUP BY tags.id
+            ORDER BY idea_count DESC, tags.name;
+        """)
+        return [(row["name"], row["idea_count"]) for row in cursor.fetchall()]
+
 
-    connection.commit()
-    connection.close()
+def create_import_table(cursor):
+    """Resume positions of bulk imports, saved with each committed batch."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS import_progress (
+            source TEXT PRIMARY KEY,
+            position INTEGER NOT NULL
+        );
+    """)
 
 
-def create_new_idea(title: str, category: str, description: str, tags: str):
-    time_now = datetime.now().strftime("%Y-%m-%d %H:%M")
-    connection = new_connection()
-    cursor = connection.cursor()
+def create_list_indexes(cursor):
+    """Indexes that serve the sorted listings without a temp B-tree sort."""
+    cursor.execute("CREATE INDEX IF NOT EXISTS ideas_created_at ON ideas (created_at);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ideas_category_created_at ON ideas (category, created_at);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ideas_updated_at ON ideas (updated_at);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ideas_category_updated_at ON ideas (category, updated_at);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ideas_title ON ideas (title COLLATE NOCASE, id);")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS ideas_category_title ON ideas (category, title COLLATE NOCASE, id);"
+    )
+
+
+def now_ms() -> int:
+    """Current time as integer epoch milliseconds, the stored timestamp format."""
+    return int(time.time() * 1000)
+
+
+def create_search_index(cursor):
+    """Create the FTS5 index over ideas and its sync triggers, filling it if new."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'ideas_fts';")
+    exists = cursor.fetchone() is not None
 
     cursor.execute("""
-        INSERT INTO ideas (title, category, description, tags, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?);
-    """, (title, category, description, tags, time_now, time_now))
+        CREATE VIRTUAL TABLE IF NOT EXISTS ideas_fts USING fts5(
+            title, description, tags,
+            content = 'ideas',
+            content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2'
+        );
+    """)
 
-    connection.commit()
-    idea_id = cursor.lastrowid
-    connection.close()
-    return idea_id
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS ideas_fts_insert AFTER INSERT ON ideas BEGIN
+            INSERT INTO ideas_fts (rowid, title, description, tags)
+            VALUES (new.id, new.title, new.description, new.tags);
+        END;
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS ideas_fts_delete AFTER DELETE ON ideas BEGIN
+            INSERT INTO ideas_fts (ideas_fts, rowid, title, description, tags)
+            VALUES ('delete', old.id, old.title, old.description, old.tags);
+        END;
+    """)
 
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS ideas_fts_update
+        AFTER UPDATE OF title, description, tags ON ideas BEGIN
+            INSERT INTO ideas_fts (ideas_fts, rowid, title, description, tags)
+            VALUES ('delete', old.id, old.title, old.description, old.tags);
+            INSERT INTO ideas_fts (rowid, title, description, tags)
+            VALUES (new.id, new.title, new.description, new.tags);
+        END;
+    """)
 
-def get_all_ideas():
-    connection = new_connection()
-    cursor = connection.cursor()
+    # Databases created before the index existed need their rows indexed once
+    if not exists:
+        cursor.execute("INSERT INTO ideas_fts (ideas_fts) VALUES ('rebuild');")
+
+
+def create_trigram_index(cursor):
+    """Create the FTS5 trigram index over titles and tags used by fuzzy search."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'ideas_trigram';")
+    exists = cursor.fetchone() is not None
 
     cursor.execute("""
-        SELECT id, title, category, description, tags, created_at, updated_at
-        FROM ideas
-        ORDER BY created_at DESC;
+        CREATE VIRTUAL TABLE IF NOT EXISTS ideas_trigram USING fts5(
+            title, tags,
+            content = 'ideas',
+            content_rowid = 'id',
+            tokenize = 'trigram'
+        );
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS ideas_trigram_insert AFTER INSERT ON ideas BEGIN
+            INSERT INTO ideas_trigram (rowid, title, tags) VALUES (new.id, new.title, new.tags);
+        END;
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS ideas_trigram_delete AFTER DELETE ON ideas BEGIN
+            INSERT INTO ideas_trigram (ideas_trigram, rowid, title, tags)
+            VALUES ('delete', old.id, old.title, old.tags);
+        END;
     """)
-    rows = cursor.fetchall()
-    connection.close()
-    return [dict(row) for row in rows]
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS ideas_trigram_update AFTER UPDATE OF title, tags ON ideas BEGIN
+            INSERT INTO ideas_trigram (ideas_trigram, rowid, title, tags)
+            VALUES ('delete', old.id, old.title, old.tags);
+            INSERT INTO ideas_trigram (rowid, title, tags) VALUES (new.id, new.title, new.tags);
+        END;
+    """)
+
+    if not exists:
+        cursor.execute("INSERT INTO ideas_trigram (ideas_trigram) VALUES ('rebuild');")
+
+
+@timed
+def rebuild_search_index():
+    with transaction() as connection:
+        connection.execute("INSERT INTO ideas_fts (ideas_fts) VALUES ('rebuild');")
+        connection.execute("INSERT INTO ideas_trigram (ideas_trigram) VALUES ('rebuild');")
+
+
+def search_words(text: str):
+    """Split text into lowercase words the way the FTS5 tokenizer does."""
+    text = text.casefold()
+    # ASCII has nothing to decompose
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(char for char in text if not unicodedata.combining(char))
+    return re.findall(r"[^\W_]+", text)
+
+
+def build_match_query(search_text: str):
+    """Turn free text into an FTS5 query: every word must match as a prefix."""
+    words = search_words(search_text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def build_trigram_query(cursor, search_text: str):
+    """FTS5 query for the trigram index and the order to pick candidates in,
+    or None if the search words have no trigrams.
+
+    Ranking every idea that shares a common trigram ("ing", "the") with the
+    search text would cost more than the rest of the search, so trigrams in
+    more than FUZZY_COMMON_TRIGRAM ideas are left out. If all of them are
+    that common, the newest ideas containing the rarest one are the
+    candidates.
+    """
+    trigrams = sorted({word[i:i + 3] for word in search_words(search_text) for i in range(len(word) - 2)})
+    if not trigrams:
+        return None
+
+    counts = []
+    for trigram in trigrams:
+        # Counting stops past the limit, which keeps common trigrams cheap
+        cursor.execute(
+            "SELECT COUNT(*) FROM (SELECT 1 FROM ideas_trigram WHERE ideas_trigram MATCH ? LIMIT ?);",
+            (f'"{trigram}"', FUZZY_COMMON_TRIGRAM + 1),
+        )
+        count = cursor.fetchone()[0]
+        # Trigrams no idea contains, usually made by a typo, add nothing
+        if count:
+            counts.append((count, trigram))
+
+    chosen = [trigram for count, trigram in counts if count <= FUZZY_COMMON_TRIGRAM]
+    if chosen:
+        return " OR ".join(f'"{trigram}"' for trigram in chosen), "rank"
+    rarest = min(counts)[1] if counts else trigrams[0]
+    return f'"{rarest}"', "rowid DESC"
+
+
+def allowed_typos(word: str) -> int:
+    """Edits a search word may be off by: none for short words, two for long ones."""
+    return 0 if len(word) < 3 else 1 if len(word) < 6 else 2
+
+
+@functools.lru_cache(maxsize=65536)
+def prefix_distance(word: str, other: str, limit: int) -> int:
+    """Edits (insertions, deletions, substitutions and swaps of neighbours)
+    between `word` and the closest prefix of `other`, or limit + 1 if more
+    than `limit`. Matching prefixes keeps words still being typed found."""
+    # Longer prefixes cannot be within the limit
+    other = other[:len(word) + limit]
+    too_far = limit + 1
+    # Each letter missing from the other word takes an edit of its own
+    if len(set(word).difference(other)) > limit:
+        return too_far
+
+    # Only cells within `limit` of the diagonal can stay within the limit
+    size = len(other)
+    before = None
+    previous = [j if j <= limit else too_far for j in range(size + 1)]
+    for i, char in enumerate(word, 1):
+        current = [i if i <= limit else too_far] + [too_far] * size
+        for j in range(max(1, i - limit), min(size, i + limit) + 1):
+            other_char = other[j - 1]
+            distance = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other_char))
+            if i > 1 and j > 1 and char == other[j - 2] and word[i - 2] == other_char:
+                distance = min(distance, before[j - 2] + 1)
+            current[j] = distance
+        if min(current) > limit:
+            return too_far
+        before, previous = previous, current
+    return min(min(previous), too_far)
 
 
-def get_ideas_by_filter(category: str | None = None, search_text: str | None = None):
-    connection = new_connection()
-    cursor = connection.cursor()
+@functools.lru_cache(maxsize=FUZZY_CANDIDATES * 4)
+def fuzzy_distance(search_text: str, title: str, tags: str | None):
+    """Total typos between the search words and the closest words of a title
+    and tags, or None if any search word is further off than allowed_typos().
 
-    query = """
-        SELECT id, title, category, description, tags, created_at, updated_at
-        FROM ideas
-        WHERE 1 = 1
+    Registered as an SQL function; the cache spares computing it twice when
+    a query filters and sorts on it.
     """
-    parameters = []
+    words = search_words(f"{title} {tags or ''}")
+    total = 0
+    for search_word in search_words(search_text):
+        limit = allowed_typos(search_word)
+        best = limit + 1
+        for word in words:
+            best = min(best, prefix_distance(search_word, word, limit))
+            if best == 0:
+                break
+        if best > limit:
+            return None
+        total += best
+    return total
 
-    if category and category.lower() != "all":
-        query += " AND category = ?"
-        parameters.append(category)
 
-    if search_text:
-        query += " AND (title LIKE ? OR description LIKE ?)"
-        like = f"%{search_text}%"
-        parameters.extend([like, like])
+def idea_matches(idea, search_text: str) -> bool:
+    """Check in memory whether an idea would match a full-text search."""
+    words = set(search_words(f"{idea.title} {idea.description} {idea.tags or ''}"))
+    return all(any(word.startswith(prefix) for word in words) for prefix in search_words(search_text))
 
-    query += " ORDER BY created_at DESC;"
 
-    cursor.execute(query, parameters)
-    rows = cursor.fetchall()
-    connection.close()
-    return [dict(row) for row in rows]
+def is_search_refinement(old_text: str, new_text: str) -> bool:
+    """True if every match for new_text is also a match for old_text."""
+    return bool(search_words(old_text)) and new_text.startswith(old_text)
 
 
-def update_idea(idea_id: int, title: str, category: str, description: str, tags: str):
-    time_now = datetime.now().isoformat(timespec="seconds")
-    connection = new_connection()
-    cursor = connection.cursor()
+def create_similarity_index(cursor):
+    """MinHash signatures of idea texts and their LSH band buckets (see minhash.py).
+
+    An idea without a row in idea_signatures has not been signed yet (bulk
+    imports and ideas from before this table leave that to index_signatures(),
+    which start_signing() runs at startup); a NULL signature means its text
+    has no words.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS idea_signatures (
+            idea_id INTEGER PRIMARY KEY,
+            signature BLOB
+        );
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS idea_buckets (
+            bucket INTEGER NOT NULL,
+            idea_id INTEGER NOT NULL,
+            PRIMARY KEY (bucket, idea_id)
+        ) WITHOUT ROWID;
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idea_buckets_idea ON idea_buckets (idea_id);")
 
     cursor.execute("""
-        UPDATE ideas
-        SET title = ?, category = ?, description = ?, tags = ?, updated_at = ?
-        WHERE id = ?;
-    """, (title, category, description, tags, time_now, idea_id))
+        CREATE TRIGGER IF NOT EXISTS ideas_signature_delete AFTER DELETE ON ideas BEGIN
+            DELETE FROM idea_signatures WHERE idea_id = old.id;
+            DELETE FROM idea_buckets WHERE idea_id = old.id;
+        END;
+    """)
+
+
+def text_signature(title: str, description: str):
+    """MinHash signature of an idea's title and description, or None."""
+    return minhash.signature(search_words(f"{title} {description or ''}"))
+
+
+def set_idea_signatures(cursor, idea_signatures):
+    """Store (idea_id, signature) pairs and replace those ideas' bucket rows."""
+    idea_signatures = list(idea_signatures)
+    cursor.execute(
+        "DELETE FROM idea_buckets WHERE idea_id IN (SELECT value FROM json_each(?));",
+        (json.dumps([idea_id for idea_id, _ in idea_signatures]),),
+    )
+    cursor.executemany(
+        "INSERT OR REPLACE INTO idea_signatures (idea_id, signature) VALUES (?, ?);",
+        [(idea_id, minhash.to_blob(values) if values is not None else None) for idea_id, values in idea_signatures],
+    )
+    buckets = sorted(
+        (bucket, idea_id)
+        for idea_id, values in idea_signatures if values is not None
+        for bucket in minhash.band_buckets(values)
+    )
+    cursor.executemany("INSERT OR IGNORE INTO idea_buckets (bucket, idea_id) VALUES (?, ?);", buckets)
+
 
-    connection.commit()
-    connection.close()
+@timed
+def index_signatures(batch_size: int = SIGNATURE_BATCH_SIZE) -> int:
+    """Sign every idea that has no signature yet; returns how many were signed.
 
+    Works in short transactions, so other writers are never held up long.
+    """
+    signed = 0
+    last_id = 0
+    while True:
+        with pooled_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("""
+                SELECT ideas.id, ideas.title, ideas.description FROM ideas
+                LEFT JOIN idea_signatures ON idea_signatures.idea_id = ideas.id
+                WHERE ideas.id > ? AND idea_signatures.idea_id IS NULL
+                ORDER BY ideas.id LIMIT ?;
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+        if not rows:
+            return signed
+
+        signatures = [(row["id"], text_signature(row["title"], row["description"])) for row in rows]
+        write_signatures(signatures)
+        signed += len(signatures)
+        last_id = rows[-1]["id"]
+
+
+def start_signing() -> threading.Thread:
+    """Run index_signatures() on a daemon thread, so ideas filed before
+    signatures existed are signed without holding up startup."""
+    def sign():
+        try:
+            signed = index_signatures()
+        except Exception:
+            logging.getLogger("gib.db").exception("Signing ideas failed")
+        else:
+            if signed:
+                logging.getLogger("gib.db").info("Signed %d ideas", signed)
+
+    thread = threading.Thread(target=sign, name="gib-sign", daemon=True)
+    thread.start()
+    return thread
+
+
+@retry_locked
+def write_signatures(idea_signatures):
+    with transaction() as connection:
+        cursor = connection.cursor()
+        # Ideas deleted since they were read must not get orphaned rows
+        cursor.execute(
+            "SELECT id FROM ideas WHERE id IN (SELECT value FROM json_each(?));",
+            (json.dumps([idea_id for idea_id, _ in idea_signatures]),),
+        )
+        existing = {row["id"] for row in cursor.fetchall()}
+        set_idea_signatures(cursor, [pair for pair in idea_signatures if pair[0] in existing])
+
+
+def load_signatures(cursor, idea_ids):
+    """{idea_id: signature} for the given ideas that have one."""
+    cursor.execute(
+        "SELECT idea_id, signature FROM idea_signatures"
+        " WHERE idea_id IN (SELECT value FROM json_each(?)) AND signature IS NOT NULL;",
+        (json.dumps(list(idea_ids)),),
+    )
+    return {row["idea_id"]: minhash.from_blob(row["signature"]) for row in cursor.fetchall()}
+
+
+@timed
+def find_similar_ideas(title: str, description: str, exclude_id: int | None = None,
+                       threshold: float = SIMILARITY_THRESHOLD, limit: int = 5):
+    """Ideas whose text is similar to the given one, as (idea, similarity) pairs.
+
+    Only ideas sharing an LSH bucket are compared, so the cost depends on
+    the number of near matches rather than on the size of the table.
+    Most similar first; listing rows, like get_ideas_by_filter().
+    """
+    values = text_signature(title, description)
+    if values is None:
+        return []
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT idea_id FROM idea_buckets
+            WHERE bucket IN (SELECT value FROM json_each(?))
+            GROUP BY idea_id
+            ORDER BY COUNT(*) DESC
+            LIMIT ?;
+        """, (json.dumps(minhash.band_buckets(values)), SIMILAR_CANDIDATES))
+        candidates = [row["idea_id"] for row in cursor.fetchall() if row["idea_id"] != exclude_id]
 
+        scores = {
+            idea_id: minhash.similarity(values, other)
+            for idea_id, other in load_signatures(cursor, candidates).items()
+        }
+        matches = sorted(
+            (idea_id for idea_id, score in scores.items() if score >= threshold),
+            key=lambda idea_id: (-scores[idea_id], idea_id),
+        )[:limit]
+
+        cursor.row_factory = idea_row
+        cursor.execute(
+            "SELECT " + IDEA_COLUMNS + " FROM ideas WHERE ideas.id IN (SELECT value FROM json_each(?));",
+            (json.dumps(matches),),
+        )
+        ideas = {idea.id: idea for idea in cursor.fetchall()}
+    return [(ideas[idea_id], scores[idea_id]) for idea_id in matches if idea_id in ideas]
+
+
+@timed
+def find_duplicate_clusters(threshold: float = SIMILARITY_THRESHOLD):
+    """Group every signed idea with its near duplicates.
+
+    Returns lists of idea ids (each with at least two), largest first.
+    Members of a shared bucket are compared with the bucket's first idea
+    and joined to its cluster when similar enough, so a bucket of n ideas
+    costs n comparisons, not n squared.
+    """
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT group_concat(idea_id) AS ideas FROM idea_buckets
+            GROUP BY bucket
+            HAVING COUNT(*) > 1;
+        """)
+        buckets = [[int(idea_id) for idea_id in row["ideas"].split(",")] for row in cursor.fetchall()]
+        signatures = load_signatures(cursor, {idea_id for bucket in buckets for idea_id in bucket})
+
+    # Union-find over idea ids
+    parents = {}
+
+    def root(idea_id):
+        parents.setdefault(idea_id, idea_id)
+        while parents[idea_id] != idea_id:
+            parents[idea_id] = parents[parents[idea_id]]
+            idea_id = parents[idea_id]
+        return idea_id
+
+    for bucket in buckets:
+        # An idea deleted between the two queries has no signature
+        members = [idea_id for idea_id in bucket if idea_id in signatures]
+        for idea_id in members[1:]:
+            first = members[0]
+            if root(idea_id) != root(first) and minhash.similarity(signatures[first], signatures[idea_id]) >= threshold:
+                parents[root(idea_id)] = root(first)
+
+    clusters = {}
+    for idea_id in list(parents):
+        clusters.setdefault(root(idea_id), []).append(idea_id)
+    return sorted((sorted(members) for members in clusters.values() if len(members) > 1),
+                  key=lambda members: (-len(members), members[0]))
+
+
+@timed
+@retry_locked
+def create_new_idea(title: str, category: str, description: str, tags: str):
+    time_now = now_ms()
+    with transaction() as connection:
+        cursor = connection.cursor()
+
+        cursor.execute("""
+            INSERT INTO ideas (title, category, description, tags, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?);
+        """, (title, category, description, tags, time_now, time_now))
+
+        idea_id = cursor.lastrowid
+        set_idea_tags(cursor, idea_id, tags)
+        set_idea_signatures(cursor, [(idea_id, text_signature(title, description))])
+    result_cache.invalidate({category})
+    return idea_id
+
+
+class Idea:
+    """One idea. Slots instead of a per-row dict keep large listings small.
+
+    Listing rows leave description, tags and version as None;
+    get_idea_detail() returns the full idea.
+    """
+
+    __slots__ = ("id", "title", "category", "created_at", "updated_at", "sort_key", "snippet",
+                 "description", "tags", "version")
+
+    def __init__(self, id, title, category, created_at, updated_at, sort_key=None, snippet=None,
+                 description=None, tags=None, version=None):
+        self.id = id
+        self.title = title
+        # Few distinct categories, so every row shares the same string objects
+        self.category = sys.intern(category) if category else category
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.sort_key = sort_key
+        self.snippet = snippet
+        self.description = description
+        self.tags = tags
+        self.version = version
+
+    def __repr__(self):
+        return f"Idea(id={self.id!r}, title={self.title!r}, category={self.category!r})"
+
+    def as_dict(self):
+        """The fields that are set, by name (e.g. for JSON)."""
+        return {name: getattr(self, name) for name in self.__slots__ if getattr(self, name) is not None}
+
+
+def idea_row(cursor, row):
+    """Row factory building Idea records from IDEA_COLUMNS (+ sort_key, snippet)."""
+    return Idea(*row)
+
+
+def detail_row(cursor, row):
+    """Row factory building full Idea records from DETAIL_COLUMNS."""
+    idea_id, title, category, created_at, updated_at, description, tags, version = row
+    return Idea(idea_id, title, category, created_at, updated_at, description=description, tags=tags,
+                version=version)
+
+
+@timed
+def get_all_ideas():
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.row_factory = detail_row
+
+        cursor.execute("SELECT " + DETAIL_COLUMNS + " FROM ideas ORDER BY created_at DESC;")
+        return cursor.fetchall()
+
+
+# Listings only carry what the list shows; descriptions are loaded per idea
+IDEA_COLUMNS = """
+    ideas.id, ideas.title, ideas.category, ideas.created_at, ideas.updated_at
+"""
+
+DETAIL_COLUMNS = """
+    ideas.id, ideas.title, ideas.category, ideas.created_at, ideas.updated_at,
+    ideas.description, ideas.tags, ideas.version
+"""
+
+SNIPPET_COLUMN = f"""
+    , snippet(ideas_fts, -1, '{SNIPPET_START}', '{SNIPPET_END}', '...', 16) AS snippet
+"""
+
+
+# Sort options for listings: name -> (SQL expression, direction)
+SORT_ORDERS = {
+    "created_at": ("ideas.created_at", "DESC"),
+    "updated_at": ("ideas.updated_at", "DESC"),
+    "title": ("ideas.title COLLATE NOCASE", "ASC"),
+    "relevance": ("bm25(ideas_fts, ?, ?, ?)", "ASC"),
+}
+
+# What "relevance" sorts by in fuzzy search: fewest typos first
+FUZZY_RELEVANCE = ("fuzzy_distance(?, ideas.title, ideas.tags)", "ASC")
+
+# Rows per page for the paginated and streaming queries
+DEFAULT_PAGE_SIZE = 200
+
+# Full ideas (with descriptions) kept by get_idea_detail()
+DETAIL_CACHE_SIZE = 256
+
+# Listing pages and counts kept by the result cache
+RESULT_CACHE_SIZE = 128
+
+
+class ResultCache:
+    """Bounded LRU of listing results (row pages and counts), shared by all threads.
+
+    Each entry remembers the category it lists (None for all categories),
+    so a write only drops the listings it can change. Commits made by other
+    processes are noticed through PRAGMA data_version and the change log
+    (see check()) and clear everything.
+    """
+
+    def __init__(self, size: int = RESULT_CACHE_SIZE):
+        self.size = size
+        self.results = OrderedDict()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def check(self, connection):
+        """Clear the cache if another process committed since this connection last looked.
+
+        data_version changes with every commit but the connection's own, and
+        several commits can show as one change, so it only tells that
+        something was committed. Every write that can change a listing goes
+        through the ideas or categories triggers into the change log, and
+        local transactions remember the seqs they wrote there: new seqs
+        beyond those are another process's. A change without new seqs is
+        foreign unless another pooled connection committed meanwhile.
+        Whenever the source is unclear, the cache is cleared.
+        """
+        version = connection.execute("PRAGMA data_version;").fetchone()[0]
+        if version == connection.seen_data_version:
+            return
+        pool = get_pool()
+        # Read after data_version: a commit counted early or late clears, never misses
+        seq = change_log_seq(connection)
+        other_commits = pool.local_commits - connection.commits
+
+        seen_seq = connection.seen_change_seq
+        if connection.seen_data_version is None or seq is None or seen_seq is None:
+            foreign = True
+        elif seq != seen_seq:
+            foreign = seq - seen_seq > pool.local_changes_between(seen_seq, seq)
+        else:
+            foreign = other_commits == connection.seen_other_commits
+        connection.seen_data_version = version
+        connection.seen_change_seq = seq
+        connection.seen_other_commits = other_commits
+        if foreign:
+            self.clear()
+            detail_cache.clear()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.results.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.results.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, category: str | None, result, generation: int):
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.results[key] = (category, result)
+            self.results.move_to_end(key)
+            if len(self.results) > self.size:
+                self.results.popitem(last=False)
+
+    def invalidate(self, categories):
+        """Drop the listings that can include ideas of the given categories."""
+        with self.lock:
+            self.generation += 1
+            for key in [key for key, (category, _) in self.results.items()
+                        if category is None or category in categories]:
+                del self.results[key]
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.results.clear()
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.results)}
+
+
+result_cache = ResultCache()
+
+
+def cached_result(connection, key, category: str | None, fetch):
+    """Return fetch() for a listing, reusing a cached result while it is valid."""
+    result_cache.check(connection)
+    result = result_cache.get(key)
+    if result is None:
+        generation = result_cache.generation
+        result = fetch()
+        result_cache.put(key, category, result, generation)
+    return result
+
+
+def get_cache_stats():
+    """Hit/miss counters and current size of the listing result cache."""
+    return result_cache.stats()
+
+
+def fuzzy_candidates(connection, search_text: str):
+    """Ids of the ideas fuzzy search checks for `search_text`, or None if
+    it has no trigrams.
+
+    Ranking the candidates is the costly part of a fuzzy search, so they are
+    cached for the pages, count and position lookups of the same listing.
+    """
+    def fetch():
+        cursor = connection.cursor()
+        trigram_query = build_trigram_query(cursor, search_text)
+        if trigram_query is None:
+            return None
+        match, order = trigram_query
+        cursor.execute(
+            f"SELECT rowid FROM ideas_trigram WHERE ideas_trigram MATCH ? ORDER BY {order} LIMIT ?;",
+            (match, FUZZY_CANDIDATES),
+        )
+        return tuple(row[0] for row in cursor.fetchall())
+
+    # Any write can change the candidates, whatever its category
+    return cached_result(connection, ("FUZZY", search_text), None, fetch)
+
+
+class FilterQuery:
+    """SQL pieces for one filtered and sorted listing of ideas.
+
+    Rows are always ordered by (sort key, id), which makes the pair a
+    stable cursor for keyset pagination.
+    """
+
+    def __init__(self, category: str | None = None, search_text: str | None = None, sort: str | None = None,
+                 tags=None, match_all_tags: bool = True, fuzzy: bool = False):
+        candidates = None
+        if fuzzy and search_text:
+            with pooled_connection() as connection:
+                candidates = fuzzy_candidates(connection, search_text)
+        match_query = build_match_query(search_text) if search_text and candidates is None else None
+        self.fuzzy = candidates is not None
+        self.searching = match_query is not None
+
+        if self.fuzzy:
+            # Typo-tolerant search: the trigram index narrows the ideas down to
+            # those sharing the most trigrams, fuzzy_distance() checks each one
+            self.from_where = """
+                FROM ideas
+                WHERE ideas.id IN (SELECT value FROM json_each(?))
+                AND fuzzy_distance(?, ideas.title, ideas.tags) IS NOT NULL
+            """
+            self.parameters = [json.dumps(candidates), search_text]
+            self.sort = sort or "relevance"
+        elif self.searching:
+            # Full-text search, best matches first unless another sort is asked for
+            self.from_where = """
+                FROM ideas_fts
+                JOIN ideas ON ideas.id = ideas_fts.rowid
+                WHERE ideas_fts MATCH ?
+            """
+            self.parameters = [match_query]
+            self.sort = sort or "relevance"
+        else:
+            self.from_where = """
+                FROM ideas
+                WHERE 1 = 1
+            """
+            self.parameters = []
+            self.sort = sort if sort and sort != "relevance" else "created_at"
+
+        self.category = None
+        if category and category.lower() != "all":
+            self.category = category
+            self.from_where += " AND ideas.category = ?"
+            self.parameters.append(category)
+
+        # Tag filters are answered from the (tag_id, idea_id) index
+        tag_names = parse_tags(",".join(tags)) if tags else []
+        if tag_names:
+            placeholders = ", ".join("?" for _ in tag_names)
+            self.from_where += f"""
+                AND ideas.id IN (
+                    SELECT idea_tags.idea_id
+                    FROM tags
+                    JOIN idea_tags ON idea_tags.tag_id = tags.id
+                    WHERE tags.name IN ({placeholders})
+            """
+            self.parameters.extend(tag_names)
+            if match_all_tags:
+                self.from_where += " GROUP BY idea_tags.idea_id HAVING COUNT(*) = ?"
+                self.parameters.append(len(tag_names))
+            self.from_where += ")"
+
+        if self.fuzzy and self.sort == "relevance":
+            self.sort_expression, self.direction = FUZZY_RELEVANCE
+            self.sort_parameters = [search_text]
+        else:
+            self.sort_expression, self.direction = SORT_ORDERS[self.sort]
+            self.sort_parameters = list(SEARCH_WEIGHTS) if self.sort == "relevance" else []
+
+    def columns(self):
+        columns = IDEA_COLUMNS + f", {self.sort_expression} AS sort_key"
+        if self.searching:
+            columns += SNIPPET_COLUMN
+        return columns, list(self.sort_parameters)
+
+    def order_by(self, reverse: bool = False):
+        direction = self.direction
+        if reverse:
+            direction = "DESC" if direction == "ASC" else "ASC"
+        return (
+            f" ORDER BY {self.sort_expression} {direction}, ideas.id {direction}",
+            list(self.sort_parameters),
+        )
+
+    def keyset(self, sort_key, idea_id, ahead: bool = False):
+        """Condition for rows after (or, with ahead=True, before) a cursor row."""
+        later = ">" if self.direction == "ASC" else "<"
+        if ahead:
+            later = "<" if later == ">" else ">"
+        # Written as a range plus a tie-break so an index can serve the range
+        condition = (
+            f" AND {self.sort_expression} {later}= ?"
+            f" AND ({self.sort_expression} {later} ? OR ideas.id {later} ?)"
+        )
+        return condition, self.sort_parameters + [sort_key] + self.sort_parameters + [sort_key, idea_id]
+
+    def select(self, connection, condition: str = "", condition_parameters=(), suffix: str = "", suffix_parameters=(),
+               cached: bool = True, reverse: bool = False):
+        columns, column_parameters = self.columns()
+        order_by, order_parameters = self.order_by(reverse)
+        sql = "SELECT " + columns + self.from_where + condition + order_by + suffix + ";"
+        parameters = (
+            column_parameters + self.parameters + list(condition_parameters)
+            + order_parameters + list(suffix_parameters)
+        )
+
+        def fetch():
+            cursor = connection.cursor()
+            cursor.row_factory = idea_row
+            cursor.execute(sql, parameters)
+            return tuple(cursor.fetchall())
+
+        if not cached:
+            return list(fetch())
+        # Cached as a tuple, callers get their own list to modify
+        return list(cached_result(connection, (sql, tuple(parameters)), self.category, fetch))
+
+
+@timed
+def get_ideas_by_filter(category: str | None = None, search_text: str | None = None, sort: str | None = None,
+                        tags=None, match_all_tags: bool = True, fuzzy: bool = False):
+    """Return filtered ideas. `tags` keeps ideas with all (or, with
+    match_all_tags=False, any) of the given tag names; `fuzzy` matches the
+    search text against titles and tags allowing for typos."""
+    with pooled_connection() as connection:
+        return FilterQuery(category, search_text, sort, tags, match_all_tags, fuzzy).select(connection)
+
+
+@timed
+def count_ideas(category: str | None = None, search_text: str | None = None,
+                tags=None, match_all_tags: bool = True, fuzzy: bool = False) -> int:
+    query = FilterQuery(category, search_text, None, tags, match_all_tags, fuzzy)
+
+    def fetch():
+        cursor = connection.cursor()
+        if not query.searching and not query.fuzzy and not tags:
+            # Category-only listings are counted from the materialized counts
+            if query.category is not None:
+                cursor.execute("SELECT idea_count FROM categories WHERE name = ?;", (category,))
+            else:
+                cursor.execute("SELECT COALESCE(SUM(idea_count), 0) FROM categories;")
+            row = cursor.fetchone()
+            return row[0] if row is not None else 0
+
+        cursor.execute("SELECT COUNT(*)" + query.from_where + ";", query.parameters)
+        return cursor.fetchone()[0]
+
+    with pooled_connection() as connection:
+        key = ("COUNT", query.from_where, tuple(query.parameters))
+        return cached_result(connection, key, query.category, fetch)
+
+
+@timed
+def get_ideas_range(category: str | None, search_text: str | None, offset: int, limit: int, sort: str | None = None,
+                    tags=None, match_all_tags: bool = True, fuzzy: bool = False):
+    """Return `limit` filtered ideas starting at row `offset` of the sorted result."""
+    with pooled_connection() as connection:
+        return FilterQuery(category, search_text, sort, tags, match_all_tags, fuzzy).select(
+            connection, suffix=" LIMIT ? OFFSET ?", suffix_parameters=(limit, offset)
+        )
+
+
+@timed
+def get_ideas_page(category: str | None = None, search_text: str | None = None, sort: str | None = None,
+                   after=None, limit: int = DEFAULT_PAGE_SIZE, tags=None, match_all_tags: bool = True,
+                   fuzzy: bool = False, offset: int = 0, before=None):
+    """Return (rows, cursor) for the page after `after`, using keyset pagination.
+
+    `after` is the cursor returned with the previous page (or the
+    (sort_key, id) of any row), or None for the first page. The returned
+    cursor is None once the listing is exhausted. `offset` skips that many
+    rows past the cursor first, which seeks from a known row instead of
+    counting from the top of the listing.
+
+    With a `before` cursor instead, the page is the `limit` rows ending
+    `offset` rows ahead of that row, still in listing order.
+    """
+    query = FilterQuery(category, search_text, sort, tags, match_all_tags, fuzzy)
+    if before is not None:
+        condition, condition_parameters = query.keyset(*before, ahead=True)
+    else:
+        condition, condition_parameters = ("", []) if after is None else query.keyset(*after)
+
+    with pooled_connection() as connection:
+        rows = query.select(connection, condition, condition_parameters, " LIMIT ? OFFSET ?", (limit, offset),
+                            reverse=before is not None)
+
+    if before is not None:
+        rows.reverse()
+        return rows, (rows[-1].sort_key, rows[-1].id) if rows else None
+    if len(rows) < limit:
+        return rows, None
+    return rows, (rows[-1].sort_key, rows[-1].id)
+
+
+def iter_idea_batches(category: str | None = None, search_text: str | None = None, sort: str | None = None,
+                      batch_size: int = DEFAULT_PAGE_SIZE, tags=None, match_all_tags: bool = True, fuzzy: bool = False):
+    """Stream a filtered listing as lists of at most `batch_size` rows."""
+    rows, cursor = get_ideas_page(category, search_text, sort, None, batch_size, tags, match_all_tags, fuzzy)
+    while rows:
+        yield rows
+        if cursor is None:
+            return
+        rows, cursor = get_ideas_page(category, search_text, sort, cursor, batch_size, tags, match_all_tags, fuzzy)
+
+
+@timed
+def locate_idea(idea_id: int, category: str | None = None, search_text: str | None = None, sort: str | None = None,
+                tags=None, match_all_tags: bool = True, fuzzy: bool = False):
+    """Return (index, idea) of one idea within a filtered listing, or (None, None)."""
+    query = FilterQuery(category, search_text, sort, tags, match_all_tags, fuzzy)
+
+    with pooled_connection() as connection:
+        rows = query.select(connection, " AND ideas.id = ?", (idea_id,), cached=False)
+        if not rows:
+            return None, None
+        idea = rows[0]
+
+        # Count the rows that sort ahead of this one
+        condition, condition_parameters = query.keyset(idea.sort_key, idea_id, ahead=True)
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT COUNT(*)" + query.from_where + condition + ";",
+            query.parameters + condition_parameters,
+        )
+        index = cursor.fetchone()[0]
+    return index, idea
+
+
+class DetailCache:
+    """Bounded LRU of full ideas by id, shared by all threads.
+
+    Every invalidation bumps a generation number; a reader passes the
+    generation it started with to put(), so a row read before a write
+    cannot be cached after that write invalidated it.
+    """
+
+    def __init__(self, size: int = DETAIL_CACHE_SIZE):
+        self.size = size
+        self.ideas = OrderedDict()
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def get(self, idea_id: int):
+        with self.lock:
+            idea = self.ideas.get(idea_id)
+            if idea is not None:
+                self.ideas.move_to_end(idea_id)
+            return idea
+
+    def put(self, idea, generation: int):
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.ideas[idea.id] = idea
+            self.ideas.move_to_end(idea.id)
+            if len(self.ideas) > self.size:
+                self.ideas.popitem(last=False)
+
+    def discard(self, idea_id: int):
+        with self.lock:
+            self.generation += 1
+            self.ideas.pop(idea_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.ideas.clear()
+
+
+detail_cache = DetailCache()
+
+
+@timed
+def get_idea_detail(idea_id: int):
+    """Return the full idea (with description and tags), or None if it is gone."""
+    idea = detail_cache.get(idea_id)
+    if idea is not None:
+        return idea
+
+    generation = detail_cache.generation
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.row_factory = detail_row
+        cursor.execute("SELECT " + DETAIL_COLUMNS + " FROM ideas WHERE id = ?;", (idea_id,))
+        idea = cursor.fetchone()
+
+    if idea is not None:
+        detail_cache.put(idea, generation)
+    return idea
+
+
+def cached_idea_detail(idea_id: int):
+    """Return the full idea if it is cached, without touching the database."""
+    return detail_cache.get(idea_id)
+
+
+@timed
+def get_idea_details(idea_ids):
+    """Return {id: full idea} for several ideas in one query."""
+    idea_ids = list(idea_ids)
+    if not idea_ids:
+        return {}
+
+    generation = detail_cache.generation
+    placeholders = ", ".join("?" for _ in idea_ids)
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.row_factory = detail_row
+        cursor.execute(f"SELECT {DETAIL_COLUMNS} FROM ideas WHERE id IN ({placeholders});", idea_ids)
+        ideas = cursor.fetchall()
+
+    for idea in ideas:
+        detail_cache.put(idea, generation)
+    return {idea.id: idea for idea in ideas}
+
+
+@timed
+@retry_locked
+def insert_ideas(ideas, source: str | None = None, position: int = 0) -> int:
+    """Insert many ideas in one transaction and return how many were added.
+
+    ideas    : (title, category, description, tags, created_at, updated_at) tuples
+    source   : optional import name; `position` is then saved as its resume
+               point in the same transaction as the rows
+    """
+    ideas = list(ideas)
+    with transaction() as connection, untraced(connection):
+        cursor = connection.cursor()
+
+        # Ids are assigned here so tags can be linked without a query per row
+        cursor.execute("""
+            SELECT MAX(
+                COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'ideas'), 0),
+                COALESCE((SELECT MAX(id) FROM ideas), 0)
+            );
+        """)
+        first_id = cursor.fetchone()[0] + 1
+        rows = [(first_id + i, *idea) for i, idea in enumerate(ideas)]
+        last_id = first_id + len(rows) - 1
+
+        # Per-row triggers dominate bulk inserts, so their work is done set-wise
+        # instead. Nobody else can write while this transaction holds the lock,
+        # and no other connection sees the triggers missing.
+        cursor.execute("DROP TRIGGER IF EXISTS ideas_fts_insert;")
+        cursor.execute("DROP TRIGGER IF EXISTS ideas_trigram_insert;")
+        cursor.execute("DROP TRIGGER IF EXISTS ideas_category_insert;")
+        cursor.execute("DROP TRIGGER IF EXISTS ideas_log_insert;")
+
+        cursor.executemany("""
+            INSERT INTO ideas (id, title, category, description, tags, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?);
+        """, rows)
+
+        cursor.execute("""
+            INSERT INTO ideas_fts (rowid, title, description, tags)
+            SELECT id, title, description, tags FROM ideas WHERE id BETWEEN ? AND ?;
+        """, (first_id, last_id))
+        cursor.execute("""
+            INSERT INTO ideas_trigram (rowid, title, tags)
+            SELECT id, title, tags FROM ideas WHERE id BETWEEN ? AND ?;
+        """, (first_id, last_id))
+
+        category_counts = Counter(row[2] for row in rows)
+        cursor.executemany(
+            "INSERT OR IGNORE INTO categories (name) VALUES (?);",
+            [(name,) for name in category_counts],
+        )
+        cursor.executemany(
+            "UPDATE categories SET idea_count = idea_count + ? WHERE name = ?;",
+            [(count, name) for name, count in category_counts.items()],
+        )
+
+        create_search_index(cursor)
+        create_trigram_index(cursor)
+        create_category_triggers(cursor)
+        create_change_triggers(cursor)
+        # One entry for the whole batch: clients reload rather than replay it
+        cursor.execute("INSERT INTO idea_changes (action) VALUES ('reset');")
+
+        link_idea_tags(cursor, [(row[0], row[4]) for row in rows])
+
+        if source is not None:
+            cursor.execute(
+                "INSERT OR REPLACE INTO import_progress (source, position) VALUES (?, ?);",
+                (source, position),
+            )
+
+    result_cache.invalidate(set(category_counts))
+    return len(rows)
+
+
+def link_idea_tags(cursor, idea_tags):
+    """Add idea_tags rows for many (idea_id, tag string) pairs at once.
+
+    One lookup per distinct tag string and name, then one insert per link.
+    """
+    parsed = {}
+    tag_ids = {}
+    links = []
+    for idea_id, tags in idea_tags:
+        if tags not in parsed:
+            parsed[tags] = parse_tags(tags)
+        for name in parsed[tags]:
+            if name not in tag_ids:
+                cursor.execute("INSERT OR IGNORE INTO tags (name) VALUES (?);", (name,))
+                cursor.execute("SELECT id FROM tags WHERE name = ?;", (name,))
+                tag_ids[name] = cursor.fetchone()[0]
+            links.append((tag_ids[name], idea_id))
+    # In primary key order, so the index pages are filled sequentially
+    links.sort()
+    cursor.executemany("INSERT OR IGNORE INTO idea_tags (tag_id, idea_id) VALUES (?, ?);", links)
+
+
+@timed
+def get_import_position(source: str) -> int:
+    """Number of records of an import already committed (0 if none)."""
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT position FROM import_progress WHERE source = ?;", (source,))
+        row = cursor.fetchone()
+    return row["position"] if row is not None else 0
+
+
+@timed
+@retry_locked
+def finish_import(source: str):
+    """Forget an import's resume position once it has completed."""
+    with transaction() as connection:
+        connection.execute("DELETE FROM import_progress WHERE source = ?;", (source,))
+
+
+def iter_idea_details(batch_size: int = DEFAULT_PAGE_SIZE):
+    """Stream every full idea in id order as lists of at most `batch_size`."""
+    last_id = 0
+    while True:
+        with pooled_connection() as connection:
+            cursor = connection.cursor()
+            cursor.row_factory = detail_row
+            cursor.execute(
+                "SELECT " + DETAIL_COLUMNS + " FROM ideas WHERE id > ? ORDER BY id LIMIT ?;",
+                (last_id, batch_size),
+            )
+            ideas = cursor.fetchall()
+        if not ideas:
+            return
+        yield ideas
+        last_id = ideas[-1].id
+
+
+@timed
+def get_idea_ids(updated_since: int | None = None):
+    """Ids of every idea, or only of those updated at or after `updated_since` (epoch ms)."""
+    with pooled_connection() as connection:
+        if updated_since is None:
+            rows = connection.execute("SELECT id FROM ideas;").fetchall()
+        else:
+            rows = connection.execute("SELECT id FROM ideas WHERE updated_at >= ?;", (updated_since,)).fetchall()
+    return [row[0] for row in rows]
+
+
+@timed
+def get_change_seq() -> int:
+    """Sequence number of the latest change; pass it to get_changes() later."""
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM idea_changes;")
+        return cursor.fetchone()[0]
+
+
+@timed
+def get_changes(since: int, limit: int = CHANGE_BATCH_SIZE):
+    """Return (seq, changes) for everything written after sequence number `since`.
+
+    changes is a list of (idea_id, action) with one entry per idea, action
+    being "insert", "update" or "delete" relative to the state at `since`
+    (an idea both added and deleted is left out). changes is None when the
+    caller should reload instead: the log no longer reaches back to `since`,
+    there are more than `limit` ideas to patch, or a bulk import ran.
+
+    Polling is cheap: while no connection has committed anything, the
+    answer comes from PRAGMA data_version without reading the log.
+    """
+    with pooled_connection() as connection:
+        # Also drops cached results if another process wrote in the meantime
+        result_cache.check(connection)
+
+        cursor = connection.cursor()
+        cursor.execute("PRAGMA data_version;")
+        state = (cursor.fetchone()[0], connection.total_changes, since)
+        if connection.seen_changes == state:
+            return since, []
+
+        cursor.execute("SELECT MIN(seq), MAX(seq) FROM idea_changes;")
+        first, latest = cursor.fetchone()
+        latest = latest or 0
+        if latest == since:
+            connection.seen_changes = state
+            return since, []
+        if latest < since or (first is not None and first > since + 1):
+            return latest, None
+
+        cursor.execute("""
+            SELECT seq, idea_id, action FROM idea_changes
+            WHERE seq > ? AND seq <= ?
+            ORDER BY seq;
+        """, (since, latest))
+        rows = cursor.fetchall()
+
+    # (first action, last action) per idea
+    actions = {}
+    for seq, idea_id, action in rows:
+        if action == "reset":
+            return latest, None
+        if idea_id is not None:
+            first_action = actions[idea_id][0] if idea_id in actions else action
+            actions[idea_id] = (first_action, action)
+            if len(actions) > limit:
+                return latest, None
+
+    changes = []
+    for idea_id, (first_action, last_action) in actions.items():
+        if last_action == "delete":
+            if first_action != "insert":
+                changes.append((idea_id, "delete"))
+        else:
+            changes.append((idea_id, "insert" if first_action == "insert" else "update"))
+    return latest, changes
+
+
+class EditConflict(Exception):
+    """update_idea() was given a version that is no longer current.
+
+    current is the idea as it is stored now, or None if it was deleted.
+    """
+
+    def __init__(self, idea_id: int, current=None):
+        state = "changed by someone else" if current is not None else "deleted"
+        super().__init__(f"Idea {idea_id} was {state}")
+        self.idea_id = idea_id
+        self.current = current
+
+
+@timed
+@retry_locked
+def update_idea(idea_id: int, title: str, category: str, description: str, tags: str,
+                version: int | None = None) -> int:
+    """Save an edited idea and return its new version.
+
+    `version` is the version the edit started from; if anyone saved the
+    idea since, nothing is written and EditConflict is raised instead.
+    Without it the idea is overwritten unconditionally.
+    """
+    time_now = now_ms()
+    with transaction() as connection:
+        cursor = connection.cursor()
+        old_category = idea_category(cursor, idea_id)
+
+        condition, parameters = ("", ()) if version is None else (" AND version = ?", (version,))
+        cursor.execute("""
+            UPDATE ideas
+            SET title = ?, category = ?, description = ?, tags = ?, updated_at = ?, version = version + 1
+            WHERE id = ?""" + condition + """
+            RETURNING version;
+        """, (title, category, description, tags, time_now, idea_id, *parameters))
+        row = next(iter(cursor.fetchall()), None)
+
+        if row is None:
+            cursor.row_factory = detail_row
+            cursor.execute("SELECT " + DETAIL_COLUMNS + " FROM ideas WHERE id = ?;", (idea_id,))
+            raise EditConflict(idea_id, cursor.fetchone())
+
+        set_idea_tags(cursor, idea_id, tags)
+        set_idea_signatures(cursor, [(idea_id, text_signature(title, description))])
+    detail_cache.discard(idea_id)
+    result_cache.invalidate({old_category, category})
+    return row[0]
+
+
+@timed
+@retry_locked
 def delete_idea(idea_id: int):
-    connection = new_connection()
-    cursor = connection.cursor()
+    with transaction() as connection:
+        cursor = connection.cursor()
+        category = idea_category(cursor, idea_id)
+        cursor.execute("DELETE FROM ideas WHERE id = ?;", (idea_id,))
+    detail_cache.discard(idea_id)
+    result_cache.invalidate({category})
 
-    cursor.execute("DELETE FROM ideas WHERE id = ?;", (idea_id,))
 
-    connection.commit()
-    connection.close()
+def idea_category(cursor, idea_id: int):
+    """Category of one idea, or None if it does not exist."""
+    cursor.execute("SELECT category FROM ideas WHERE id = ?;", (idea_id,))
+    row = cursor.fetchone()
+    return row["category"] if row is not None else None
 
 
-def create_user(username: str, password: str) -> bool:
-    connection = new_connection()
-    cursor = connection.cursor()
+# Bulk operations pass their ids as one JSON array parameter
+IDS_IN = "id IN (SELECT value FROM json_each(?))"
 
-    cursor.execute("SELECT id FROM users WHERE username = ?;", (username,))
-    existing = cursor.fetchone()
-    if existing is not None:
-        connection.close()
-        return False
 
-    cursor.execute("""
-        INSERT INTO users (username, password)
-        VALUES (?, ?);
-    """, (username, password))
+def idea_categories(cursor, ids_json: str):
+    """Distinct categories of a set of ideas."""
+    cursor.execute(f"SELECT DISTINCT category FROM ideas WHERE {IDS_IN};", (ids_json,))
+    return {row["category"] for row in cursor.fetchall()}
+
+
+@timed
+def delete_ideas(idea_ids):
+    """Delete several ideas in one transaction."""
+    # A list: the ids are read again below, and a retry must not get a used-up iterator
+    idea_ids = list(idea_ids)
+    categories = write_deletions(json.dumps(idea_ids))
+    for idea_id in idea_ids:
+        detail_cache.discard(idea_id)
+    result_cache.invalidate(categories)
+
+
+@retry_locked
+def write_deletions(ids_json: str):
+    """Delete the ideas in a JSON id list; returns their categories."""
+    with transaction() as connection:
+        cursor = connection.cursor()
+        categories = idea_categories(cursor, ids_json)
+        cursor.execute(f"DELETE FROM ideas WHERE {IDS_IN};", (ids_json,))
+    return categories
+
+
+def move_ideas(cursor, ids_json: str, category: str, time_now: int):
+    """Put a set of ideas in one category; returns the categories involved."""
+    categories = idea_categories(cursor, ids_json) | {category}
+    cursor.execute(
+        f"""
+            UPDATE ideas SET category = ?, updated_at = ?, version = version + 1
+            WHERE {IDS_IN} AND category != ?;
+        """,
+        (category, time_now, ids_json, category),
+    )
+    return categories
+
+
+def retag_ideas(cursor, ids_json: str, add_tags, remove_tags, time_now: int):
+    """Add and remove tag names on a set of ideas; returns their categories."""
+    add_names = parse_tags(",".join(add_tags))
+    remove_names = {name.lower() for name in parse_tags(",".join(remove_tags))}
+
+    cursor.execute(f"SELECT id, category, tags FROM ideas WHERE {IDS_IN};", (ids_json,))
+    changed = []
+    categories = set()
+    for row in cursor.fetchall():
+        names = [name for name in parse_tags(row["tags"]) if name.lower() not in remove_names]
+        present = {name.lower() for name in names}
+        names += [name for name in add_names if name.lower() not in present]
+        tags = ", ".join(names)
+        if tags != (row["tags"] or ""):
+            changed.append((row["id"], tags))
+            categories.add(row["category"])
+
+    if changed:
+        cursor.executemany(
+            "UPDATE ideas SET tags = ?, updated_at = ?, version = version + 1 WHERE id = ?;",
+            [(tags, time_now, idea_id) for idea_id, tags in changed],
+        )
+        cursor.execute(
+            "DELETE FROM idea_tags WHERE idea_id IN (SELECT value FROM json_each(?));",
+            (json.dumps([idea_id for idea_id, _ in changed]),),
+        )
+        link_idea_tags(cursor, changed)
+    return categories
+
+
+@timed
+def update_category(idea_ids, category: str):
+    """Move several ideas to one category in one transaction."""
+    edit_ideas(idea_ids, category=category)
+
 
-    connection.commit()
-    connection.close()
+@timed
+def update_tags(idea_ids, add_tags=(), remove_tags=()):
+    """Add and remove tags on several ideas in one transaction."""
+    edit_ideas(idea_ids, add_tags=add_tags, remove_tags=remove_tags)
+
+
+@timed
+def edit_ideas(idea_ids, category: str | None = None, add_tags=(), remove_tags=()):
+    """Recategorize and/or retag several ideas in one transaction."""
+    # Lists: the ids are read again below, and a retry must not get used-up iterators
+    idea_ids = list(idea_ids)
+    categories = write_edits(json.dumps(idea_ids), category, list(add_tags), list(remove_tags))
+    for idea_id in idea_ids:
+        detail_cache.discard(idea_id)
+    result_cache.invalidate(categories)
+
+
+@retry_locked
+def write_edits(ids_json: str, category: str | None, add_tags, remove_tags):
+    """Apply edit_ideas() to a JSON id list; returns the categories involved."""
+    time_now = now_ms()
+    categories = set()
+    with transaction() as connection:
+        cursor = connection.cursor()
+        if category:
+            categories |= move_ideas(cursor, ids_json, category, time_now)
+        if add_tags or remove_tags:
+            categories |= retag_ideas(cursor, ids_json, add_tags, remove_tags, time_now)
+    return categories
+
+
+@timed
+@retry_locked
+def create_user(username: str, password: str) -> bool:
+    with transaction() as connection:
+        cursor = connection.cursor()
+
+        cursor.execute("SELECT id FROM users WHERE username = ?;", (username,))
+        existing = cursor.fetchone()
+        if existing is not None:
+            return False
+
+        cursor.execute("""
+            INSERT INTO users (username, password)
+            VALUES (?, ?);
+        """, (username, password))
     return True
 
 
+@timed
 def verify_user(username: str, password: str):
-    connection = new_connection()
-    cursor = connection.cursor()
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
 
-    cursor.execute("""
-        SELECT id FROM users
-        WHERE username = ? AND password = ?;
-    """, (username, password))
+        cursor.execute("""
+            SELECT id FROM users
+            WHERE username = ? AND password = ?;
+        """, (username, password))
 
-    result = cursor.fetchone()
-    connection.close()
+        result = cursor.fetchone()
 
     return result is not None
 
 
+@timed
+@retry_locked
 def delete_ideas_by_category(category: str):
-    connection = new_connection()
-    cursor = connection.cursor()
-    cursor.execute("DELETE FROM ideas WHERE category = ?;", (category,))
-    connection.commit()
-    connection.close()
+    with transaction() as connection:
+        cursor = connection.cursor()
+        cursor.execute("DELETE FROM ideas WHERE category = ?;", (category,))
+    detail_cache.clear()
+    result_cache.invalidate({category})
 
 
+@timed
+@retry_locked
 def reassign_ideas_category(old_category: str, new_category: str):
-    connection = new_connection()
-    cursor = connection.cursor()
+    with transaction() as connection:
+        cursor = connection.cursor()
 
-    cursor.execute("""
-        UPDATE ideas 
-        SET category = ?
-        WHERE category = ?;
-    """, (new_category, old_category))
+        cursor.execute("""
+            UPDATE ideas 
+            SET category = ?, version = version + 1
+            WHERE category = ?;
+        """, (new_category, old_category))
+    detail_cache.clear()
+    result_cache.invalidate({old_category, new_category})
+
+
+@timed
+def get_categories():
+    """Return [(name, idea_count), ...] in the order categories were added."""
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT name, idea_count FROM categories ORDER BY id;")
+        return [(row["name"], row["idea_count"]) for row in cursor.fetchall()]
+
+
+@timed
+def get_category_count(category: str) -> int:
+    """Number of ideas in a category, read from the trigger-maintained count."""
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT idea_count FROM categories WHERE name = ?;", (category,))
+        row = cursor.fetchone()
+    return row["idea_count"] if row is not None else 0
+
+
+@timed
+@retry_locked
+def create_category(name: str) -> bool:
+    with transaction() as connection:
+        cursor = connection.cursor()
+
+        cursor.execute("SELECT id FROM categories WHERE name = ? COLLATE NOCASE;", (name,))
+        if cursor.fetchone() is not None:
+            return False
+
+        cursor.execute("INSERT INTO categories (name) VALUES (?);", (name,))
+    result_cache.invalidate({name})
+    return True
+
+
+@timed
+@retry_locked
+def delete_category(name: str, with_ideas: bool = False, fallback: str = "uncategorized"):
+    """Delete a category, deleting its ideas or moving them to `fallback`."""
+    with transaction() as connection:
+        if with_ideas:
+            delete_ideas_by_category(name)
+        else:
+            reassign_ideas_category(name, fallback)
 
-    connection.commit()
-    connection.close()
+        cursor = connection.cursor()
+        cursor.execute("DELETE FROM categories WHERE name = ?;", (name,))
+    detail_cache.clear()
+    result_cache.invalidate({name, fallback})
@@ -0,0 +1,58 @@
+"""Find clusters of near-duplicate ideas across the whole database.
+
+    python dedupe.py                                  # ideas at least 50% alike
+    python dedupe.py --threshold 0.8 --output duplicates.json
+
+Ideas not yet in the near-duplicate index (bulk imports, databases from
+before it existed) are signed first; see minhash.py for how similarity
+is estimated.
+"""
+import argparse
+import json
+
+import db
+
+
+def describe_clusters(clusters):
+    """Clusters of ids as lists of {id, title, category} dicts."""
+    described = []
+    for cluster in clusters:
+        ideas = db.get_idea_details(cluster)
+        described.append([
+            {"id": idea_id, "title": ideas[idea_id].title, "category": ideas[idea_id].category}
+            for idea_id in cluster if idea_id in ideas
+        ])
+    return [cluster for cluster in described if len(cluster) > 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster near-duplicate ideas.")
+    parser.add_argument("--db", default=db.DB_Path, help="database file")
+    parser.add_argument("--threshold", type=float, default=db.SIMILARITY_THRESHOLD,
+                        help="estimated share of word pairs in common (default: %(default)s)")
+    parser.add_argument("--output", help="write the clusters as JSON to this file")
+    args = parser.parse_args()
+
+    db.DB_Path = args.db
+    db.init_db()
+    signed = db.index_signatures()
+    if signed:
+        print(f"Indexed {signed} idea(s)")
+
+    clusters = describe_clusters(db.find_duplicate_clusters(args.threshold))
+    for cluster in clusters:
+        print(f"{len(cluster)} similar ideas:")
+        for idea in cluster:
+            print(f"  #{idea['id']:<8} [{idea['category']}] {idea['title']}")
+    duplicates = sum(len(cluster) - 1 for cluster in clusters)
+    print(f"{len(clusters)} cluster(s), {duplicates} possible duplicate(s)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(clusters, file, indent=2)
+        print(f"Clusters written to {args.output}")
+    db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+from concurrent.futures import ThreadPoolExecutor
+
+# How often finished jobs are collected on the Tk thread
+POLL_INTERVAL_MS = 25
+DEFAULT_WORKERS = 2
+
+
+class QueryExecutor:
+    """Runs database calls on worker threads and hands results back to Tk.
+
+    Results are delivered on the Tk thread by polling with after(), since
+    tkinter widgets must not be touched from other threads. Jobs submitted
+    with the same key supersede each other: only the newest result is
+    delivered, older ones are dropped. Quiet jobs (e.g. periodic polls)
+    do not count as work for the busy indicator.
+    """
+
+    def __init__(self, root, workers=DEFAULT_WORKERS, on_busy=None):
+        """
+        root    : Tk widget used for after() polling
+        workers : number of worker threads
+        on_busy : optional callback(bool), called when work starts or stops
+        """
+        self.root = root
+        self.on_busy = on_busy
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gib-db")
+        self.pending = []
+        self.generations = {}
+        self.polling = False
+        self.busy = False
+        self.closed = False
+
+    def submit(self, func, *args, on_done=None, on_error=None, key=None, quiet=False, **kwargs):
+        """Run func(*args, **kwargs) in the background and return its future."""
+        generation = None
+        if key is not None:
+            generation = self.generations.get(key, 0) + 1
+            self.generations[key] = generation
+
+        future = self.pool.submit(func, *args, **kwargs)
+        self.pending.append((future, on_done, on_error, key, generation, quiet))
+
+        if not quiet:
+            self.set_busy(True)
+        if not self.polling:
+            self.polling = True
+            self.root.after(POLL_INTERVAL_MS, self.poll)
+        return future
+
+    def set_busy(self, busy):
+        if busy != self.busy:
+            self.busy = busy
+            if self.on_busy is not None:
+                self.on_busy(busy)
+
+    def is_current(self, key, generation):
+        return key is None or self.generations.get(key) == generation
+
+    def poll(self):
+        if self.closed:
+            return
+
+        finished = [job for job in self.pending if job[0].done()]
+        self.pending = [job for job in self.pending if not job[0].done()]
+
+        for future, on_done, on_error, key, generation, quiet in finished:
+            # A newer job with the same key has been submitted
+            if not self.is_current(key, generation) or future.cancelled():
+                continue
+
+            error = future.exception()
+            if error is not None:
+                if on_error is not None:
+                    on_error(error)
+                else:
+                    self.root.report_callback_exception(type(error), error, error.__traceback__)
+            elif on_done is not None:
+                on_done(future.result())
+
+            # A callback may have shut the executor down (e.g. closed the window)
+            if self.closed:
+                return
+
+        self.set_busy(any(not job[5] for job in self.pending))
+        if self.pending:
+            self.root.after(POLL_INTERVAL_MS, self.poll)
+        else:
+            self.polling = False
+
+    def shutdown(self):
+        """Stop delivering results; running jobs finish but are ignored."""
+        self.closed = True
+        self.pending = []
+        self.pool.shutdown(wait=False, cancel_futures=True)
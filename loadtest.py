@@ -0,0 +1,296 @@
+"""Load test: many designers working on one ideas.db at the same time.
+
+    python loadtest.py                                  # 1, 2, 4, 8 and 16 worker processes
+    python loadtest.py --workers 1,8,32 --duration 20 --rows 100000
+    python loadtest.py --mix get_ideas_by_filter=80,update_idea=20 --output load.json
+    python loadtest.py --server http://127.0.0.1:8765   # through a running service.py
+
+Every worker is a separate process running a weighted mix of operations
+against a scratch copy of a generated database (see bench.py), so locks
+are contended exactly as between desktop clients. Latencies are measured
+per call, including lock waits and retries. Lock errors are calls that
+still failed with "database is locked" (or 503 from the service) after
+db.py's retries.
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import queue
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+import db
+from bench import Generator, TAG_COUNT, prepare_database, remove_database
+from client import IdeaClient, ServiceError
+from metrics import Histogram
+
+DEFAULT_WORKERS = [1, 2, 4, 8, 16]
+DEFAULT_ROWS = 10_000
+DEFAULT_DURATION = 10.0
+
+# Weighted operation mix of a typical session: mostly browsing, some editing
+DEFAULT_MIX = {
+    "verify_user": 5,
+    "get_ideas_by_filter": 60,
+    "create_new_idea": 15,
+    "update_idea": 15,
+    "delete_idea": 5,
+}
+OPERATIONS = list(DEFAULT_MIX)
+
+# Seconds the workers get to start (import modules, open the database)
+START_TIMEOUT = 60
+# How often the parent checks that the workers it waits for are still alive (seconds)
+RESULT_POLL_SECONDS = 1
+
+
+class Worker:
+    """One simulated designer: runs random operations and times each call."""
+
+    def __init__(self, api, generator: Generator, max_id: int, seed: int):
+        self.api = api
+        self.generator = generator
+        self.random = random.Random(seed)
+        self.max_id = max_id
+        # Ideas this worker created, deleted first so the table keeps its size
+        self.created = []
+        self.search_words = generator.words[TAG_COUNT:]
+        self.stats = {name: {"latency": Histogram(), "lock_errors": 0, "errors": 0, "conflicts": 0}
+                      for name in OPERATIONS}
+
+    def random_id(self) -> int:
+        return self.random.randint(1, self.max_id)
+
+    def verify_user(self):
+        self.api.verify_user("zyz", "123456")
+
+    def get_ideas_by_filter(self):
+        if self.random.random() < 0.5:
+            self.api.get_ideas_by_filter(category=self.random.choice(self.generator.categories))
+        else:
+            self.api.get_ideas_by_filter(search_text=self.random.choice(self.search_words))
+
+    def create_new_idea(self):
+        title, category, description, tags, _, _ = self.generator.idea()
+        self.created.append(self.api.create_new_idea(title, category, description, tags))
+
+    def update_idea(self):
+        """Read an idea and save an edit of it, as IdeaForm does."""
+        idea = self.api.get_idea_detail(self.random_id())
+        if idea is None:
+            return
+        title = self.generator.text(self.random.randint(2, 8)).capitalize()
+        self.api.update_idea(idea.id, title, idea.category, idea.description, idea.tags, version=idea.version)
+
+    def delete_idea(self):
+        self.api.delete_idea(self.created.pop() if self.created else self.random_id())
+
+    def run(self, name: str):
+        stats = self.stats[name]
+        started = time.perf_counter()
+        try:
+            getattr(self, name)()
+        except db.EditConflict:
+            stats["conflicts"] += 1
+        except sqlite3.OperationalError as error:
+            stats["lock_errors" if db.is_lock_error(error) else "errors"] += 1
+        except ServiceError as error:
+            stats["lock_errors" if error.status == 503 else "errors"] += 1
+        except Exception:
+            # Anything else is counted too, so one bad call cannot end the worker
+            stats["errors"] += 1
+        stats["latency"].add((time.perf_counter() - started) * 1000)
+
+
+def run_worker(number: int, path: str, server: str | None, mix, duration: float, max_id: int, seed: int,
+               barrier, results):
+    """Process entry point: work for `duration` seconds, then report (number, stats)."""
+    if server:
+        api = IdeaClient(server)
+    else:
+        db.DB_Path = path
+        api = db
+    worker = Worker(api, Generator(seed), max_id, seed)
+    names, weights = list(mix), list(mix.values())
+
+    barrier.wait()
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        worker.run(worker.random.choices(names, weights)[0])
+
+    db.close_pool()
+    results.put((number, worker.stats))
+
+
+def run_level(workers: int, path: str, server: str | None, mix, duration: float, max_id: int, seed: int):
+    """Run `workers` processes at once and return the merged per-operation stats."""
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers + 1)
+    results = context.Queue()
+    processes = [
+        context.Process(target=run_worker,
+                        args=(number, path, server, mix, duration, max_id, seed * 1000 + number, barrier, results))
+        for number in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    merged = {name: {"latency": Histogram(), "lock_errors": 0, "errors": 0, "conflicts": 0} for name in OPERATIONS}
+    # Workers that have not reported yet, by number
+    pending = dict(enumerate(processes))
+    try:
+        # Start everyone together, once all processes have imported their modules
+        try:
+            barrier.wait(START_TIMEOUT)
+        except threading.BrokenBarrierError:
+            raise RuntimeError(f"worker processes did not start within {START_TIMEOUT} s") from None
+
+        while pending:
+            try:
+                number, worker_stats = results.get(timeout=RESULT_POLL_SECONDS)
+            except queue.Empty:
+                # A worker that died never reports; waiting for it would hang
+                for number, process in pending.items():
+                    if not process.is_alive():
+                        raise RuntimeError(f"worker {number} exited with code {process.exitcode} without reporting")
+                continue
+            del pending[number]
+            for name, stats in worker_stats.items():
+                merged[name]["latency"].merge(stats["latency"])
+                for key in ("lock_errors", "errors", "conflicts"):
+                    merged[name][key] += stats[key]
+    finally:
+        for process in processes:
+            if pending and process.is_alive():
+                process.terminate()
+            process.join()
+
+    return summarize(merged, duration)
+
+
+def summarize(merged, seconds: float):
+    """Throughput, tail latency and error rates per operation and in total."""
+    report = {}
+    total = Histogram()
+    lock_errors = errors = 0
+    for name, stats in merged.items():
+        latency = stats["latency"]
+        if not latency.count:
+            continue
+        total.merge(latency)
+        lock_errors += stats["lock_errors"]
+        errors += stats["errors"]
+        summary = latency.summary()
+        report[name] = {
+            "calls": latency.count,
+            "ops_per_s": round(latency.count / seconds, 1),
+            "p50_ms": round(summary["p50_ms"], 3),
+            "p95_ms": round(summary["p95_ms"], 3),
+            "p99_ms": round(summary["p99_ms"], 3),
+            "max_ms": round(summary["max_ms"], 3),
+            "lock_error_rate": round(stats["lock_errors"] / latency.count, 4),
+            "errors": stats["errors"],
+            "conflicts": stats["conflicts"],
+        }
+
+    summary = total.summary()
+    report["total"] = {
+        "calls": total.count,
+        "ops_per_s": round(total.count / seconds, 1),
+        "p50_ms": round(summary["p50_ms"], 3),
+        "p95_ms": round(summary["p95_ms"], 3),
+        "p99_ms": round(summary["p99_ms"], 3),
+        "max_ms": round(summary["max_ms"], 3),
+        "lock_error_rate": round(lock_errors / total.count, 4) if total.count else 0.0,
+        "errors": errors,
+    }
+    return report
+
+
+def print_level(workers: int, report):
+    print(f"{workers} worker(s)")
+    print(f"  {'operation':22} {'ops/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'lock err':>9} {'errors':>7}")
+    for name, stats in report.items():
+        print(f"  {name:22} {stats['ops_per_s']:9.1f} {stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f}"
+              f" {stats['p99_ms']:9.2f} {stats['lock_error_rate']:9.2%} {stats['errors']:7d}", flush=True)
+
+
+def parse_mix(text: str):
+    """Parse "name=weight,..." into {name: weight}, checked against OPERATIONS."""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}, expected one of {', '.join(OPERATIONS)}")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"weight of {name} is not a number") from None
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure db.py under many concurrent designer processes.")
+    parser.add_argument("--workers", default=",".join(str(count) for count in DEFAULT_WORKERS),
+                        help="comma-separated concurrency levels (default: %(default)s)")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="seconds per level")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="ideas in the scratch database")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="operation weights, e.g. get_ideas_by_filter=80,update_idea=20")
+    parser.add_argument("--server", help="load a running service.py instead of the database file")
+    parser.add_argument("--data-dir", default="bench_data", help="where generated databases are kept")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpus": multiprocessing.cpu_count(),
+            "rows": args.rows,
+            "duration": args.duration,
+            "mix": args.mix,
+            "server": args.server,
+        },
+        "results": {},
+    }
+
+    for workers in (int(count) for count in args.workers.split(",")):
+        if args.server:
+            path = None
+            max_id = IdeaClient(args.server).count_ideas()
+        else:
+            # Every level starts from the same data
+            path = prepare_database(args.data_dir, args.rows, args.seed)
+            max_id = args.rows
+            db.DB_Path = path
+            db.init_db()
+            db.close_pool()
+
+        try:
+            results = run_level(workers, path, args.server, args.mix, args.duration, max_id, args.seed)
+        finally:
+            if path is not None:
+                remove_database(path)
+        report["results"][str(workers)] = results
+        print_level(workers, results)
+
+    best = max(report["results"].items(), key=lambda item: item[1]["total"]["ops_per_s"])
+    print(f"Peak throughput: {best[1]['total']['ops_per_s']:.1f} ops/s with {best[0]} worker(s)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,53 @@
+import argparse
 import tkinter as tk
-from tkinter import ttk, messagebox
+from datetime import datetime
+from tkinter import ttk, messagebox, filedialog
 
-# Import database-related functions
+# Database backend: the db module itself, or a client.IdeaClient when
+# started with --server (both offer the same functions)
+import db
+import related
 from db import (
-    init_db,
-    create_new_idea,
-    get_all_ideas,
-    get_ideas_by_filter,
-    update_idea,
-    delete_idea,
-    create_user,
-    verify_user,
-    delete_ideas_by_category,
-    reassign_ideas_category,
+    DEFAULT_CATEGORIES,
+    EditConflict,
+    idea_matches,
+    is_search_refinement,
+    parse_tags,
+    SNIPPET_START,
+    SNIPPET_END,
 )
+from client import IdeaClient
+from executor import QueryExecutor
+from metrics import metrics
+from transfer import import_ideas, export_ideas
+from model import IdeaModel, PAGE_SIZE
+from virtual_list import VirtualTreeview
 
-# Default categories available in the app
-DEFAULT_CATEGORIES = ["uncategorized", "gameplay", "character", "level", "skin", "operation"]
+# Filters shown when the app opens or "Clear" is pressed
+DEFAULT_FILTERS = {"category": "all", "search_text": "", "tags": [], "match_all_tags": True, "fuzzy": False}
+
+# How timestamps are shown in the list and details pane
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M"
+
+# Delay between the last keystroke and the search query (milliseconds)
+SEARCH_DELAY_MS = 150
+
+# How often other users' changes are picked up (milliseconds)
+CHANGE_POLL_MS = 1000
+
+# How often related ideas are asked for again while they are being indexed (milliseconds)
+RELATED_RETRY_MS = 2000
+
+# Where ideas are read and written; replaced by an IdeaClient in client mode
+api = db
+
+# How often the diagnostics window re-reads the latency histograms (milliseconds)
+DIAGNOSTICS_REFRESH_MS = 1000
+
+
+def format_timestamp(ms):
+    """Format a stored epoch-milliseconds timestamp in local time."""
+    return datetime.fromtimestamp(ms / 1000).strftime(TIMESTAMP_FORMAT)
 
 
 class LoginWindow(tk.Tk):
@@ -28,6 +59,9 @@ class LoginWindow(tk.Tk):
         self.geometry("800x400")
         self.resizable(False, False)
 
+        # Runs the login check off the Tk thread
+        self.executor = QueryExecutor(self)
+
         # Build all login widgets
         self.build_widgets()
 
@@ -91,8 +125,16 @@ class LoginWindow(tk.Tk):
         username = self.username_entry.get().strip()
         password = self.password_entry.get()
 
-        if verify_user(username, password):
+        self.config(cursor="watch")
+        self.executor.submit(api.verify_user, username, password, on_done=self.login_checked, key="login")
+
+    def login_checked(self, ok):
+        """Open the main app, or show an error, once the login check returns."""
+        self.config(cursor="")
+
+        if ok:
             # On success, close login window and open main app
+            self.executor.shutdown()
             self.destroy()
             app = MainApp()
             app.mainloop()
@@ -163,14 +205,26 @@ class RegisterWindow(tk.Toplevel):
             return
 
         # Try to create a new user
-        ok = create_user(username, password)
+        self.config(cursor="watch")
+        self.master.executor.submit(
+            api.create_user, username, password,
+            on_done=self.account_created, on_error=self.create_failed,
+        )
+
+    def account_created(self, ok):
+        """Close the window, or say why not, once the account is written."""
+        self.config(cursor="")
         if not ok:
-            messagebox.showerror("Error", "This username is already taken.")
+            messagebox.showerror("Error", "This username is already taken.", parent=self)
             return
 
-        messagebox.showinfo("Success", "Account created. You can now log in.")
+        messagebox.showinfo("Success", "Account created. You can now log in.", parent=self)
         self.destroy()
 
+    def create_failed(self, error):
+        self.config(cursor="")
+        messagebox.showerror("Error", f"The account could not be created:\n\n{error}", parent=self)
+
 
 class IdeaForm(tk.Toplevel):
     """Popup form for adding or editing a single idea."""
@@ -179,15 +233,15 @@ class IdeaForm(tk.Toplevel):
         """
         master    : parent window (MainApp)
         mode      : 'create' or 'edit'
-        idea      : current idea dict if editing
-        on_saved  : callback to refresh list after saving
-        categories: category list (currently ignored, using DEFAULT_CATEGORIES)
+        idea      : current Idea (see db.py) if editing
+        on_saved  : callback taking the saved idea id, to refresh the list
+        categories: category names to choose from (defaults to DEFAULT_CATEGORIES)
         """
         super().__init__(master)
         self.mode = mode
         self.idea = idea
         self.on_saved = on_saved
-        self.categories = DEFAULT_CATEGORIES
+        self.categories = list(categories) if categories else DEFAULT_CATEGORIES
 
         # Set window title based on mode
         if self.mode == "create":
@@ -245,19 +299,19 @@ class IdeaForm(tk.Toplevel):
         """Fill in existing idea data when in edit mode."""
 
         # Title
-        self.entry_title.insert(0, self.idea.get("title", ""))
+        self.entry_title.insert(0, self.idea.title)
 
         # Category
-        category = self.idea.get("category", "")
+        category = self.idea.category
         if category in self.categories:
             self.combo_category.set(category)
         else:
             self.combo_category.set(category)
 
         # Tags
-        self.entry_tags.insert(0, self.idea.get("tags", ""))
+        self.entry_tags.insert(0, self.idea.tags or "")
         # Description
-        self.text_description.insert("1.0", self.idea.get("description", ""))
+        self.text_description.insert("1.0", self.idea.description or "")
 
     def on_save(self):
         """Validate input and either create or update an idea."""
@@ -283,31 +337,231 @@ class IdeaForm(tk.Toplevel):
             ):
                 return
 
-        # Decide whether to insert or update
+        # Editing only the category or tags cannot make a duplicate
+        if self.mode != "create" and (title, description) == (self.idea.title, self.idea.description):
+            self.save(title, category, description, tags)
+            return
+
+        # A failed check must not stop the save
+        self.master.executor.submit(
+            api.find_similar_ideas, title, description,
+            exclude_id=self.idea.id if self.mode != "create" else None,
+            on_done=lambda matches: self.confirm_save(matches, title, category, description, tags),
+            on_error=lambda error: self.save(title, category, description, tags),
+        )
+
+    def confirm_save(self, matches, title, category, description, tags):
+        """Ask before saving an idea that looks like one already filed."""
+        if matches:
+            lines = "\n".join(f"- {idea.title} ({idea.category}, {similarity:.0%} similar)"
+                              for idea, similarity in matches)
+            if not messagebox.askyesno(
+                    "Similar ideas exist",
+                    f"Similar ideas exist:\n\n{lines}\n\nSave this idea anyway?",
+                    parent=self,
+            ):
+                return
+        self.save(title, category, description, tags)
+
+    def save(self, title, category, description, tags):
+        """Either create or update the idea."""
         if self.mode == "create":
-            create_new_idea(
+            self.master.executor.submit(
+                api.create_new_idea,
                 title=title,
                 category=category,
                 description=description,
                 tags=tags,
+                on_done=self.saved,
+                on_error=self.save_failed,
             )
         else:
-            update_idea(
-                idea_id=self.idea["id"],
+            idea_id = self.idea.id
+            self.master.executor.submit(
+                api.update_idea,
+                idea_id=idea_id,
                 title=title,
                 category=category,
                 description=description,
                 tags=tags,
+                version=self.idea.version,
+                on_done=lambda result: self.saved(idea_id),
+                on_error=self.save_failed,
             )
 
+    def save_failed(self, error):
+        """Let the user choose what to do when someone else saved the idea first;
+        any other error leaves the form open to try again."""
+        if not isinstance(error, EditConflict):
+            messagebox.showerror("Save failed", f"The idea could not be saved:\n\n{error}", parent=self)
+            return
+
+        current = error.current
+        if current is None:
+            messagebox.showerror("Idea deleted", "Someone else deleted this idea while you were editing it.",
+                                 parent=self)
+            self.destroy()
+            return
+
+        choice = messagebox.askyesnocancel(
+            "Edit conflict",
+            "Someone else saved this idea while you were editing it.\n\n"
+            "Yes: save your version over theirs\n"
+            "No: discard your changes and show theirs\n"
+            "Cancel: keep editing",
+            parent=self
+        )
+        if choice is None:
+            return
+
+        # Later saves are checked against the version now stored
+        self.idea = current
+        if choice:
+            self.on_save()
+        else:
+            self.entry_title.delete(0, "end")
+            self.entry_tags.delete(0, "end")
+            self.text_description.delete("1.0", "end")
+            self.populate_fields()
+
+    def saved(self, idea_id):
+        """Called once the database write has finished."""
+
         # Notify main window to refresh, if callback exists
         if self.on_saved is not None:
-            self.on_saved()
+            self.on_saved(idea_id)
 
         # Close the form
         self.destroy()
 
 
+class BulkEditForm(tk.Toplevel):
+    """Popup form for recategorizing and retagging several ideas at once."""
+
+    def __init__(self, master, idea_ids, on_saved=None, categories=None):
+        """
+        master    : parent window (MainApp)
+        idea_ids  : ids of the selected ideas
+        on_saved  : callback run once the change is saved, to refresh the list
+        categories: category names to choose from (defaults to DEFAULT_CATEGORIES)
+        """
+        super().__init__(master)
+        self.idea_ids = list(idea_ids)
+        self.on_saved = on_saved
+        self.categories = list(categories) if categories else DEFAULT_CATEGORIES
+
+        self.title(f"Edit {len(self.idea_ids)} Ideas")
+        self.resizable(False, False)
+        self.build_widgets()
+
+        # Modal behavior
+        self.transient(master)
+        self.grab_set()
+        self.protocol("WM_DELETE_WINDOW", self.destroy)
+
+    def build_widgets(self):
+        """Create the category and tag fields and the button bar."""
+
+        padding = {"padx": 8, "pady": 5}
+
+        # Category, left empty to keep each idea's own
+        ttk.Label(self, text="Move to category:").grid(row=0, column=0, sticky="w", **padding)
+        self.combo_category = ttk.Combobox(self, values=[""] + self.categories, state="readonly", width=30)
+        self.combo_category.grid(row=0, column=1, sticky="we", **padding)
+
+        # Tags
+        ttk.Label(self, text="Add tags (comma-separated):").grid(row=1, column=0, sticky="w", **padding)
+        self.entry_add_tags = ttk.Entry(self, width=32)
+        self.entry_add_tags.grid(row=1, column=1, **padding)
+
+        ttk.Label(self, text="Remove tags (comma-separated):").grid(row=2, column=0, sticky="w", **padding)
+        self.entry_remove_tags = ttk.Entry(self, width=32)
+        self.entry_remove_tags.grid(row=2, column=1, **padding)
+
+        # Save / Cancel button bar
+        btn_frame = ttk.Frame(self)
+        btn_frame.grid(row=3, column=0, columnspan=2, sticky="e", padx=10, pady=(0, 10))
+
+        ttk.Button(btn_frame, text="Save", command=self.on_save).pack(side="right", padx=(0, 5))
+        ttk.Button(btn_frame, text="Cancel", command=self.destroy).pack(side="right")
+
+    def on_save(self):
+        """Apply the changes to every selected idea in one transaction."""
+
+        category = self.combo_category.get().strip()
+        add_tags = parse_tags(self.entry_add_tags.get())
+        remove_tags = parse_tags(self.entry_remove_tags.get())
+
+        if not (category or add_tags or remove_tags):
+            messagebox.showwarning("Nothing to change", "Choose a category or enter tags to add or remove.")
+            return
+
+        self.master.executor.submit(
+            api.edit_ideas, self.idea_ids,
+            category=category or None, add_tags=add_tags, remove_tags=remove_tags,
+            on_done=lambda result: self.saved(),
+            on_error=self.save_failed,
+        )
+
+    def save_failed(self, error):
+        """Keep the form open to try again."""
+        messagebox.showerror("Save failed", f"The changes could not be saved:\n\n{error}", parent=self)
+
+    def saved(self):
+        """Called once the database write has finished."""
+        if self.on_saved is not None:
+            self.on_saved()
+        self.destroy()
+
+
+class DiagnosticsWindow(tk.Toplevel):
+    """Live latency percentiles of every database call, refreshed every second."""
+
+    COLUMNS = ("calls", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms")
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.title("Diagnostics")
+        self.geometry("640x360")
+
+        self.tree = ttk.Treeview(self, columns=self.COLUMNS, show="tree headings")
+        self.tree.heading("#0", text="Operation")
+        self.tree.column("#0", width=180)
+        for column in self.COLUMNS:
+            self.tree.heading(column, text=column.replace("_ms", " (ms)").capitalize())
+            self.tree.column(column, width=70, anchor="e")
+        self.tree.pack(side="top", fill="both", expand=True, padx=8, pady=(8, 0))
+
+        bottom = ttk.Frame(self)
+        bottom.pack(side="bottom", fill="x", padx=8, pady=8)
+        self.cache_var = tk.StringVar()
+        ttk.Label(bottom, textvariable=self.cache_var).pack(side="left")
+        ttk.Button(bottom, text="Reset", command=self.reset).pack(side="right")
+
+        self.refresh()
+
+    def refresh(self):
+        self.tree.delete(*self.tree.get_children())
+        for name, summary in metrics.snapshot().items():
+            values = [summary["calls"]] + [f"{summary[column]:.2f}" for column in self.COLUMNS[1:]]
+            self.tree.insert("", "end", text=name, values=values)
+
+        stats = api.get_cache_stats()
+        self.cache_var.set(
+            f"Result cache: {stats['size']} entries, {stats['hits']} hits, {stats['misses']} misses"
+        )
+        self.after_id = self.after(DIAGNOSTICS_REFRESH_MS, self.refresh)
+
+    def reset(self):
+        metrics.reset()
+        self.after_cancel(self.after_id)
+        self.refresh()
+
+    def destroy(self):
+        self.after_cancel(self.after_id)
+        super().destroy()
+
+
 class MainApp(tk.Tk):
     """Main application window shown after login."""
 
@@ -370,18 +624,63 @@ class MainApp(tk.Tk):
         self.title("Gameplay Idea Brainstormer")
         self.geometry("1000x600")
 
-        # Dynamic category list (starts from default)
+        # Category names and idea counts, loaded from the database
         self.categories = DEFAULT_CATEGORIES.copy()
-        # In-memory list of currently loaded ideas
-        self.current_ideas = []
+        self.category_counts = {}
+        # Combobox label ("name (count)") -> category name
+        self.category_labels = {}
+        # Filters (db.py keyword arguments) the idea list is currently showing
+        self.active_filters = DEFAULT_FILTERS
+        # Column the list is sorted by (None uses the database default)
+        self.active_sort = None
+
+        # Database work runs on worker threads so the window never freezes
+        self.executor = QueryExecutor(self, on_busy=self.set_busy)
+
+        # Loaded ideas, indexed by id and by position per sort order; pages
+        # scrolled into view are fetched in the background
+        self.ideas = IdeaModel(
+            fetch_count=lambda: api.count_ideas(**self.active_filters),
+            fetch_page=lambda sort, after, before, offset, limit: api.get_ideas_page(
+                **self.active_filters, sort=sort, limit=limit, offset=offset,
+                after=(after.sort_key, after.id) if after else None,
+                before=(before.sort_key, before.id) if before else None,
+            )[0],
+            load=self.load_rows,
+        )
+
+        # Search-as-you-type state: pending debounce, running listing query,
+        # and the last listing that was loaded in full
+        self.search_after = None
+        self.listing_query = None
+        self.complete_result = None
+        # Change feed position of the shown list, and the pending poll
+        self.change_seq = None
+        self.poll_after = None
 
         # Build UI and load data
         self.build_widgets()
+        # Subscribed after the list widget so it sees the list already updated
+        self.ideas.subscribe(self.ideas_changed)
+        self.refresh_categories()
         self.load_ideas()
 
         # Show welcome popup shortly after UI appears
         self.after(100, self.welcome_message)
 
+    def load_rows(self, func, on_done, on_error):
+        """Run a row fetch for the idea list on a worker thread."""
+        def failed(error):
+            on_error(error)
+            self.report_callback_exception(type(error), error, error.__traceback__)
+
+        self.executor.submit(func, on_done=on_done, on_error=failed)
+
+    def set_busy(self, busy):
+        """Show or hide the busy indicator while database work is running."""
+        self.busy_var.set("Loading..." if busy else "")
+        self.config(cursor="watch" if busy else "")
+
     def welcome_message(self):
         """Show an initial help/information popup when app opens."""
         messagebox.showinfo(
@@ -422,8 +721,28 @@ class MainApp(tk.Tk):
         # Search bar
         ttk.Label(row1, text="Search:", style="Retro.TLabel").pack(side="left")
         self.search_var = tk.StringVar()
-        self.search_entry = ttk.Entry(row1, textvariable=self.search_var, width=30)
+        self.search_entry = ttk.Entry(row1, textvariable=self.search_var, width=24)
         self.search_entry.pack(side="left", padx=5)
+        self.search_entry.bind("<Return>", lambda e: self.apply_filters())
+        self.search_var.trace_add("write", self.search_changed)
+        # Fuzzy search matches titles and tags despite typos
+        self.fuzzy_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            row1, text="fuzzy", variable=self.fuzzy_var,
+            command=self.apply_filters
+        ).pack(side="left", padx=(0, 5))
+
+        # Tag filter: comma-separated tags, all of them unless "any" is ticked
+        ttk.Label(row1, text="Tags:", style="Retro.TLabel").pack(side="left")
+        self.tags_var = tk.StringVar()
+        tags_entry = ttk.Entry(row1, textvariable=self.tags_var, width=15)
+        tags_entry.pack(side="left", padx=5)
+        tags_entry.bind("<Return>", lambda e: self.apply_filters())
+        self.any_tag_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            row1, text="any", variable=self.any_tag_var,
+            command=self.apply_filters
+        ).pack(side="left", padx=(0, 5))
 
         # Go button
         ttk.Button(
@@ -446,6 +765,17 @@ class MainApp(tk.Tk):
             style="Retro.TButton"
         ).pack(side="left", padx=5)
 
+        # Latency diagnostics
+        ttk.Button(
+            row1, text="Diagnostics",
+            command=lambda: DiagnosticsWindow(self),
+            style="Retro.TButton"
+        ).pack(side="left", padx=(0, 5))
+
+        # Busy indicator
+        self.busy_var = tk.StringVar()
+        ttk.Label(row1, textvariable=self.busy_var, style="Retro.TLabel").pack(side="left", padx=5)
+
         # ===== Row 2: Idea actions + Category management + Logout =====
         row2 = ttk.Frame(top_frame, style="Retro.TFrame")
         row2.pack(side="top", fill="x", pady=(5, 0))
@@ -469,6 +799,23 @@ class MainApp(tk.Tk):
             style="Retro.TButton"
         ).pack(side="left", padx=5)
 
+        # Bulk import / export buttons; files are read and written next to
+        # the database, so they are only offered when it is opened directly
+        transfer_state = "normal" if api is db else "disabled"
+        ttk.Button(
+            row2, text="Import...",
+            command=self.import_file,
+            state=transfer_state,
+            style="Retro.TButton"
+        ).pack(side="left", padx=5)
+
+        ttk.Button(
+            row2, text="Export...",
+            command=self.export_file,
+            state=transfer_state,
+            style="Retro.TButton"
+        ).pack(side="left", padx=5)
+
         # Entry for new category name
         self.new_category_var = tk.StringVar()
         ttk.Entry(row2, textvariable=self.new_category_var, width=20).pack(side="left", padx=(20, 5))
@@ -502,31 +849,38 @@ class MainApp(tk.Tk):
         left_frame = ttk.Frame(main_frame, style="Retro.TFrame")
         main_frame.add(left_frame, weight=2)
 
+        # Only the rows scrolled into view are fetched and drawn
         columns = ("title", "category", "created_at", "updated_at")
-        self.tree = ttk.Treeview(
+        self.idea_list = VirtualTreeview(
             left_frame,
             columns=columns,
-            show="headings",
+            model=self.ideas,
+            row_values=lambda idea: (
+                idea.title,
+                idea.category,
+                format_timestamp(idea.created_at),
+                format_timestamp(idea.updated_at),
+            ),
+            style="Retro.TFrame",
+            selectmode="extended",
             height=15
         )
-        self.tree.heading("title", text="Title")
+        self.tree = self.idea_list.tree
+        # Clicking a heading sorts by that column
+        self.tree.heading("title", text="Title", command=lambda: self.sort_by("title"))
         self.tree.heading("category", text="Category")
-        self.tree.heading("created_at", text="Created At")
-        self.tree.heading("updated_at", text="Updated At")
+        self.tree.heading("created_at", text="Created At", command=lambda: self.sort_by("created_at"))
+        self.tree.heading("updated_at", text="Updated At", command=lambda: self.sort_by("updated_at"))
 
         self.tree.column("title", width=220)
         self.tree.column("category", width=100)
         self.tree.column("created_at", width=130)
         self.tree.column("updated_at", width=130)
 
-        vsb = ttk.Scrollbar(left_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=vsb.set)
-
-        self.tree.pack(side="left", fill="both", expand=True)
-        vsb.pack(side="right", fill="y")
+        self.idea_list.pack(fill="both", expand=True)
 
         # Update details when selection changes
-        self.tree.bind("<<TreeviewSelect>>", self.on_tree_select)
+        self.tree.bind("<<TreeviewSelect>>", self.on_tree_select, add="+")
 
         # Right side: idea details
         right_frame = ttk.Frame(main_frame, style="Retro.TFrame")
@@ -542,6 +896,23 @@ class MainApp(tk.Tk):
             fg="#4B3E35"
         )
         self.details_text.pack(fill="both", expand=True, pady=(5, 0))
+        self.details_text.tag_configure("match", background="#F2D27A")
+
+        # Related ideas, hidden for good if they cannot be computed (no NumPy)
+        self.related_frame = ttk.Frame(right_frame, style="Retro.TFrame")
+        self.related_frame.pack(fill="x", pady=(5, 0))
+        ttk.Label(self.related_frame, text="Related Ideas:", style="Retro.TLabel").pack(anchor="w")
+        self.related_list = tk.Listbox(
+            self.related_frame,
+            height=6,
+            activestyle="none",
+            bg="#FFF9EF",
+            fg="#4B3E35"
+        )
+        self.related_list.pack(fill="x", pady=(5, 0))
+        # Local mode computes them here, client mode asks the service
+        self.related_source = related if api is db else api
+        self.related_future = None
 
     def show_info(self):
         """Show a help/about dialog with usage tips."""
@@ -563,12 +934,39 @@ class MainApp(tk.Tk):
         if not confirm:
             return
 
+        if self.poll_after is not None:
+            self.after_cancel(self.poll_after)
+        self.executor.shutdown()
         self.destroy()
         login_window = LoginWindow()
         login_window.mainloop()
 
+    def refresh_categories(self):
+        """Reload category names and counts for the dropdown in the background."""
+        self.executor.submit(api.get_categories, on_done=self.categories_loaded, key="categories")
+
+    def categories_loaded(self, categories):
+        """Rebuild the dropdown labels, keeping the selected category."""
+        selected = self.selected_category()
+
+        self.categories = [name for name, _ in categories]
+        self.category_counts = dict(categories)
+        self.category_labels = {f"{name} ({count})": name for name, count in categories}
+        self.category_combo["values"] = ["all"] + list(self.category_labels)
+        self.select_category(selected)
+
+    def selected_category(self):
+        """Return the category name behind the dropdown label."""
+        label = self.category_var.get().strip()
+        return self.category_labels.get(label, label)
+
+    def select_category(self, name):
+        """Select a category in the dropdown by name."""
+        label = next((label for label, n in self.category_labels.items() if n == name), name)
+        self.category_var.set(label)
+
     def add_category(self):
-        """Add a new category from the text field into the dropdown list."""
+        """Add a new category from the text field into the database and dropdown."""
         name = self.new_category_var.get().strip()
         if not name:
             messagebox.showwarning(
@@ -577,23 +975,23 @@ class MainApp(tk.Tk):
             )
             return
 
-        # Check for duplicates (case-insensitive)
-        for c in self.categories:
-            if c.lower() == name.lower():
-                messagebox.showinfo(
-                    "Category exists",
-                    "This category already exist. Please use the search bar to find it."
-                )
-                return
+        self.executor.submit(api.create_category, name, on_done=self.category_added)
+
+    def category_added(self, ok):
+        """Refresh the dropdown, or report a duplicate (case-insensitive) name."""
+        if not ok:
+            messagebox.showinfo(
+                "Category exists",
+                "This category already exist. Please use the search bar to find it."
+            )
+            return
 
-        # Append to category list and refresh dropdown
-        self.categories.append(name)
-        self.category_combo["values"] = ["all"] + self.categories
         self.new_category_var.set("")
+        self.refresh_categories()
 
     def remove_category(self):
         """Remove the currently selected category and handle its ideas."""
-        name = self.category_var.get().strip()
+        name = self.selected_category()
 
         # Disallow removing global options
         if name == "all":
@@ -618,82 +1016,219 @@ class MainApp(tk.Tk):
             )
             return
 
-        # Count how many ideas use this category
-        used_ideas = [i for i in self.current_ideas if i["category"] == name]
-        count = len(used_ideas)
+        # Exact count, read from the trigger-maintained categories table
+        self.executor.submit(
+            api.get_category_count, name,
+            on_done=lambda count: self.confirm_remove_category(name, count)
+        )
+
+    def confirm_remove_category(self, name, count):
+        """Ask what to do with a category's ideas, then remove the category."""
 
         # Ask user what to do with ideas in this category
+        with_ideas = False
         if count > 0:
-            answer = messagebox.askyesno(
+            with_ideas = messagebox.askyesno(
                 "Category is in use",
                 f"{count} ideas use '{name}'.\n\nDo you want to delete the ideas as well?"
                 "Press 'Yes' to delete both the ideas and the Category.\n"
                 "Press 'No' delete the category and keep these ideas by moving them to 'uncategorized'."
             )
-            if answer:
-                delete_ideas_by_category(name)
-            else:
-                reassign_ideas_category(name, "uncategorized")
-
-        # Remove from category list and refresh category combobox
-        self.categories.remove(name)
-        self.category_combo["values"] = ["all"] + self.categories
-        self.category_var.set("uncategorized")
+
+        self.executor.submit(
+            api.delete_category, name, with_ideas=with_ideas,
+            on_done=lambda r: self.category_removed()
+        )
+
+    def category_removed(self):
+        """Show 'uncategorized' once a category and its ideas are handled."""
+        self.select_category("uncategorized")
+        self.refresh_categories()
         self.apply_filters()
 
-    def load_ideas(self, ideas=None):
-        """Load ideas into the Treeview (optionally with a provided list)."""
-
-        if ideas is None:
-            ideas = get_all_ideas()
-        self.current_ideas = ideas
-
-        # Clear current rows
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-
-        # Insert each idea as a row
-        for idea in ideas:
-            self.tree.insert(
-                "",
-                "end",
-                iid=str(idea["id"]),
-                values=(
-                    idea["title"],
-                    idea["category"],
-                    idea["created_at"],
-                    idea["updated_at"],
-                )
-            )
+    def load_ideas(self, filters=None, sort=None):
+        """Fetch the first rows for a set of filters in the background, then show them."""
+        if filters is None:
+            filters = self.active_filters
+
+        # A newer listing makes the running one pointless, so abort it
+        if self.listing_query is not None:
+            self.listing_query.cancel()
+        query = self.listing_query = api.InterruptibleQuery()
+
+        def fetch():
+            with query:
+                # Read first: later changes are replayed on top of this listing
+                seq = api.get_change_seq()
+                rows, _ = api.get_ideas_page(**filters, sort=sort, limit=PAGE_SIZE)
+                total = api.count_ideas(**filters)
+                # A result that fits in one page can be searched in memory while typing
+                details = api.get_idea_details(idea.id for idea in rows) if total == len(rows) else None
+                return seq, total, rows, details
+
+        self.executor.submit(fetch, on_done=lambda result: self.ideas_loaded(filters, sort, *result), key="ideas")
+
+    def ideas_loaded(self, filters, sort, seq, total, rows, details):
+        """Show a finished listing; superseded listings never get here."""
+        self.change_seq = seq
+        self.schedule_poll()
+        # Other sort orders of the same filters stay cached
+        same_filters = filters == self.active_filters
+        self.active_filters = filters
+        self.active_sort = sort
+        self.listing_query = None
+        self.complete_result = (filters, sort, rows, details) if details is not None else None
+        self.ideas.reset(total, rows, sort, keep_views=same_filters)
 
         # Reset details panel
         self.show_details(None)
 
+    def search_changed(self, *args):
+        """Preview and schedule a search while the user types."""
+        if self.search_after is not None:
+            self.after_cancel(self.search_after)
+        self.search_after = self.after(SEARCH_DELAY_MS, self.apply_filters)
+        self.preview_search()
+
+    def preview_search(self):
+        """Narrow the last full result in memory when the new text only refines it."""
+        if self.complete_result is None:
+            return
+
+        filters, sort, rows, details = self.complete_result
+        new_filters = self.read_filters()
+        old_text, new_text = filters["search_text"], new_filters["search_text"]
+        other_filters_changed = any(filters[name] != new_filters[name] for name in filters if name != "search_text")
+        # Typo-tolerant results cannot be narrowed by exact word matching
+        if other_filters_changed or new_filters["fuzzy"] or not is_search_refinement(old_text, new_text):
+            return
+
+        # The database query still follows and replaces this preview
+        matches = [idea for idea in rows if idea.id in details and idea_matches(details[idea.id], new_text)]
+        self.ideas.reset(len(matches), matches, sort)
+
+    def read_filters(self):
+        """Collect the filter widgets into keyword arguments for db.py."""
+        return {
+            "category": self.selected_category(),
+            "search_text": self.search_var.get().strip(),
+            "tags": parse_tags(self.tags_var.get()),
+            "match_all_tags": not self.any_tag_var.get(),
+            "fuzzy": self.fuzzy_var.get(),
+        }
+
     def apply_filters(self):
-        """Filter ideas based on current category and search text."""
-        category = self.category_var.get()
-        search_text = self.search_var.get().strip()
-        ideas = get_ideas_by_filter(category=category, search_text=search_text)
-        self.load_ideas(ideas)
+        """Filter ideas based on current category, search text and tags."""
+        if self.search_after is not None:
+            self.after_cancel(self.search_after)
+            self.search_after = None
+
+        self.load_ideas(self.read_filters(), self.active_sort)
 
     def clear_filters(self):
         """Reset filters to show all ideas."""
         self.category_var.set("all")
         self.search_var.set("")
-        self.load_ideas()
+        self.tags_var.set("")
+        self.any_tag_var.set(False)
+        self.fuzzy_var.set(False)
+        if self.search_after is not None:
+            self.after_cancel(self.search_after)
+            self.search_after = None
+        self.load_ideas(DEFAULT_FILTERS, None)
+
+    def sort_by(self, column):
+        """Sort the list by a column heading, reusing a cached order if there is one."""
+        if self.ideas.has_view(column):
+            self.active_sort = column
+            self.ideas.set_sort(column)
+            self.show_details(None)
+            return
+        self.load_ideas(self.active_filters, column)
+
+    def ideas_changed(self, event, *args):
+        """Keep the details pane in step when the loaded ideas change."""
+        if event in ("update", "move", "remove"):
+            self.on_tree_select()
 
     def on_tree_select(self, event=None):
         """Show idea details when a row in the Treeview is selected."""
-        selection = self.tree.selection()
-        if not selection:
+        idea = self.idea_list.selected_row()
+        if idea is None:
             self.show_details(None)
             return
 
-        item_id = int(selection[0])
-        idea = next((i for i in self.current_ideas if i["id"] == item_id), None)
-        self.show_details(idea)
+        # Descriptions are not part of the listing; fetch them unless cached
+        detail = api.cached_idea_detail(idea.id)
+        self.show_details(idea, detail)
+        if detail is None:
+            self.executor.submit(
+                api.get_idea_detail, idea.id, key="details",
+                on_done=lambda detail: self.detail_loaded(idea, detail)
+            )
+
+        if self.related_source is not None:
+            self.related_list.delete(0, "end")
+            self.related_list.insert("end", "Loading...")
+            self.load_related(idea)
 
-    def show_details(self, idea):
+    def load_related(self, idea):
+        """Fetch related ideas, one request at a time.
+
+        Scoring a large database takes a moment; queuing a request per
+        selection change behind it would tie up the worker threads.
+        """
+        if self.related_future is not None and not self.related_future.done():
+            # related_loaded() asks again for whatever is selected by then
+            return
+        self.related_future = self.executor.submit(
+            self.related_source.get_related_ideas, idea.id,
+            on_done=lambda matches: self.related_loaded(idea, matches),
+            on_error=lambda error: self.related_failed(idea, error),
+        )
+
+    def related_failed(self, idea, error):
+        """Ask again shortly while the index is being built, else list nothing."""
+        if not isinstance(error, related.IndexNotReady):
+            self.related_loaded(idea, [])
+            return
+        if self.idea_list.selected_row() is None:
+            return
+        self.related_list.delete(0, "end")
+        self.related_list.insert("end", "Indexing ideas...")
+
+        def retry():
+            selected = self.idea_list.selected_row()
+            if selected is not None:
+                self.load_related(selected)
+
+        self.after(RELATED_RETRY_MS, retry)
+
+    def related_loaded(self, idea, matches):
+        """List the ideas most like the selected one."""
+        if matches is None:
+            self.related_source = None
+            self.related_frame.pack_forget()
+            return
+        selected = self.idea_list.selected_row()
+        if selected is None:
+            return
+        if selected.id != idea.id:
+            self.load_related(selected)
+            return
+        self.related_list.delete(0, "end")
+        for match, similarity in matches:
+            self.related_list.insert("end", f"{match.title} [{match.category}] {similarity:.0%}")
+        if not matches:
+            self.related_list.insert("end", "No related ideas found.")
+
+    def detail_loaded(self, idea, detail):
+        """Fill in a fetched description if its idea is still selected."""
+        if self.idea_list.selected_id != idea.id:
+            return
+        self.show_details(idea if detail is not None else None, detail)
+
+    def show_details(self, idea, detail=None):
         """Update right-hand text box with idea details or a default message."""
 
         self.details_text.config(state="normal")
@@ -701,54 +1236,220 @@ class MainApp(tk.Tk):
 
         if idea is None:
             self.details_text.insert("1.0", "Select an idea to see details.")
+            self.related_list.delete(0, "end")
         else:
             text = (
-                f"Title: {idea['title']}\n"
-                f"Category: {idea['category']}\n"
-                f"Tags: {idea.get('tags', '')}\n"
-                f"Created: {idea['created_at']}\n"
-                f"Updated: {idea['updated_at']}\n\n"
-                f"{idea['description']}"
+                f"Title: {idea.title}\n"
+                f"Category: {idea.category}\n"
+                f"Tags: {(detail.tags or '') if detail else ''}\n"
+                f"Created: {format_timestamp(idea.created_at)}\n"
+                f"Updated: {format_timestamp(idea.updated_at)}\n\n"
+                f"{detail.description if detail else 'Loading...'}"
             )
             self.details_text.insert("1.0", text)
 
+            # Show the search snippet with matched terms highlighted
+            if idea.snippet:
+                self.details_text.insert("end", "\n\nSearch match:\n")
+                self.insert_highlighted(idea.snippet)
+
         self.details_text.config(state="disabled")
 
+    def insert_highlighted(self, snippet):
+        """Insert a search snippet, tagging the text between match markers."""
+        for i, part in enumerate(snippet.split(SNIPPET_START)):
+            if i == 0:
+                self.details_text.insert("end", part)
+                continue
+            matched, _, rest = part.partition(SNIPPET_END)
+            self.details_text.insert("end", matched, "match")
+            self.details_text.insert("end", rest)
+
     def add_idea(self):
         """Open the idea form in create mode."""
-        IdeaForm(self, mode="create", idea=None, on_saved=self.apply_filters, categories=self.categories)
+        IdeaForm(self, mode="create", idea=None, on_saved=self.idea_saved, categories=self.categories)
 
     def edit_idea(self):
-        """Open the idea form in edit mode for the selected idea."""
-        selection = self.tree.selection()
-        if not selection:
+        """Open the idea form in edit mode for the selected idea(s)."""
+        selected = self.idea_list.selected_rows()
+        if len(selected) > 1:
+            BulkEditForm(
+                self, [idea.id for idea in selected],
+                on_saved=self.ideas_bulk_changed, categories=self.categories
+            )
+            return
+
+        idea = self.idea_list.selected_row()
+        if idea is None:
             messagebox.showinfo("No selection", "Please select an idea to edit.")
             return
 
-        item_id = int(selection[0])
-        idea = next((i for i in self.current_ideas if i["id"] == item_id), None)
+        def open_form(detail):
+            if detail is None:
+                messagebox.showinfo("Not found", "This idea no longer exists.")
+                return
+            IdeaForm(
+                self, mode="edit", idea=detail,
+                on_saved=self.idea_saved,
+                categories=self.categories
+            )
 
-        IdeaForm(self, mode="edit", idea=idea, on_saved=self.apply_filters, categories=self.categories)
+        self.executor.submit(api.get_idea_detail, idea.id, on_done=open_form)
 
     def delete_idea(self):
-        """Delete the selected idea after confirmation."""
-        selection = self.tree.selection()
-        if not selection:
+        """Delete the selected idea(s) after confirmation."""
+        selected = self.idea_list.selected_rows()
+        if len(selected) > 1:
+            if not messagebox.askyesno("Confirm Delete", f"Delete {len(selected)} selected ideas?"):
+                return
+            self.executor.submit(
+                api.delete_ideas, [idea.id for idea in selected],
+                on_done=lambda r: self.ideas_bulk_changed()
+            )
+            return
+
+        idea = self.idea_list.selected_row()
+        if idea is None:
             messagebox.showinfo("No selection", "Please select an idea to delete.")
             return
 
-        item_id = int(selection[0])
-        idea = next((i for i in self.current_ideas if i["id"] == item_id), None)
+        if not messagebox.askyesno("Confirm Delete", f"Delete idea '{idea.title}'?"):
+            return
+
+        self.executor.submit(api.delete_idea, idea.id, on_done=self.idea_saved)
 
-        if not messagebox.askyesno("Confirm Delete", f"Delete idea '{idea['title']}'?"):
+    def import_file(self):
+        """Import ideas from a CSV or JSONL file in the background."""
+        path = filedialog.askopenfilename(
+            title="Import ideas",
+            filetypes=[("Idea files", "*.csv *.jsonl *.ndjson"), ("All files", "*.*")]
+        )
+        if not path:
             return
+        self.executor.submit(
+            import_ideas, path,
+            on_done=self.ideas_imported,
+            on_error=lambda error: messagebox.showerror(
+                "Import failed", f"{error}\n\nImporting the file again resumes after the last saved batch."
+            )
+        )
 
-        delete_idea(item_id)
-        self.apply_filters()
+    def ideas_imported(self, count):
+        """Show imported ideas and the new category counts."""
+        messagebox.showinfo("Import finished", f"Imported {count} ideas.")
+        self.refresh_categories()
+        self.load_ideas(self.active_filters, self.active_sort)
+
+    def export_file(self):
+        """Export every idea to a CSV or JSONL file in the background."""
+        path = filedialog.asksaveasfilename(
+            title="Export ideas",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")]
+        )
+        if not path:
+            return
+        self.executor.submit(
+            export_ideas, path,
+            on_done=lambda count: messagebox.showinfo("Export finished", f"Exported {count} ideas."),
+            on_error=lambda error: messagebox.showerror("Export failed", str(error))
+        )
+
+    def ideas_bulk_changed(self):
+        """Clear the selection after a bulk action; the change feed updates the list."""
+        self.idea_list.clear_selection()
+        self.on_tree_select()
+        self.poll_changes()
+
+    def idea_saved(self, result=None):
+        """Pick up our own write through the change feed, like anyone else's."""
+        self.poll_changes()
+
+    # ----- change feed -----
+
+    def schedule_poll(self):
+        if self.poll_after is not None:
+            self.after_cancel(self.poll_after)
+        self.poll_after = self.after(CHANGE_POLL_MS, self.poll_changes)
+
+    def poll_changes(self):
+        """Fetch what anyone changed since the list was loaded or last patched."""
+        if self.poll_after is not None:
+            self.after_cancel(self.poll_after)
+            self.poll_after = None
+        if self.change_seq is None:
+            return
+
+        since = self.change_seq
+        self.executor.submit(
+            api.get_changes, since,
+            on_done=lambda result: self.changes_loaded(since, *result),
+            on_error=lambda error: self.schedule_poll(),
+            key="changes", quiet=True,
+        )
+
+    def changes_loaded(self, since, seq, changes):
+        """Apply a batch from the change feed to the loaded list."""
+        # A listing loaded meanwhile already contains these changes
+        if since != self.change_seq:
+            return
+        self.change_seq = seq
+        if seq != since:
+            self.refresh_categories()
+
+        if changes is None or len(changes) > 1:
+            # Positions from the database only fit a list missing just one change,
+            # so several at once re-count and re-fetch the visible rows instead
+            self.ideas.refresh()
+            self.on_tree_select()
+        elif changes:
+            self.apply_change(*changes[0])
+            return
+        self.schedule_poll()
+
+    def apply_change(self, idea_id, action):
+        """Insert, move, patch or remove one changed idea, then poll again."""
+        old_index = self.ideas.index_of(idea_id)
+        if action == "delete":
+            self.ideas.remove(idea_id, old_index)
+            self.schedule_poll()
+            return
+
+        seq = self.change_seq
+
+        def patch(result):
+            # Skipped if a new listing was loaded in the meantime
+            if seq == self.change_seq:
+                index, idea = result
+                if action == "insert" and old_index is None:
+                    self.ideas.insert(idea, index)
+                else:
+                    self.ideas.update(idea_id, old_index, idea, index)
+                self.schedule_poll()
+
+        self.executor.submit(
+            api.locate_idea, idea_id, sort=self.active_sort, **self.active_filters,
+            on_done=patch, on_error=lambda error: self.schedule_poll(), quiet=True,
+        )
 
 #Multiple accounts have the same files there is no account exclusive files
 if __name__ == "__main__":
-    # Set up database tables and then start at the login window
-    init_db()
+    parser = argparse.ArgumentParser(description="Gameplay Idea Brainstormer")
+    parser.add_argument("--server", metavar="URL", help="use a running service.py, e.g. http://127.0.0.1:8765")
+    args = parser.parse_args()
+
+    if args.server:
+        api = IdeaClient(args.server)
+    else:
+        # Set up database tables
+        db.init_db()
+        # Ideas filed before duplicate detection get signed in the background
+        db.start_signing()
+        # Related ideas are indexed in the background too
+        related.start_index()
+
+    # Start at the login window
     login_window = LoginWindow()
     login_window.mainloop()
+    related.close_index()
+    db.close_pool()
@@ -0,0 +1,102 @@
+import bisect
+import logging
+import threading
+from logging.handlers import RotatingFileHandler
+
+# Histogram bucket bounds in milliseconds: 0.01 ms to ~2 minutes, 10% apart
+BUCKET_BOUNDS = [0.01 * 1.1 ** i for i in range(172)]
+
+# Slow-query log, rotated so it never grows without bound
+SLOW_LOG_PATH = "slow_queries.log"
+SLOW_LOG_MAX_BYTES = 1_000_000
+SLOW_LOG_BACKUPS = 3
+
+
+class Histogram:
+    """Latency histogram with logarithmic buckets; percentiles are bucket
+    upper bounds, so they are accurate to within 10%."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, milliseconds: float):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, milliseconds)] += 1
+        self.count += 1
+        self.total += milliseconds
+        self.max = max(self.max, milliseconds)
+
+    def merge(self, other: "Histogram"):
+        """Add another histogram's samples to this one."""
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, fraction: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                # The overflow bucket has no upper bound, report the max instead
+                return min(BUCKET_BOUNDS[bucket], self.max) if bucket < len(BUCKET_BOUNDS) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            "calls": self.count,
+            "mean_ms": self.total / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": self.max,
+        }
+
+
+class Metrics:
+    """Thread-safe registry of one Histogram per operation name."""
+
+    def __init__(self):
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def record(self, name: str, milliseconds: float):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(milliseconds)
+
+    def snapshot(self):
+        """Return {name: summary dict} for every operation seen so far."""
+        with self.lock:
+            return {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+
+
+metrics = Metrics()
+
+slow_log = logging.getLogger("gib.slow_queries")
+slow_log.propagate = False
+_slow_log_lock = threading.Lock()
+
+
+def log_slow_call(message: str):
+    """Append an entry to the slow-query log, opening the file on first use."""
+    with _slow_log_lock:
+        if not slow_log.handlers:
+            handler = RotatingFileHandler(
+                SLOW_LOG_PATH, maxBytes=SLOW_LOG_MAX_BYTES, backupCount=SLOW_LOG_BACKUPS, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            slow_log.addHandler(handler)
+            slow_log.setLevel(logging.INFO)
+    slow_log.info(message)
@@ -0,0 +1,90 @@
+"""MinHash signatures and LSH banding for near-duplicate detection.
+
+A text's shingles are its overlapping word pairs. Signatures use
+one-permutation hashing: every shingle is hashed once and falls into one of
+SIGNATURE_SIZE bins, each keeping its minimum. Empty bins borrow the value
+of the next filled bin (densification), so two signatures agree on a
+position with probability equal to the Jaccard similarity of their shingle
+sets, as with classic MinHash, at one hash per shingle instead of
+SIGNATURE_SIZE.
+"""
+import zlib
+from array import array
+
+SIGNATURE_SIZE = 64
+# 16 bands of 4 values: ideas sharing any band are candidates, which
+# catches most pairs above ~50% similarity and few below ~25%
+BANDS = 16
+ROWS_PER_BAND = SIGNATURE_SIZE // BANDS
+
+# Top bits of a shingle hash pick its bin, the rest is the value kept
+VALUE_BITS = 58
+VALUE_MASK = (1 << VALUE_BITS) - 1
+MASK64 = (1 << 64) - 1
+MULTIPLIER = 0x9E3779B97F4A7C15
+EMPTY = MASK64
+# Band number above the bucket hash, below the sign bit of an SQLite integer
+BUCKET_BITS = 58
+
+
+def shingle_hashes(words):
+    """64-bit hashes of the word pairs of a text (of its word, if only one)."""
+    hashes = [zlib.crc32(word.encode("utf-8")) for word in words]
+    if len(hashes) < 2:
+        return {(value * MULTIPLIER) & MASK64 for value in hashes}
+    # Multiplying moves every input bit into the high bits that pick the bin
+    return {(((first * MULTIPLIER) ^ second) * MULTIPLIER) & MASK64 for first, second in zip(hashes, hashes[1:])}
+
+
+def signature(words):
+    """MinHash signature (array of SIGNATURE_SIZE ints) of a word list, or None if empty."""
+    bins = [EMPTY] * SIGNATURE_SIZE
+    for value in shingle_hashes(words):
+        position = value >> VALUE_BITS
+        value &= VALUE_MASK
+        if value < bins[position]:
+            bins[position] = value
+
+    if EMPTY not in bins:
+        return array("Q", bins)
+    if bins.count(EMPTY) == SIGNATURE_SIZE:
+        return None
+    # Each empty bin takes the next filled bin's value, tagged with the
+    # distance so it never matches a genuine value by accident
+    original = bins[:]
+    for position in range(SIGNATURE_SIZE):
+        if original[position] == EMPTY:
+            distance = 1
+            while original[(position + distance) % SIGNATURE_SIZE] == EMPTY:
+                distance += 1
+            bins[position] = original[(position + distance) % SIGNATURE_SIZE] | (distance << VALUE_BITS)
+    return array("Q", bins)
+
+
+def band_buckets(values):
+    """One LSH bucket id per band of a signature. Ideas that share a bucket
+    agree on a whole band and are candidate duplicates."""
+    buckets = []
+    for band in range(BANDS):
+        value = band
+        for item in values[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]:
+            value = (value * MULTIPLIER + item) & MASK64
+        value ^= value >> 29
+        value = (value * MULTIPLIER) & MASK64
+        buckets.append((band << BUCKET_BITS) | (value >> (64 - BUCKET_BITS)))
+    return buckets
+
+
+def similarity(first, second) -> float:
+    """Estimated Jaccard similarity of the texts behind two signatures."""
+    return sum(a == b for a, b in zip(first, second)) / SIGNATURE_SIZE
+
+
+def to_blob(values) -> bytes:
+    return values.tobytes()
+
+
+def from_blob(blob: bytes):
+    values = array("Q")
+    values.frombytes(blob)
+    return values
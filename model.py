@@ -0,0 +1,342 @@
+from collections import OrderedDict
+
+# Rows fetched from the database per request
+PAGE_SIZE = 100
+# Pages kept in memory per sorted view
+MAX_CACHED_PAGES = 6
+
+
+class OrderedView:
+    """Cached pages of one sorted listing, indexed by id and by position.
+
+    fetch_page(after, before, offset, n) : the n rows `offset` rows past the
+        `after` row, ending `offset` rows ahead of the `before` row, or (with
+        neither) at an offset from the top
+    load(func, on_done, on_error)        : optional, runs func() in the
+        background and hands its result to on_done; without it pages are
+        fetched on the spot
+    on_loaded()                          : called when a background page arrives
+
+    With `load`, rows not loaded yet read as None, and the first missing
+    page asked for is fetched; one page is in flight at a time, so a fast
+    scroll does not queue up pages nobody looks at any more.
+    """
+
+    def __init__(self, fetch_page, load=None, on_loaded=None):
+        self.fetch_page = fetch_page
+        self.load = load
+        self.on_loaded = on_loaded
+        self.pages = OrderedDict()
+        self.rows_by_id = {}
+        self.positions = {}
+        # Page being fetched in the background, and a counter of changes that
+        # shift rows between pages, which make a fetch in flight useless
+        self.loading = None
+        self.version = 0
+
+    def add_page(self, page, rows):
+        old = self.pages.pop(page, None)
+        if old is not None:
+            self.forget(old)
+        self.pages[page] = rows
+        self.index_page(page)
+
+        # Evict the least recently used page
+        if len(self.pages) > MAX_CACHED_PAGES:
+            _, evicted = self.pages.popitem(last=False)
+            self.forget(evicted)
+
+    def index_page(self, page):
+        for offset, row in enumerate(self.pages[page]):
+            self.rows_by_id[row.id] = row
+            self.positions[row.id] = page * PAGE_SIZE + offset
+
+    def forget(self, rows):
+        for row in rows:
+            self.rows_by_id.pop(row.id, None)
+            self.positions.pop(row.id, None)
+
+    def drop_pages(self, first, last=None):
+        """Forget cached pages first..last (to the end if last is None)."""
+        self.version += 1
+        for page in [p for p in self.pages if p >= first and (last is None or p <= last)]:
+            self.forget(self.pages.pop(page))
+
+    def seek(self, page):
+        """(after, before, offset) reaching a page from the closest cached page."""
+        best = (None, None, page * PAGE_SIZE)
+        for cached, rows in self.pages.items():
+            if not rows:
+                continue
+            if cached < page:
+                # Rows of a cached page always start at its first position
+                skip = page * PAGE_SIZE - (cached * PAGE_SIZE + len(rows))
+                if skip < best[2]:
+                    best = (rows[-1], None, skip)
+            elif cached > page:
+                skip = (cached - page - 1) * PAGE_SIZE
+                if skip < best[2]:
+                    best = (None, rows[0], skip)
+        return best
+
+    def fetch(self, page):
+        after, before, offset = self.seek(page)
+        return self.fetch_page(after, before, offset, PAGE_SIZE)
+
+    def request_page(self, page):
+        """Start fetching a page in the background, unless a fetch is in flight."""
+        if self.loading is not None:
+            return
+        self.loading = page
+        version = self.version
+
+        def loaded(rows):
+            self.loading = None
+            if version == self.version:
+                self.add_page(page, rows)
+            if self.on_loaded is not None:
+                self.on_loaded()
+
+        def failed(error):
+            # Asked for again by the next rows_in_range()
+            self.loading = None
+
+        self.load(lambda: self.fetch(page), loaded, failed)
+
+    def rows_in_range(self, start, end):
+        """Rows start..end of the listing, None for those not loaded yet."""
+        if start >= end:
+            return []
+
+        rows = []
+        for page in range(start // PAGE_SIZE, (end - 1) // PAGE_SIZE + 1):
+            page_rows = self.pages.get(page)
+            if page_rows is not None:
+                self.pages.move_to_end(page)
+            needed = min(PAGE_SIZE, end - page * PAGE_SIZE)
+            if page_rows is None or len(page_rows) < needed:
+                # Missing, or short of rows after a removal
+                if self.load is None:
+                    page_rows = self.fetch(page)
+                    self.add_page(page, page_rows)
+                else:
+                    self.request_page(page)
+                    page_rows = list(page_rows or [])
+                    page_rows += [None] * (needed - len(page_rows))
+            rows.extend(page_rows)
+        first = start - (start // PAGE_SIZE) * PAGE_SIZE
+        return rows[first:first + end - start]
+
+    def splice(self, index, row=None):
+        """Insert `row` at `index`, or remove the row there, inside the cached pages."""
+        page = index // PAGE_SIZE
+
+        # Later pages are shifted by one row, so they are fetched again on demand
+        self.drop_pages(page + 1)
+
+        rows = self.pages.get(page)
+        offset = index - page * PAGE_SIZE
+        # Past the rows a short page still has, nothing cached moves
+        if rows is None or offset > len(rows) or (row is None and offset == len(rows)):
+            return
+
+        if row is None:
+            # The page is left one row short; rows_in_range() fetches it again
+            # once its last row is needed
+            self.forget([rows.pop(offset)])
+        else:
+            rows.insert(offset, row)
+            if len(rows) > PAGE_SIZE:
+                self.forget([rows.pop()])
+        self.index_page(page)
+
+    def replace(self, index, row):
+        page = index // PAGE_SIZE
+        rows = self.pages.get(page)
+        if rows is not None and index - page * PAGE_SIZE < len(rows):
+            rows[index - page * PAGE_SIZE] = row
+            self.rows_by_id[row.id] = row
+
+
+class IdeaModel:
+    """In-memory ideas behind the main window's list.
+
+    Holds one OrderedView per sort key for the current filters, so lookups
+    by id or position are dict reads and switching back to an earlier sort
+    needs no query. Listeners are called as listener(event, *args) with
+    events "reset" (keep_position), "insert" (row, index), "remove" (row_id, index),
+    "update" (row, index), "move" (row, old_index, new_index) and "loaded" ()
+    when rows fetched in the background have arrived.
+
+    fetch_count()                                   : total rows for the current filters
+    fetch_page(sort, after, before, offset, n)      : see OrderedView
+    load(func, on_done, on_error)                   : optional, see OrderedView
+    """
+
+    def __init__(self, fetch_count, fetch_page, load=None):
+        self.fetch_count = fetch_count
+        self.fetch_page = fetch_page
+        self.load = load
+        self.total = 0
+        # Bumped by every reset or refresh, so a count fetched for an older one is ignored
+        self.resets = 0
+        self.sort = None
+        self.views = {}
+        self.listeners = []
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def notify(self, event, *args):
+        for listener in self.listeners:
+            listener(event, *args)
+
+    # ----- views -----
+
+    def make_view(self, sort):
+        def loaded():
+            # Pages of a view dropped or switched away from meanwhile change nothing on screen
+            if self.views.get(self.sort) is view:
+                self.notify("loaded")
+
+        view = OrderedView(
+            lambda after, before, offset, limit: self.fetch_page(sort, after, before, offset, limit),
+            self.load, loaded,
+        )
+        return view
+
+    @property
+    def view(self):
+        if self.sort not in self.views:
+            self.views[self.sort] = self.make_view(self.sort)
+        return self.views[self.sort]
+
+    def has_view(self, sort):
+        return sort in self.views
+
+    def reset(self, total, first_rows=None, sort=None, keep_views=False):
+        """Start over with a new result; keep_views keeps other sorts of the same filters."""
+        self.resets += 1
+        if not keep_views:
+            self.views.clear()
+        self.views.pop(sort, None)
+        self.total = total
+        self.sort = sort
+        if first_rows:
+            self.view.add_page(0, first_rows)
+        self.notify("reset", False)
+
+    def set_sort(self, sort):
+        """Switch to an already cached sort order."""
+        self.sort = sort
+        self.notify("reset", False)
+
+    def refresh(self):
+        """Drop every cached row and re-count the current result, in the
+        background when there is a `load`."""
+        self.resets += 1
+        self.views.clear()
+        if self.load is None:
+            self.total = self.fetch_count()
+            self.notify("reset", True)
+            return
+
+        resets = self.resets
+
+        def counted(total):
+            if resets == self.resets:
+                self.total = total
+                self.notify("reset", True)
+
+        self.load(self.fetch_count, counted, lambda error: None)
+        # Rows are fetched again right away, the count follows
+        self.notify("reset", True)
+
+    def recount(self):
+        """Refresh only if the count changed: a row that was not loaded,
+        e.g. one in another category, need not have been in the result."""
+        resets = self.resets
+
+        def counted(total):
+            if resets == self.resets and total != self.total:
+                self.resets += 1
+                self.views.clear()
+                self.total = total
+                self.notify("reset", True)
+
+        if self.load is None:
+            counted(self.fetch_count())
+        else:
+            self.load(self.fetch_count, counted, lambda error: None)
+
+    # ----- lookups -----
+
+    def get(self, row_id):
+        """Return a loaded row by id, or None."""
+        row = self.view.rows_by_id.get(row_id)
+        if row is None:
+            for view in self.views.values():
+                row = view.rows_by_id.get(row_id)
+                if row is not None:
+                    break
+        return row
+
+    def index_of(self, row_id):
+        """Return a loaded row's position in the current sort, or None."""
+        return self.view.positions.get(row_id)
+
+    def rows_in_range(self, start, end):
+        return self.view.rows_in_range(start, min(end, self.total))
+
+    def row_at(self, index):
+        rows = self.rows_in_range(index, index + 1)
+        return rows[0] if rows else None
+
+    # ----- changes -----
+
+    def other_views_stale(self):
+        # Positions in the other sort orders are unknown after a change
+        for sort in [s for s in self.views if s != self.sort]:
+            del self.views[sort]
+
+    def insert(self, row, index):
+        """Add one row at its sorted position."""
+        if index is None:
+            return
+        self.other_views_stale()
+        self.total += 1
+        self.view.splice(index, row)
+        self.notify("insert", row, index)
+
+    def remove(self, row_id, index):
+        """Remove one row; an unknown position re-counts the result."""
+        if index is None:
+            self.recount()
+            return
+        self.other_views_stale()
+        self.total -= 1
+        self.view.splice(index)
+        self.notify("remove", row_id, index)
+
+    def update(self, row_id, old_index, row, new_index):
+        """Apply an edited row: in place, moved, or gone from the result."""
+        if old_index is None and new_index is None:
+            # Neither loaded nor in the result: nothing shown changes
+            return
+        if new_index is None:
+            self.remove(row_id, old_index)
+            return
+        if old_index is None:
+            self.refresh()
+            return
+        self.other_views_stale()
+
+        if old_index == new_index:
+            self.view.replace(old_index, row)
+            self.notify("update", row, new_index)
+            return
+
+        # Cached pages across the shifted range are fetched again on demand
+        low, high = sorted((old_index, new_index))
+        self.view.drop_pages(low // PAGE_SIZE, high // PAGE_SIZE)
+        self.notify("move", row, old_index, new_index)
@@ -0,0 +1,436 @@
+"""Related ideas: cosine similarity of TF-IDF vectors over title, description and tags.
+
+Each idea keeps its TERMS_PER_IDEA heaviest terms as one fixed-width row
+of two matrices, term ids and L2-normalized weights. A column-ordered copy
+of the same matrix (the postings: for every term, the rows containing it
+and their weights) scores every idea against one with a single bincount
+over the postings of that idea's terms; argpartition then picks the top k.
+Rows edited since the postings were built are scored from the row matrices
+instead, and the postings are rebuilt once there are many of them.
+
+The arrays are saved as .npy files next to the database and opened
+memory-mapped copy-on-write: startup reads only the pages queries touch,
+and processes sharing a database never write into each other's pages.
+The index follows db.get_changes() and is saved on close; when the change
+log cannot tell what changed (a bulk import, a long time away) it is
+reconciled against the ideas table instead.
+
+Building the index of a large database takes a while, so it happens on a
+thread of its own (start_index()); until it is ready get_related_ideas()
+raises IndexNotReady instead of waiting.
+
+NumPy is optional: without it get_related_ideas() returns None.
+"""
+import json
+import logging
+import os
+import threading
+import zlib
+from collections import Counter
+
+import db
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Terms kept per idea; the lightest ones are dropped before normalizing
+TERMS_PER_IDEA = 32
+# Words are hashed into this many term ids, so no vocabulary has to be kept
+VOCABULARY_SIZE = 1 << 20
+# A title or tag word counts as this many description words
+TITLE_WEIGHT = 3
+# Related ideas returned per idea
+DEFAULT_RELATED = 8
+# Ideas less similar than this share little beyond common words
+MIN_SIMILARITY = 0.05
+# Extra rows allocated when the matrices are full
+GROWTH = 4096
+# Ideas vectorized per step of a full build
+BUILD_BATCH_SIZE = 10_000
+# Rows edited since the postings were built before they are rebuilt
+# (each such row costs a little on every query)
+MAX_CHANGED_ROWS = 20_000
+# Reconciling re-reads ideas saved this long before the last sync, in case
+# a write stamped before the sync committed after it
+RECONCILE_MARGIN_MS = 60_000
+# Bumped whenever the files change meaning; older files are rebuilt
+INDEX_FORMAT = 1
+
+ARRAYS = ("ids", "terms", "weights", "df", "offsets", "posting_rows", "posting_weights", "changed")
+
+
+def term_counts(title: str, description: str | None, tags: str | None):
+    """{term id: weighted count} for one idea."""
+    words = Counter(db.search_words(description or ""))
+    for word in db.search_words(f"{title} {tags or ''}"):
+        words[word] += TITLE_WEIGHT
+    counts = Counter()
+    for word, count in words.items():
+        counts[zlib.crc32(word.encode("utf-8")) % VOCABULARY_SIZE] += count
+    return counts
+
+
+def flatten(documents):
+    """Term-count dicts as flat (lengths, terms, counts) arrays."""
+    lengths = np.fromiter((len(counts) for counts in documents), np.int64, len(documents))
+    total = int(lengths.sum())
+    terms = np.fromiter((term for counts in documents for term in counts), np.int32, total)
+    counts = np.fromiter((count for counts in documents for count in counts.values()), np.float32, total)
+    return lengths, terms, counts
+
+
+def concatenated_ranges(starts, ends):
+    """Indices of all the ranges [start, end) one after another, without a Python loop."""
+    lengths = ends - starts
+    first = np.cumsum(lengths) - lengths
+    return np.arange(lengths.sum()) + np.repeat(starts - first, lengths)
+
+
+class RelatedIndex:
+    """TF-IDF rows of every idea, kept in step with the database.
+
+    Not thread-safe on its own; get_related_ideas() serializes access.
+    """
+
+    def __init__(self, path: str):
+        # Directory holding the .npy files and meta.json
+        self.path = path
+        self.lookup = np.zeros(VOCABULARY_SIZE, np.float32)
+        if not self.load():
+            self.reset()
+
+    def reset(self, capacity: int = GROWTH):
+        self.ids = np.zeros(capacity, np.int64)
+        self.terms = np.zeros((capacity, TERMS_PER_IDEA), np.int32)
+        self.weights = np.zeros((capacity, TERMS_PER_IDEA), np.float32)
+        # Ideas containing each term. Removing an idea only subtracts its
+        # kept terms, so ideas with more distinct terms than TERMS_PER_IDEA
+        # leave small overcounts until the next full build.
+        self.df = np.zeros(VOCABULARY_SIZE, np.int32)
+        # Rows in use are below size; rows freed by deletes are reused first
+        self.size = 0
+        self.rows = {}
+        self.free = []
+        self.seq = None
+        self.synced_at = 0
+        self.dirty = False
+        self.index_postings()
+
+    def file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def load(self) -> bool:
+        """Map a saved index; False if there is none or it is unusable."""
+        try:
+            with open(self.file("meta.json"), encoding="utf-8") as file:
+                meta = json.load(file)
+            if (meta["format"], meta["vocabulary"], meta["terms"]) != (INDEX_FORMAT, VOCABULARY_SIZE, TERMS_PER_IDEA):
+                return False
+            arrays = {name: np.load(self.file(name + ".npy"), mmap_mode="c") for name in ARRAYS}
+        except (OSError, ValueError, KeyError):
+            return False
+
+        self.ids = arrays["ids"]
+        self.terms = arrays["terms"]
+        self.weights = arrays["weights"]
+        self.df = arrays["df"]
+        self.offsets = arrays["offsets"]
+        self.posting_rows = arrays["posting_rows"]
+        self.posting_weights = arrays["posting_weights"]
+        self.changed = set(arrays["changed"].tolist())
+        self.size = meta["size"]
+        self.seq = meta["seq"]
+        self.synced_at = meta["synced_at"]
+        self.rows = {}
+        self.free = []
+        for row, idea_id in enumerate(self.ids[:self.size].tolist()):
+            if idea_id:
+                self.rows[idea_id] = row
+            else:
+                self.free.append(row)
+        self.dirty = False
+        return True
+
+    def save(self):
+        """Write the index atomically: new files first, then swap them in."""
+        os.makedirs(self.path, exist_ok=True)
+        self.changed = np.array(sorted(self.changed), np.int64)
+        for name in ARRAYS:
+            with open(self.file(name + ".npy.tmp"), "wb") as file:
+                np.save(file, getattr(self, name))
+        meta = {"format": INDEX_FORMAT, "vocabulary": VOCABULARY_SIZE, "terms": TERMS_PER_IDEA,
+                "size": self.size, "seq": self.seq, "synced_at": self.synced_at}
+        with open(self.file("meta.json.tmp"), "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+
+        # Mapped files cannot be replaced on every platform; unmap them first
+        for name in ARRAYS:
+            setattr(self, name, None)
+        for name in ARRAYS:
+            os.replace(self.file(name + ".npy.tmp"), self.file(name + ".npy"))
+        os.replace(self.file("meta.json.tmp"), self.file("meta.json"))
+        self.dirty = False
+
+    def close(self):
+        if self.dirty:
+            self.save()
+
+    # ----- updates -----
+
+    def vectorize(self, lengths, terms, counts):
+        """(terms, weights) rows for flattened term counts, using the current df."""
+        documents = len(lengths)
+        document = np.repeat(np.arange(documents), lengths)
+        idf = np.log((len(self.rows) + 1) / (self.df[terms] + 1.0)) + 1.0
+        weights = ((1.0 + np.log(counts)) * idf).astype(np.float32)
+
+        # Heaviest terms first within each idea, then keep the first few
+        order = np.lexsort((-weights, document))
+        terms, weights = terms[order], weights[order]
+        rank = np.arange(len(terms)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        keep = rank < TERMS_PER_IDEA
+
+        row_terms = np.zeros((documents, TERMS_PER_IDEA), np.int32)
+        row_weights = np.zeros((documents, TERMS_PER_IDEA), np.float32)
+        row_terms[document[keep], rank[keep]] = terms[keep]
+        row_weights[document[keep], rank[keep]] = weights[keep]
+        norms = np.sqrt(np.einsum("ij,ij->i", row_weights, row_weights))
+        norms[norms == 0] = 1.0
+        row_weights /= norms[:, None]
+        return row_terms, row_weights
+
+    def index_postings(self):
+        """Rebuild the column-ordered copy of the rows."""
+        terms = self.terms[:self.size].ravel()
+        weights = self.weights[:self.size].ravel()
+        present = np.flatnonzero(weights)
+        order = present[np.argsort(terms[present], kind="stable")]
+        self.offsets = np.zeros(VOCABULARY_SIZE + 1, np.int64)
+        np.cumsum(np.bincount(terms[present], minlength=VOCABULARY_SIZE), out=self.offsets[1:])
+        self.posting_rows = (order // TERMS_PER_IDEA).astype(np.int32)
+        self.posting_weights = weights[order]
+        # Rows that differ from the postings
+        self.changed = set()
+
+    def allocate(self) -> int:
+        if self.free:
+            return self.free.pop()
+        if self.size == len(self.ids):
+            capacity = len(self.ids) + max(GROWTH, len(self.ids) // 2)
+            self.ids = np.concatenate([self.ids, np.zeros(capacity - len(self.ids), np.int64)])
+            padding = np.zeros((capacity - len(self.terms), TERMS_PER_IDEA))
+            self.terms = np.concatenate([self.terms, padding.astype(np.int32)])
+            self.weights = np.concatenate([self.weights, padding.astype(np.float32)])
+        self.size += 1
+        return self.size - 1
+
+    def remove(self, idea_id: int):
+        row = self.rows.pop(idea_id, None)
+        if row is None:
+            return
+        np.subtract.at(self.df, self.terms[row][self.weights[row] > 0], 1)
+        self.ids[row] = 0
+        self.terms[row] = 0
+        self.weights[row] = 0
+        self.free.append(row)
+        self.changed.add(row)
+        self.dirty = True
+
+    def update(self, ideas):
+        """Add or replace the rows of full ideas (from get_idea_details)."""
+        ideas = list(ideas)
+        if not ideas:
+            return
+        for idea in ideas:
+            self.remove(idea.id)
+        rows = []
+        for idea in ideas:
+            row = self.rows[idea.id] = self.allocate()
+            self.ids[row] = idea.id
+            rows.append(row)
+
+        # Weighted with the new ideas already counted, as a full build would
+        lengths, terms, counts = flatten([term_counts(idea.title, idea.description, idea.tags) for idea in ideas])
+        np.add.at(self.df, terms, 1)
+        self.terms[rows], self.weights[rows] = self.vectorize(lengths, terms, counts)
+        self.changed.update(rows)
+        self.dirty = True
+
+    def build(self):
+        """Vectorize every idea from scratch."""
+        seq = db.get_change_seq()
+        started = db.now_ms()
+        ids = []
+        documents = []
+        for ideas in db.iter_idea_details(BUILD_BATCH_SIZE):
+            ids.extend(idea.id for idea in ideas)
+            documents.extend(term_counts(idea.title, idea.description, idea.tags) for idea in ideas)
+
+        self.reset(len(ids) + GROWTH)
+        self.ids[:len(ids)] = ids
+        self.rows = {idea_id: row for row, idea_id in enumerate(ids)}
+        self.size = len(ids)
+        for start in range(0, len(ids), BUILD_BATCH_SIZE):
+            self.df += np.bincount(flatten(documents[start:start + BUILD_BATCH_SIZE])[1],
+                                   minlength=VOCABULARY_SIZE).astype(np.int32)
+        for start in range(0, len(ids), BUILD_BATCH_SIZE):
+            batch = documents[start:start + BUILD_BATCH_SIZE]
+            end = start + len(batch)
+            self.terms[start:end], self.weights[start:end] = self.vectorize(*flatten(batch))
+        self.index_postings()
+        self.seq = seq
+        self.synced_at = started
+
+        # Saved straight away: this is the expensive part of startup
+        self.save()
+        self.load()
+
+    def reconcile(self, seq: int):
+        """Catch up without the change log: compare ids, re-read recent edits."""
+        started = db.now_ms()
+        current = set(db.get_idea_ids())
+        for idea_id in [idea_id for idea_id in self.rows if idea_id not in current]:
+            self.remove(idea_id)
+        changed = current - self.rows.keys()
+        changed.update(db.get_idea_ids(self.synced_at - RECONCILE_MARGIN_MS))
+        changed = sorted(changed)
+        for start in range(0, len(changed), db.DEFAULT_PAGE_SIZE):
+            self.update(db.get_idea_details(changed[start:start + db.DEFAULT_PAGE_SIZE]).values())
+        self.seq = seq
+        self.synced_at = started
+        self.dirty = True
+
+    def sync(self):
+        """Apply everything written since the last sync."""
+        if self.seq is None:
+            self.build()
+            return
+        seq, changes = db.get_changes(self.seq)
+        if changes is None:
+            self.reconcile(seq)
+        elif changes:
+            for idea_id, action in changes:
+                if action == "delete":
+                    self.remove(idea_id)
+            changed = [idea_id for idea_id, action in changes if action != "delete"]
+            ideas = db.get_idea_details(changed)
+            for idea_id in changed:
+                if idea_id not in ideas:
+                    self.remove(idea_id)
+            self.update(ideas.values())
+            self.seq = seq
+            self.synced_at = db.now_ms()
+            self.dirty = True
+        if len(self.changed) > MAX_CHANGED_ROWS:
+            self.index_postings()
+
+    # ----- queries -----
+
+    def related(self, idea_id: int, limit: int = DEFAULT_RELATED):
+        """(idea id, cosine similarity) of the `limit` ideas most like one idea."""
+        row = self.rows.get(idea_id)
+        if row is None or self.size < 2 or limit < 1:
+            return []
+        present = self.weights[row] > 0
+        terms, weights = self.terms[row][present], self.weights[row][present]
+
+        # Every row's dot product with this one, from the postings of its terms
+        starts, ends = self.offsets[terms], self.offsets[terms + 1]
+        postings = concatenated_ranges(starts, ends)
+        contributions = self.posting_weights[postings] * np.repeat(weights, ends - starts)
+        scores = np.bincount(self.posting_rows[postings], contributions, minlength=self.size)
+        # Without any postings bincount returns integers
+        scores = scores.astype(np.float64, copy=False)
+
+        if self.changed:
+            # The postings still hold the old contents of these rows
+            changed = np.fromiter(self.changed, np.int64, len(self.changed))
+            self.lookup[terms] = weights
+            scores[changed] = np.einsum("ij,ij->i", self.weights[changed], self.lookup[self.terms[changed]])
+            self.lookup[terms] = 0
+        scores[row] = 0
+
+        limit = min(limit, self.size - 1)
+        top = np.argpartition(scores, -limit)[-limit:]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(self.ids[i]), float(scores[i])) for i in top if scores[i] >= MIN_SIMILARITY]
+
+
+class IndexNotReady(Exception):
+    """The index of the current database is still being built; ask again later."""
+
+
+index = None
+index_lock = threading.Lock()
+# Path of the index once it has been loaded or built, None before
+ready_path = None
+# Thread running prepare_index(), started by start_index()
+builder = None
+builder_lock = threading.Lock()
+
+
+def index_path() -> str:
+    return db.DB_Path + ".related"
+
+
+def get_index() -> RelatedIndex:
+    """The index of the current database, synced with it. Call with index_lock held."""
+    global index
+    if index is None or index.path != index_path():
+        if index is not None:
+            index.close()
+        index = RelatedIndex(index_path())
+    index.sync()
+    return index
+
+
+def prepare_index():
+    """Load or build the index of the current database and mark it ready."""
+    global ready_path
+    try:
+        with index_lock:
+            get_index()
+            ready_path = index.path
+    except Exception:
+        logging.getLogger("gib.related").exception("Building the related ideas index failed")
+
+
+def start_index():
+    """Load or build the index on a daemon thread unless that is already under way."""
+    global builder
+    if np is None:
+        return
+    with builder_lock:
+        if builder is None or not builder.is_alive():
+            builder = threading.Thread(target=prepare_index, name="gib-related", daemon=True)
+            builder.start()
+
+
+@db.timed
+def get_related_ideas(idea_id: int, limit: int = DEFAULT_RELATED):
+    """Ideas most similar to one idea as (idea, similarity) pairs, most similar first.
+
+    Returns None if NumPy is not installed. Raises IndexNotReady (and starts
+    the build if needed) while the index is still being loaded or built.
+    """
+    if np is None:
+        return None
+    if ready_path != index_path():
+        start_index()
+        raise IndexNotReady("Related ideas are still being indexed")
+    with index_lock:
+        matches = get_index().related(idea_id, limit)
+    ideas = db.get_idea_details([idea_id for idea_id, _ in matches])
+    return [(ideas[idea_id], score) for idea_id, score in matches if idea_id in ideas]
+
+
+def close_index():
+    """Save the index if it changed since it was loaded."""
+    global index, ready_path
+    with index_lock:
+        if index is not None:
+            index.close()
+            index = None
+            ready_path = None
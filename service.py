@@ -0,0 +1,556 @@
+import argparse
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import db
+import related
+from metrics import metrics
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Threads (and pooled connections) serving GET requests
+DEFAULT_READERS = 4
+
+# Request limits
+MAX_BODY_BYTES = 1_000_000
+MAX_HEADERS = 100
+MAX_PAGE_SIZE = 1000
+# Writes waiting for the writer; further requests wait for room in the queue
+MAX_QUEUED_WRITES = 1000
+# Idle keep-alive connections are closed after this many seconds
+KEEP_ALIVE_TIMEOUT = 30
+
+log = logging.getLogger("gib.service")
+
+
+# Marks a Request.field() without a default
+REQUIRED = object()
+# How Request.field() names the JSON types it expects
+TYPE_NAMES = {str: "a string", int: "an integer"}
+
+
+class HTTPError(Exception):
+    """Ends a request with an error status and a JSON {"error": message} body."""
+
+    def __init__(self, status: HTTPStatus, message: str | None = None):
+        super().__init__(message or status.phrase)
+        self.status = status
+
+
+class Request:
+    """One parsed HTTP request."""
+
+    def __init__(self, method: str, target: str, version: str, headers, body: bytes):
+        self.method = method
+        self.version = version
+        self.headers = headers
+        self.body = body
+        parts = urlsplit(target)
+        self.path = parts.path
+        self.query = parse_qs(parts.query)
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    def param(self, name: str, default=None):
+        values = self.query.get(name)
+        return values[-1] if values else default
+
+    def int_param(self, name: str, default: int, maximum: int | None = None, minimum: int = 0) -> int:
+        try:
+            value = int(self.param(name, default))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be an integer") from None
+        if value < minimum or (maximum is not None and value > maximum):
+            if maximum is None:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be at least {minimum}")
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be between {minimum} and {maximum}")
+        return value
+
+    def json(self):
+        try:
+            data = json.loads(self.body or b"{}")
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body is not valid JSON") from None
+        if not isinstance(data, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+        return data
+
+    def field(self, data, name: str, kind: type | None = None, default=REQUIRED):
+        """A field of the JSON body, required unless a default is given.
+
+        With `kind`, anything else is a 400; null is allowed where the default is None.
+        """
+        if name not in data:
+            if default is REQUIRED:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"Missing field {name}")
+            return default
+        value = data[name]
+        if kind is None or (value is None and default is None):
+            return value
+        if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be {TYPE_NAMES.get(kind, kind.__name__)}")
+        return value
+
+
+# (method, path pattern, handler, is_write), filled in by @route
+ROUTES = []
+
+
+def route(method: str, pattern: str, write: bool = False):
+    """Register handler(request, *path_groups) for a method and path.
+
+    A handler returns the JSON response body, (status, body), or None for
+    204 No Content. Handlers run on the reader threads, or one at a time on
+    the writer thread when write=True.
+    """
+    def register(handler):
+        ROUTES.append((method, re.compile(pattern + "$"), handler, write))
+        return handler
+    return register
+
+
+def read_filters(request: Request):
+    """Listing filters from the query string, as db.py keyword arguments."""
+    return {
+        "category": request.param("category"),
+        "search_text": request.param("search"),
+        "tags": request.query.get("tag", []),
+        "match_all_tags": request.param("any_tag") != "1",
+        "fuzzy": request.param("fuzzy") == "1",
+    }
+
+
+def ideas_json(ideas):
+    return [idea.as_dict() for idea in ideas]
+
+
+def matches_json(matches):
+    """(idea, similarity) pairs as idea objects with a "similarity" field."""
+    return [dict(idea.as_dict(), similarity=similarity) for idea, similarity in matches]
+
+
+def read_cursor(request: Request, name: str):
+    """A (sort_key, id) cursor from the query string, or None."""
+    value = request.param(name)
+    if value is None:
+        return None
+    try:
+        cursor = json.loads(value)
+    except ValueError:
+        cursor = None
+    if not (isinstance(cursor, list) and len(cursor) == 2
+            and isinstance(cursor[1], int) and not isinstance(cursor[1], bool)):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be a cursor from a previous page")
+    return cursor
+
+
+def read_sort(request: Request):
+    """The `sort` query parameter, one of db.SORT_ORDERS or None for the default."""
+    sort = request.param("sort")
+    if sort is not None and sort not in db.SORT_ORDERS:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"sort must be one of {', '.join(db.SORT_ORDERS)}")
+    return sort
+
+
+def list_field(request: Request, data, name: str, kind: type, default=None):
+    """A JSON body field holding a list of `kind` values; required unless a default is given."""
+    values = request.field(data, name) if default is None else data.get(name, default)
+    if not isinstance(values, list) or not all(
+        isinstance(value, kind) and not isinstance(value, bool) for value in values
+    ):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be a list of {kind.__name__} values")
+    return values
+
+
+@route("GET", "/ideas")
+def list_ideas(request):
+    """One page of a listing: after the `next` cursor of the previous page (or
+    before a cursor), skipping `offset` rows past the cursor or from the top."""
+    filters = read_filters(request)
+    sort = read_sort(request)
+    limit = request.int_param("limit", db.DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+
+    rows, cursor = db.get_ideas_page(
+        sort=sort, after=read_cursor(request, "after"), before=read_cursor(request, "before"),
+        offset=request.int_param("offset", 0), limit=limit, **filters,
+    )
+    return {"ideas": ideas_json(rows), "next": cursor}
+
+
+@route("GET", "/ideas/count")
+def count_ideas(request):
+    return {"count": db.count_ideas(**read_filters(request))}
+
+
+@route("GET", "/ideas/details")
+def get_idea_details(request):
+    try:
+        idea_ids = [int(value) for value in request.query.get("id", [])]
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "id must be an integer") from None
+    if len(idea_ids) > MAX_PAGE_SIZE:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"At most {MAX_PAGE_SIZE} ids per request")
+    return {"ideas": ideas_json(db.get_idea_details(idea_ids).values())}
+
+
+@route("GET", r"/ideas/(\d+)")
+def get_idea(request, idea_id):
+    idea = db.get_idea_detail(int(idea_id))
+    if idea is None:
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No idea {idea_id}")
+    return idea.as_dict()
+
+
+@route("GET", r"/ideas/(\d+)/position")
+def locate_idea(request, idea_id):
+    index, idea = db.locate_idea(int(idea_id), sort=read_sort(request), **read_filters(request))
+    return {"index": index, "idea": idea.as_dict() if idea is not None else None}
+
+
+@route("GET", r"/ideas/(\d+)/related")
+def get_related_ideas(request, idea_id):
+    """Ideas like this one; "ideas" is null when the service has no NumPy,
+    503 while the index is still being built."""
+    limit = request.int_param("limit", related.DEFAULT_RELATED, MAX_PAGE_SIZE, minimum=1)
+    try:
+        matches = related.get_related_ideas(int(idea_id), limit)
+    except related.IndexNotReady as error:
+        raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, str(error)) from None
+    return {"ideas": matches_json(matches) if matches is not None else None}
+
+
+@route("POST", "/ideas", write=True)
+def create_idea(request):
+    data = request.json()
+    idea_id = db.create_new_idea(
+        request.field(data, "title", str), request.field(data, "category", str),
+        request.field(data, "description", str, ""), request.field(data, "tags", str, ""),
+    )
+    return HTTPStatus.CREATED, {"id": idea_id}
+
+
+@route("POST", "/ideas/similar")
+def find_similar_ideas(request):
+    """Near duplicates of a title and description; a POST only because texts can be long."""
+    data = request.json()
+    matches = db.find_similar_ideas(
+        request.field(data, "title", str), request.field(data, "description", str, ""),
+        request.field(data, "exclude_id", int, None),
+    )
+    return {"ideas": matches_json(matches)}
+
+
+@route("PUT", r"/ideas/(\d+)", write=True)
+def update_idea(request, idea_id):
+    """Save an edit; with "version", 409 Conflict (and the current idea) if it is stale."""
+    data = request.json()
+    try:
+        version = db.update_idea(
+            int(idea_id), request.field(data, "title", str), request.field(data, "category", str),
+            request.field(data, "description", str, ""), request.field(data, "tags", str, ""),
+            request.field(data, "version", int, None),
+        )
+    except db.EditConflict as conflict:
+        current = conflict.current.as_dict() if conflict.current is not None else None
+        return HTTPStatus.CONFLICT, {"error": str(conflict), "current": current}
+    return {"version": version}
+
+
+@route("DELETE", r"/ideas/(\d+)", write=True)
+def delete_idea(request, idea_id):
+    db.delete_idea(int(idea_id))
+
+
+@route("POST", "/ideas/delete", write=True)
+def delete_ideas(request):
+    db.delete_ideas(list_field(request, request.json(), "ids", int))
+
+
+@route("POST", "/ideas/edit", write=True)
+def edit_ideas(request):
+    data = request.json()
+    db.edit_ideas(
+        list_field(request, data, "ids", int), category=request.field(data, "category", str, None),
+        add_tags=list_field(request, data, "add_tags", str, []),
+        remove_tags=list_field(request, data, "remove_tags", str, []),
+    )
+
+
+@route("GET", "/tags")
+def get_all_tags(request):
+    return {"tags": db.get_all_tags()}
+
+
+@route("GET", "/categories")
+def get_categories(request):
+    return {"categories": db.get_categories()}
+
+
+@route("GET", "/categories/([^/]+)/count")
+def get_category_count(request, name):
+    return {"count": db.get_category_count(unquote(name))}
+
+
+@route("POST", "/categories", write=True)
+def create_category(request):
+    return {"created": db.create_category(request.field(request.json(), "name", str))}
+
+
+@route("DELETE", "/categories/([^/]+)", write=True)
+def delete_category(request, name):
+    db.delete_category(
+        unquote(name), with_ideas=request.param("delete_ideas") == "1",
+        fallback=request.param("fallback", "uncategorized"),
+    )
+
+
+@route("POST", "/users", write=True)
+def create_user(request):
+    data = request.json()
+    return {"created": db.create_user(request.field(data, "username", str), request.field(data, "password", str))}
+
+
+@route("POST", "/login")
+def verify_user(request):
+    data = request.json()
+    return {"valid": db.verify_user(request.field(data, "username", str), request.field(data, "password", str))}
+
+
+@route("GET", "/changes")
+def get_changes(request):
+    """Changes after sequence number `since`; without it, just the latest number."""
+    if "since" not in request.query:
+        return {"seq": db.get_change_seq()}
+    seq, changes = db.get_changes(request.int_param("since", 0), request.int_param("limit", db.CHANGE_BATCH_SIZE))
+    return {"seq": seq, "changes": changes}
+
+
+@route("GET", "/stats")
+def get_stats(request):
+    return {"operations": metrics.snapshot(), "cache": db.get_cache_stats()}
+
+
+def find_route(request: Request):
+    """Return (handler, path groups, is_write) for a request."""
+    allowed = False
+    for method, pattern, handler, write in ROUTES:
+        match = pattern.match(request.path)
+        if match is None:
+            continue
+        if method == request.method:
+            return handler, match.groups(), write
+        allowed = True
+    if allowed:
+        raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+    raise HTTPError(HTTPStatus.NOT_FOUND)
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(header: str | None, etag: str) -> bool:
+    if not header:
+        return False
+    # Weak comparison, as required for If-None-Match
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+async def read_request(reader: asyncio.StreamReader):
+    """Read one request, or return None when the client closed the connection."""
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line") from None
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+        if len(headers) > MAX_HEADERS:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length") from None
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+    body = await reader.readexactly(length) if length else b""
+    return Request(method.upper(), target, version, headers, body)
+
+
+def encode_response(status: HTTPStatus, body: bytes = b"", headers=(), keep_alive: bool = True) -> bytes:
+    lines = [f"HTTP/1.1 {status.value} {status.phrase}"]
+    lines += [f"{name}: {value}" for name, value in headers]
+    lines.append(f"Content-Length: {len(body)}")
+    if body:
+        lines.append("Content-Type: application/json")
+    if not keep_alive:
+        lines.append("Connection: close")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+class IdeaService:
+    """Serves the db.py operations as a JSON API over HTTP.
+
+    Reads run concurrently on a pool of reader threads, each with its own
+    pooled connection. Writes go through one queue and are applied one at a
+    time by a single writer thread, so clients never contend for SQLite's
+    write lock. GET responses carry an ETag; a request whose If-None-Match
+    still matches gets 304 Not Modified without a body.
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, readers: int = DEFAULT_READERS):
+        self.host = host
+        self.port = port
+        # One connection per reader plus one for the writer
+        db.POOL_SIZE = max(db.POOL_SIZE, readers + 1)
+        self.readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="gib-read")
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gib-write")
+        self.writes = None
+        self.write_task = None
+        self.server = None
+
+    async def start(self):
+        """Start listening; with port=0 the chosen port is stored in self.port."""
+        self.writes = asyncio.Queue(MAX_QUEUED_WRITES)
+        self.write_task = asyncio.create_task(self.run_writes())
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self.start()
+        log.info("Serving %s on http://%s:%d", db.DB_Path, self.host, self.port)
+        async with self.server:
+            await self.server.serve_forever()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        if self.write_task is not None:
+            self.write_task.cancel()
+        self.readers.shutdown(wait=True)
+        self.writer.shutdown(wait=True)
+
+    async def run_writes(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            call, future = await self.writes.get()
+            try:
+                result = await loop.run_in_executor(self.writer, call)
+            except Exception as error:
+                if not future.done():
+                    future.set_exception(error)
+            else:
+                if not future.done():
+                    future.set_result(result)
+
+    async def call(self, handler, request: Request, groups, write: bool):
+        call = functools.partial(handler, request, *groups)
+        if not write:
+            return await asyncio.get_running_loop().run_in_executor(self.readers, call)
+
+        future = asyncio.get_running_loop().create_future()
+        await self.writes.put((call, future))
+        return await future
+
+    async def respond(self, request: Request):
+        """Return (status, body bytes, extra headers) for a request."""
+        try:
+            handler, groups, write = find_route(request)
+            result = await self.call(handler, request, groups, write)
+        except HTTPError as error:
+            return error.status, json.dumps({"error": str(error)}).encode(), []
+        except sqlite3.OperationalError as error:
+            # Lock timeouts are worth retrying, anything else is a server fault
+            body = json.dumps({"error": str(error)}).encode()
+            if db.is_lock_error(error):
+                return HTTPStatus.SERVICE_UNAVAILABLE, body, [("Retry-After", "1")]
+            log.exception("%s %s failed", request.method, request.path)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, body, []
+        except Exception as error:
+            log.exception("%s %s failed", request.method, request.path)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, json.dumps({"error": str(error)}).encode(), []
+
+        if result is None:
+            return HTTPStatus.NO_CONTENT, b"", []
+        status = HTTPStatus.OK
+        if isinstance(result, tuple):
+            status, result = result
+        body = json.dumps(result, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+        if request.method != "GET":
+            return status, body, []
+        etag = make_etag(body)
+        headers = [("ETag", etag), ("Cache-Control", "no-cache")]
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return HTTPStatus.NOT_MODIFIED, b"", headers
+        return status, body, headers
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except HTTPError as error:
+                    body = json.dumps({"error": str(error)}).encode()
+                    writer.write(encode_response(error.status, body, keep_alive=False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+
+                status, body, headers = await self.respond(request)
+                keep_alive = request.keep_alive
+                writer.write(encode_response(status, body, headers, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the ideas database as a local HTTP/JSON API.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--readers", type=int, default=DEFAULT_READERS, help="concurrent read threads")
+    parser.add_argument("--db", default=db.DB_Path, help="database file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    db.DB_Path = args.db
+    db.init_db()
+    service = IdeaService(args.host, args.port, args.readers)
+    db.start_signing()
+    related.start_index()
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        related.close_index()
+        db.close_pool()
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repository, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """A fresh ideas database in a temporary directory; returns its path."""
+    path = str(tmp_path / "ideas.db")
+    monkeypatch.setattr(db, "DB_Path", path)
+    # Keep slow_queries.log out of the working tree
+    monkeypatch.setattr(db, "SLOW_QUERY_MS", float("inf"))
+    db.init_db()
+    yield path
+    db.close_pool()
+    db.result_cache.clear()
+    db.detail_cache.clear()
@@ -0,0 +1,125 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import db
+
+
+def test_migrates_original_schema(tmp_path, monkeypatch):
+    path = str(tmp_path / "old.db")
+    connection = sqlite3.connect(path)
+    connection.executescript("""
+        CREATE TABLE ideas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            category TEXT NOT NULL,
+            description TEXT NOT NULL,
+            tags TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        );
+        CREATE TABLE users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL
+        );
+        INSERT INTO ideas VALUES (1, 'Bullet time', 'gameplay', 'Slow motion dodge', 'matrix, camera',
+                                  '2025-11-25 04:25', '2025-11-25T23:06:03');
+        INSERT INTO ideas VALUES (3, 'Neon skin', 'skin', 'Glowing outfit', '', '2025-11-25 04:06', '2025-11-25 04:26');
+    """)
+    connection.commit()
+    connection.close()
+
+    monkeypatch.setattr(db, "DB_Path", path)
+    monkeypatch.setattr(db, "SLOW_QUERY_MS", float("inf"))
+    try:
+        db.init_db()
+        # Running it again on a current database changes nothing
+        db.init_db()
+
+        with db.pooled_connection() as connection:
+            assert connection.execute("PRAGMA user_version;").fetchone()[0] == db.SCHEMA_VERSION
+
+        idea = db.get_idea_detail(1)
+        assert idea.created_at == int(datetime(2025, 11, 25, 4, 25).timestamp()) * 1000
+        assert idea.updated_at == int(datetime(2025, 11, 25, 23, 6, 3).timestamp()) * 1000
+        assert idea.version == 1
+        assert dict(db.get_all_tags()) == {"matrix": 1, "camera": 1}
+        assert dict(db.get_categories())["skin"] == 1
+        assert [found.id for found in db.get_ideas_by_filter(search_text="dodge")] == [1]
+        # New ids continue after the old ones
+        assert db.create_new_idea("Wall run", "gameplay", "Run along walls", "") > 3
+    finally:
+        db.close_pool()
+        db.result_cache.clear()
+        db.detail_cache.clear()
+
+
+def test_keyset_pages_match_the_full_listing(database):
+    for number in range(25):
+        db.create_new_idea(f"Idea {number:02}", "gameplay", "", "")
+    expected = [idea.id for idea in db.get_ideas_by_filter(sort="title")]
+
+    seen = []
+    cursor = None
+    while True:
+        rows, next_cursor = db.get_ideas_page(sort="title", after=cursor, limit=10)
+        seen.extend(row.id for row in rows)
+        if len(rows) < 10:
+            break
+        cursor = next_cursor
+    assert seen == expected
+
+    # The cursor is the last row of the second page; seeking back stops just short of it
+    rows, _ = db.get_ideas_page(sort="title", before=cursor, limit=10)
+    assert [row.id for row in rows] == expected[9:19]
+
+
+def test_commit_by_another_connection_clears_cached_listings(database):
+    db.create_new_idea("First", "gameplay", "", "")
+    assert len(db.get_ideas_by_filter("gameplay")) == 1
+
+    other = sqlite3.connect(database, isolation_level=None)
+    try:
+        other.execute("""
+            INSERT INTO ideas (title, category, description, tags, created_at, updated_at)
+            VALUES ('Second', 'gameplay', '', '', 1, 1);
+        """)
+        # A local commit in the same window must not hide the other one
+        db.create_new_idea("Elsewhere", "level", "", "")
+        assert len(db.get_ideas_by_filter("gameplay")) == db.count_ideas("gameplay") == 2
+
+        other.execute("UPDATE ideas SET title = 'Renamed' WHERE title = 'Second';")
+        assert "Renamed" in [idea.title for idea in db.get_ideas_by_filter("gameplay")]
+    finally:
+        other.close()
+
+
+def test_local_commits_keep_unrelated_cached_listings(database):
+    db.create_new_idea("First", "gameplay", "", "")
+    db.get_ideas_by_filter("gameplay")
+    hits = db.result_cache.hits
+
+    db.create_new_idea("Elsewhere", "level", "", "")
+    db.get_ideas_by_filter("gameplay")
+    assert db.result_cache.hits == hits + 1
+
+
+def test_stale_version_raises_edit_conflict(database):
+    idea_id = db.create_new_idea("Grapple", "gameplay", "Hook onto ledges", "")
+    assert db.update_idea(idea_id, "Grapple hook", "gameplay", "Hook onto ledges", "", version=1) == 2
+
+    with pytest.raises(db.EditConflict) as conflict:
+        db.update_idea(idea_id, "Grappling", "gameplay", "Hook onto ledges", "", version=1)
+    assert conflict.value.current.title == "Grapple hook"
+    assert conflict.value.current.version == 2
+    assert db.get_idea_detail(idea_id).title == "Grapple hook"
+
+    # Without a version the save overwrites
+    assert db.update_idea(idea_id, "Grappling", "gameplay", "", "") == 3
+
+    db.delete_idea(idea_id)
+    with pytest.raises(db.EditConflict) as conflict:
+        db.update_idea(idea_id, "Gone", "gameplay", "", "", version=3)
+    assert conflict.value.current is None
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+import db
+from transfer import export_ideas, import_ideas
+
+IDEAS = [
+    ("Double jump", "gameplay", "Jump again in mid air", "movement, platformer", 1_700_000_000_000, 1_700_000_500_000),
+    ("Rain level", "level", 'Puddles, "quotes" and\na second line', "", 1_700_000_100_000, 1_700_000_100_000),
+    ("Neon skin", "skin", "", "cosmetic", 1_700_000_200_000, 1_700_000_300_000),
+]
+
+
+def stored_ideas():
+    return sorted(
+        (idea.title, idea.category, idea.description, idea.tags, idea.created_at, idea.updated_at)
+        for ideas in db.iter_idea_details()
+        for idea in ideas
+    )
+
+
+@pytest.mark.parametrize("name", ["ideas.csv", "ideas.jsonl"])
+def test_export_then_import_round_trips(database, tmp_path, monkeypatch, name):
+    db.insert_ideas(IDEAS)
+    original = stored_ideas()
+    path = str(tmp_path / name)
+    assert export_ideas(path) == len(IDEAS)
+
+    monkeypatch.setattr(db, "DB_Path", str(tmp_path / "copy.db"))
+    db.init_db()
+    assert import_ideas(path) == len(IDEAS)
+    assert stored_ideas() == original
+
+
+def test_failed_import_resumes_after_the_last_batch(database, tmp_path):
+    path = tmp_path / "ideas.jsonl"
+    records = [{"title": f"Idea {number}", "category": "gameplay"} for number in range(7)]
+    records[5] = {"title": ["not", "text"]}
+    path.write_text("\n".join(json.dumps(record) for record in records), encoding="utf-8")
+
+    with pytest.raises(ValueError, match="Record 6"):
+        import_ideas(str(path), batch_size=2)
+    assert db.count_ideas() == 4
+
+    records[5] = {"title": "Idea 5", "category": "gameplay"}
+    path.write_text("\n".join(json.dumps(record) for record in records), encoding="utf-8")
+    assert import_ideas(str(path), batch_size=2) == 3
+    assert sorted(idea.title for idea in db.get_ideas_by_filter()) == [f"Idea {number}" for number in range(7)]
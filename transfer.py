@@ -0,0 +1,152 @@
+import argparse
+import csv
+import json
+import os
+from itertools import islice
+
+from db import init_db, insert_ideas, get_import_position, finish_import, index_signatures, iter_idea_details, now_ms
+
+# Records committed per transaction on import
+IMPORT_BATCH_SIZE = 20000
+# Rows read per query on export
+EXPORT_BATCH_SIZE = 5000
+
+# Columns of an exported file; imports ignore "id" and give ideas new ids
+FIELDS = ["id", "title", "category", "description", "tags", "created_at", "updated_at"]
+IMPORT_FIELDS = FIELDS[1:]
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+
+def file_format(path: str, fmt: str | None = None) -> str:
+    """Return "csv" or "jsonl", guessing from the file extension if not given."""
+    fmt = fmt or FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError(f"Unknown file format for {path}, expected .csv or .jsonl")
+    return fmt
+
+
+def read_records(path: str, fmt: str):
+    """Yield one [title, category, description, tags, created_at, updated_at]
+    list per idea in a CSV or JSONL file (missing values are None)."""
+    with open(path, newline="", encoding="utf-8") as file:
+        if fmt == "csv":
+            reader = csv.reader(file)
+            header = [name.strip().lower() for name in next(reader, [])]
+            if "title" not in header:
+                raise ValueError(f"{path} has no title column")
+            # Column positions are looked up once instead of building a dict per row
+            indexes = [header.index(name) if name in header else None for name in IMPORT_FIELDS]
+            for row in reader:
+                if row:
+                    yield [row[i] if i is not None and i < len(row) else None for i in indexes]
+            return
+
+        for line_number, line in enumerate(file, 1):
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as error:
+                    raise ValueError(f"{path}:{line_number}: {error}") from None
+                if not isinstance(record, dict):
+                    raise ValueError(f"{path}:{line_number}: not a JSON object")
+                yield [record.get(name) for name in IMPORT_FIELDS]
+
+
+def record_to_row(record, number: int, default_time: int):
+    """Turn an imported record into an insert_ideas() tuple."""
+    title, category, description, tags, created_at, updated_at = record
+    if isinstance(tags, list):
+        tags = ", ".join(str(tag) for tag in tags)
+    # JSON Lines records can hold numbers, lists or objects anywhere
+    for name, value in (("title", title), ("category", category), ("description", description), ("tags", tags)):
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"Record {number}: {name} is not text")
+
+    title = (title or "").strip()
+    if not title:
+        raise ValueError(f"Record {number} has no title")
+
+    try:
+        created_at = int(created_at or default_time)
+        updated_at = int(updated_at or created_at)
+    except (TypeError, ValueError):
+        raise ValueError(f"Record {number} has a timestamp that is not epoch milliseconds") from None
+
+    return title, (category or "uncategorized").strip(), description or "", tags or "", created_at, updated_at
+
+
+def import_ideas(path: str, fmt: str | None = None, batch_size: int = IMPORT_BATCH_SIZE,
+                 resume: bool = True, on_progress=None) -> int:
+    """Stream ideas from a file into the database and return how many were added.
+
+    Every batch is committed together with its position in the file, so an
+    import that failed part way continues after the last committed batch
+    when run again (unless resume=False). on_progress(records_done) is
+    called after each batch. The new ideas are then added to the
+    near-duplicate index.
+    """
+    fmt = file_format(path, fmt)
+    source = os.path.abspath(path)
+    start = get_import_position(source) if resume else 0
+    default_time = now_ms()
+
+    records = islice(read_records(path, fmt), start, None)
+    position = start
+    imported = 0
+    while True:
+        batch = [
+            record_to_row(record, position + i + 1, default_time)
+            for i, record in enumerate(islice(records, batch_size))
+        ]
+        if not batch:
+            break
+        position += len(batch)
+        imported += insert_ideas(batch, source, position)
+        if on_progress is not None:
+            on_progress(position)
+
+    finish_import(source)
+    index_signatures()
+    return imported
+
+
+def export_ideas(path: str, fmt: str | None = None, batch_size: int = EXPORT_BATCH_SIZE) -> int:
+    """Stream every idea into a CSV or JSONL file and return how many were written."""
+    fmt = file_format(path, fmt)
+    exported = 0
+
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file) if fmt == "csv" else None
+        if writer is not None:
+            writer.writerow(FIELDS)
+
+        for ideas in iter_idea_details(batch_size):
+            rows = [
+                (idea.id, idea.title, idea.category, idea.description, idea.tags or "",
+                 idea.created_at, idea.updated_at)
+                for idea in ideas
+            ]
+            if writer is not None:
+                writer.writerows(rows)
+            else:
+                file.writelines(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + "\n" for row in rows)
+            exported += len(rows)
+
+    return exported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import or export ideas as CSV or JSONL.")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension")
+    parser.add_argument("--restart", action="store_true", help="import from the start instead of resuming")
+    args = parser.parse_args()
+
+    init_db()
+    if args.action == "import":
+        count = import_ideas(args.path, args.format, resume=not args.restart,
+                             on_progress=lambda done: print(f"{done} records committed"))
+        print(f"Imported {count} ideas")
+    else:
+        print(f"Exported {export_ideas(args.path, args.format)} ideas")
@@ -0,0 +1,319 @@
+from tkinter import ttk
+
+# Used until the first row has been drawn and can be measured
+DEFAULT_ROW_HEIGHT = 20
+DEFAULT_HEADING_HEIGHT = 25
+# Item id prefix of the rows drawn while their data is still being fetched
+PLACEHOLDER = "loading-"
+
+
+class VirtualTreeview(ttk.Frame):
+    """Treeview that only materializes the rows currently scrolled into view.
+
+    model           : an IdeaModel (see model.py) holding the rows
+    row_values(row) : tuple of column values shown for a row
+
+    The widget redraws itself from the model's change notifications, with
+    placeholders for rows the model is still fetching. With
+    selectmode="extended" several rows can be selected; the selection is
+    kept by id, so it survives scrolling the rows out of view.
+    """
+
+    def __init__(self, master, columns, model, row_values, **tree_options):
+        super().__init__(master, style=tree_options.pop("style", "TFrame"))
+        self.model = model
+        self.row_values = row_values
+
+        self.top = 0
+        self.visible_count = tree_options.get("height", 15)
+        self.selected_id = None
+        self.selected_index = None
+        self.selected = None
+        # Every selected row by id, including rows scrolled out of view
+        self.selected_ids = {}
+        self.measured = False
+        # Placeholders drawn so far, which numbers their item ids
+        self.placeholders = 0
+
+        selectmode = tree_options.pop("selectmode", "browse")
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", selectmode=selectmode, **tree_options)
+        self.vsb = ttk.Scrollbar(self, orient="vertical", command=self.on_scrollbar)
+
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.vsb.pack(side="right", fill="y")
+
+        # The tree never scrolls itself; every movement goes through self.top
+        self.tree.bind("<Configure>", self.on_resize)
+        self.tree.bind("<MouseWheel>", self.on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_by(3))
+        self.tree.bind("<Up>", lambda e: self.move_selection(-1))
+        self.tree.bind("<Down>", lambda e: self.move_selection(1))
+        self.tree.bind("<Prior>", lambda e: self.move_selection(-self.visible_count))
+        self.tree.bind("<Next>", lambda e: self.move_selection(self.visible_count))
+        self.tree.bind("<Home>", lambda e: self.move_selection(-self.model.total))
+        self.tree.bind("<End>", lambda e: self.move_selection(self.model.total))
+        self.tree.bind("<<TreeviewSelect>>", self.on_select, add="+")
+        self.tree.bind("<ButtonPress-1>", self.on_click)
+
+        model.subscribe(self.on_model_change)
+
+    @property
+    def total(self):
+        return self.model.total
+
+    def selected_row(self):
+        if self.selected_id is None:
+            return None
+        # Fall back to the row captured at selection time if its page was evicted
+        return self.model.get(self.selected_id) or self.selected
+
+    def selected_rows(self):
+        """All selected rows, in the order they were selected."""
+        return list(self.selected_ids.values())
+
+    def index_of(self, row_id):
+        """Return the position of a loaded row in the current sort, or None."""
+        if row_id == self.selected_id and self.selected_index is not None:
+            return self.selected_index
+        return self.model.index_of(row_id)
+
+    # ----- model changes -----
+
+    def on_model_change(self, event, *args):
+        if event == "reset":
+            (keep_position,) = args
+            if keep_position:
+                self.render()
+            else:
+                self.top = 0
+                self.clear_selection()
+                self.render()
+        elif event == "insert":
+            self.row_inserted(*args)
+        elif event == "remove":
+            self.row_removed(*args)
+        elif event == "update":
+            self.row_updated(*args)
+        elif event == "move":
+            self.row_moved(*args)
+        elif event == "loaded":
+            if any(iid.startswith(PLACEHOLDER) for iid in self.tree.get_children()):
+                self.render()
+
+    def row_inserted(self, row, index):
+        """Add one row at its sorted position without redrawing the others."""
+        if self.selected_index is not None and index <= self.selected_index:
+            self.selected_index += 1
+
+        if index < self.top:
+            # Keep the same rows in view
+            self.top += 1
+        elif index < self.top + self.visible_count:
+            self.draw_row(index - self.top, row)
+            children = self.tree.get_children()
+            if len(children) > self.visible_count:
+                self.tree.delete(children[-1])
+
+        self.update_scrollbar()
+
+    def row_removed(self, row_id, index):
+        """Remove one row, pulling the next row into view if needed."""
+        self.selected_ids.pop(row_id, None)
+        if row_id == self.selected_id:
+            self.clear_selection()
+        elif self.selected_index is not None and index < self.selected_index:
+            self.selected_index -= 1
+
+        if index < self.top:
+            self.top -= 1
+        elif self.tree.exists(str(row_id)):
+            self.tree.delete(str(row_id))
+            last = self.top + len(self.tree.get_children())
+            if last < self.total:
+                self.draw_row("end", self.model.row_at(last))
+            elif self.top > 0:
+                # Scrolled to the bottom: show one more row from above instead
+                self.top -= 1
+                self.draw_row(0, self.model.row_at(self.top))
+
+        self.update_scrollbar()
+
+    def row_updated(self, row, index):
+        if row.id == self.selected_id:
+            self.selected = row
+        if row.id in self.selected_ids:
+            self.selected_ids[row.id] = row
+        if self.tree.exists(str(row.id)):
+            self.tree.item(str(row.id), values=self.row_values(row))
+
+    def row_moved(self, row, old_index, new_index):
+        """Move a row; only the rows between its old and new position shift."""
+        low, high = sorted((old_index, new_index))
+
+        if row.id in self.selected_ids:
+            self.selected_ids[row.id] = row
+        if row.id == self.selected_id:
+            self.selected_index = new_index
+            self.selected = row
+        elif self.selected_index is not None and low <= self.selected_index <= high:
+            self.selected_index += 1 if new_index < old_index else -1
+
+        # Redraw only if the shifted range is on screen
+        if high >= self.top and low < self.top + self.visible_count:
+            self.render()
+
+    # ----- drawing -----
+
+    def render(self):
+        """Draw the rows between self.top and the bottom of the widget."""
+        self.top = max(0, min(self.top, self.total - self.visible_count))
+        rows = self.model.rows_in_range(self.top, self.top + self.visible_count)
+
+        self.tree.delete(*self.tree.get_children())
+        for row in rows:
+            self.draw_row("end", row)
+
+        if self.selected_id is not None and self.tree.exists(str(self.selected_id)):
+            self.tree.focus(str(self.selected_id))
+
+        self.update_scrollbar()
+
+        # Re-measure once rows exist, since row height depends on the theme
+        if rows and not self.measured:
+            self.measured = True
+            self.after_idle(self.remeasure)
+
+    def draw_row(self, position, row):
+        """Insert one row into the tree, selected if it is in the selection,
+        or a placeholder if it is None."""
+        if row is None:
+            self.placeholders += 1
+            self.tree.insert("", position, iid=f"{PLACEHOLDER}{self.placeholders}", values=("Loading...",))
+            return
+        self.tree.insert("", position, iid=str(row.id), values=self.row_values(row))
+        if row.id in self.selected_ids:
+            self.tree.selection_add(str(row.id))
+
+    def remeasure(self):
+        height = self.tree.winfo_height()
+        # Not mapped yet, a <Configure> event will follow
+        if height <= 1:
+            return
+        count = self.measure_rows(height)
+        if count != self.visible_count:
+            self.visible_count = count
+            self.render()
+
+    def update_scrollbar(self):
+        if self.total <= self.visible_count:
+            self.vsb.set(0.0, 1.0)
+            return
+        first = self.top / self.total
+        last = min(1.0, (self.top + self.visible_count) / self.total)
+        self.vsb.set(first, last)
+
+    def measure_rows(self, height):
+        """Work out how many rows fit, using a drawn row when there is one."""
+        children = self.tree.get_children()
+        bbox = self.tree.bbox(children[0]) if children else ""
+        if bbox:
+            heading_height, row_height = bbox[1], bbox[3]
+        else:
+            heading_height, row_height = DEFAULT_HEADING_HEIGHT, DEFAULT_ROW_HEIGHT
+        return max(1, (height - heading_height) // max(1, row_height))
+
+    # ----- scrolling -----
+
+    def scroll_to(self, top):
+        top = max(0, min(top, self.total - self.visible_count))
+        if top != self.top:
+            self.top = top
+            self.render()
+
+    def scroll_by(self, rows):
+        self.scroll_to(self.top + rows)
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * self.total))
+        elif unit == "pages":
+            self.scroll_by(int(amount) * self.visible_count)
+        else:
+            self.scroll_by(int(amount))
+
+    def on_mousewheel(self, event):
+        steps = -event.delta // 120 if abs(event.delta) >= 120 else -event.delta
+        self.scroll_by(steps * 3)
+
+    def on_resize(self, event=None):
+        self.remeasure()
+
+    # ----- selection -----
+
+    def on_click(self, event):
+        """A plain click on a row starts a new selection, also dropping hidden rows."""
+        # Shift / Control clicks extend the selection instead
+        if event.state & 0x0005 == 0 and self.tree.identify_region(event.x, event.y) in ("cell", "tree"):
+            self.selected_ids.clear()
+
+    def on_select(self, event=None):
+        selection = self.tree.selection()
+        # Placeholders cannot be selected
+        placeholders = [iid for iid in selection if iid.startswith(PLACEHOLDER)]
+        if placeholders:
+            self.tree.selection_remove(*placeholders)
+            selection = self.tree.selection()
+
+        # Only the visible rows are in the tree; hidden selected rows stay as they are
+        for iid in self.tree.get_children():
+            if iid.startswith(PLACEHOLDER):
+                continue
+            if iid in selection:
+                self.selected_ids[int(iid)] = self.model.get(int(iid)) or self.selected_ids.get(int(iid))
+            else:
+                self.selected_ids.pop(int(iid), None)
+
+        if selection:
+            focus = self.tree.focus()
+            current = focus if focus in selection else selection[-1]
+            self.selected_id = int(current)
+            self.selected_index = self.top + self.tree.index(current)
+            self.selected = self.model.get(self.selected_id)
+        elif self.selected_id not in self.selected_ids:
+            # Deselected by the user, not just scrolled out of view
+            self.selected_id = None
+            self.selected_index = None
+            self.selected = None
+
+    def clear_selection(self):
+        self.selected_id = None
+        self.selected_index = None
+        self.selected = None
+        self.selected_ids.clear()
+        self.tree.selection_set(())
+
+    def move_selection(self, delta):
+        if self.total == 0:
+            return "break"
+
+        if self.selected_index is None:
+            index = self.top
+        else:
+            index = max(0, min(self.selected_index + delta, self.total - 1))
+
+        # Keep the new row inside the visible window
+        if index < self.top:
+            self.scroll_to(index)
+        elif index >= self.top + self.visible_count:
+            self.scroll_to(index - self.visible_count + 1)
+
+        row = self.model.row_at(index)
+        if row is not None:
+            self.selected_id = row.id
+            self.selected_index = index
+            self.selected = row
+            self.selected_ids = {row.id: row}
+            self.tree.selection_set(str(row.id))
+            self.tree.focus(str(row.id))
+        return "break"